@@ -0,0 +1,88 @@
+"""Measure the memory held per in-memory Document with tracemalloc.
+
+Loads documents of the demo schemas (demoA, demoB, demoC, demoFile) back
+from an SQLiteDB and reports bytes per document for:
+
+- before: the previous representation (a Document with a per-instance
+  __dict__ and plainly decoded properties)
+- default: Document with __slots__ and plainly decoded properties
+- compact: get_docs(..., compact=True), interned keys
+- frozen: get_docs(..., frozen=True), interned keys in immutable views
+
+Run with: python benchmarks/bench_document_memory.py [n_docs]
+"""
+
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class DictDocument:
+    """Stand-in for the previous Document layout (no __slots__)."""
+
+    def __init__(self, document_properties):
+        self.document_properties = document_properties
+
+
+def build_db(filename, n_docs):
+    db = SQLiteDB(filename)
+    db.add_branch("a")
+    per_class = n_docs // 4
+    docs = []
+    for doc_type in ("demoA", "demoB", "demoC", "demoFile"):
+        docs.extend(
+            Document.create_many(
+                doc_type, per_class, **{f"{doc_type}.value": list(range(per_class))}
+            )
+        )
+    db.add_docs(docs, "a")
+    return db
+
+
+def measure(load):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    docs = load()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(docs)
+
+
+def main():
+    n_docs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    with tempfile.TemporaryDirectory() as tmp:
+        db = build_db(os.path.join(tmp, "memory.sqlite"), n_docs)
+        ids = db.get_doc_ids("a")
+        rows = db.do_run_sql_query("SELECT json_code FROM docs")
+        json_codes = [row["json_code"] for row in rows]
+
+        def load_before():
+            return [
+                DictDocument(SQLiteDB._normalize_loaded_props(json.loads(code)))
+                for code in json_codes
+            ]
+
+        results = {
+            "before": measure(load_before),
+            "default": measure(lambda: db.get_docs(ids)),
+            "compact": measure(lambda: db.get_docs(ids, compact=True)),
+            "frozen": measure(lambda: db.get_docs(ids, frozen=True)),
+        }
+        db.close()
+
+    print(f"{len(ids)} documents")
+    baseline = results["before"]
+    for name, per_doc in results.items():
+        print(f"{name:>8}: {per_doc:8.0f} bytes/doc  ({per_doc / baseline:5.1%})")
+
+
+if __name__ == "__main__":
+    main()
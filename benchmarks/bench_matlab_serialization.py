@@ -0,0 +1,64 @@
+"""Benchmark MATLAB-compatible JSON encoding of document properties.
+
+Compares the previous deepcopy-then-unwrap approach with the shallow
+path-aware rewrite used by SQLiteDB._matlab_json.
+
+Run with: python benchmarks/bench_matlab_serialization.py
+"""
+
+import copy
+import json
+import timeit
+
+from did.implementations.sqlitedb import SQLiteDB
+
+
+def deepcopy_encode(props):
+    props = copy.deepcopy(props)
+    dc = props.get("document_class", {})
+    sc = dc.get("superclasses")
+    if isinstance(sc, list) and len(sc) == 1:
+        dc["superclasses"] = sc[0]
+    dep = props.get("depends_on")
+    if isinstance(dep, list) and len(dep) == 1:
+        props["depends_on"] = dep[0]
+    files = props.get("files")
+    if isinstance(files, dict):
+        fi = files.get("file_info")
+        if isinstance(fi, list) and len(fi) == 1:
+            files["file_info"] = fi[0]
+    return json.dumps(props)
+
+
+def make_props(n_values):
+    return {
+        "document_class": {
+            "class_name": "demo",
+            "superclasses": [{"definition": "$DIDDOCUMENT_EX1/base.json"}],
+        },
+        "base": {"id": "abc", "name": "demo", "datestamp": "2020-01-01"},
+        "depends_on": [{"name": "item1", "value": "def"}],
+        "files": {"file_info": [{"name": "f.bin", "locations": {"location": "x"}}]},
+        "data": {
+            "values": list(range(n_values)),
+            "records": [{"i": i, "label": f"r{i}"} for i in range(n_values // 10)],
+        },
+    }
+
+
+def main():
+    for n_values in (10, 1000, 100000):
+        props = make_props(n_values)
+        assert SQLiteDB._matlab_json(props) == deepcopy_encode(props)
+        number = max(1, 20000 // max(n_values // 10, 1))
+        t_old = timeit.timeit(lambda: deepcopy_encode(props), number=number)
+        t_new = timeit.timeit(lambda: SQLiteDB._matlab_json(props), number=number)
+        print(
+            f"{n_values:>7} values: deepcopy {t_old / number * 1e6:10.1f} us  "
+            f"shallow {t_new / number * 1e6:10.1f} us  "
+            f"speedup {t_old / t_new:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -72,13 +72,6 @@ class PathConstants:
         return self._preferences_path
 
 
-# Placeholder for fileCache class
-class FileCache:
-    def __init__(self, path, size):
-        self.path = path
-        self.size = size
-
-
 _cached_cache = None
 
 
@@ -86,6 +79,8 @@ def get_cache():
     """
     Returns a persistent cache object.
     """
+    from .file import FileCache
+
     global _cached_cache
     if _cached_cache is None:
         path_constants = PathConstants()
@@ -1,4 +1,7 @@
 import abc
+from collections.abc import Mapping
+
+from .dependency_index import DependencyIndex, dependency_ids, order_by_dependencies
 
 
 class Database(abc.ABC):
@@ -7,6 +10,7 @@ class Database(abc.ABC):
         self.version = None
         self.current_branch_id = ""
         self.frozen_branch_ids = []
+        self._dependency_indexes = {}  # branch_id -> DependencyIndex
         self.dbid = None
         self.preferences = {}
         self.debug = kwargs.get("debug", False)
@@ -34,13 +38,13 @@ class Database(abc.ABC):
     def all_branch_ids(self):
         return self._do_get_branch_ids()
 
-    def add_branch(self, branch_id, parent_branch_id=None):
+    def add_branch(self, branch_id, parent_branch_id=None, **kwargs):
         if parent_branch_id is None:
             parent_branch_id = self.current_branch_id
 
         # Validation logic would go here
 
-        self._do_add_branch(branch_id, parent_branch_id)
+        self._do_add_branch(branch_id, parent_branch_id, **kwargs)
         self.current_branch_id = branch_id
 
     def set_branch(self, branch_id):
@@ -50,6 +54,29 @@ class Database(abc.ABC):
     def get_branch(self):
         return self.current_branch_id
 
+    def freeze_branch(self, branch_id=None):
+        """Make a branch immutable; later adds, removes and updates on it fail."""
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        self._do_freeze_branch(branch_id)
+
+    def unfreeze_branch(self, branch_id=None):
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        self._do_unfreeze_branch(branch_id)
+
+    def _do_freeze_branch(self, branch_id):
+        if branch_id not in self.frozen_branch_ids:
+            self.frozen_branch_ids.append(branch_id)
+
+    def _do_unfreeze_branch(self, branch_id):
+        if branch_id in self.frozen_branch_ids:
+            self.frozen_branch_ids.remove(branch_id)
+
+    def _check_not_frozen(self, branch_id):
+        if branch_id in self.frozen_branch_ids:
+            raise ValueError(f"Branch '{branch_id}' is frozen and cannot be modified.")
+
     # ... other branch-related methods would follow ...
 
     @abc.abstractmethod
@@ -57,7 +84,7 @@ class Database(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def _do_add_branch(self, branch_id, parent_branch_id):
+    def _do_add_branch(self, branch_id, parent_branch_id, **kwargs):
         pass
 
     # ... other abstract do_* methods for branches ...
@@ -71,12 +98,84 @@ class Database(abc.ABC):
         # Validation logic would go here
         return self._do_get_doc_ids(branch_id)
 
-    def add_docs(self, document_objs, branch_id=None, **kwargs):
+    def add_docs(
+        self, document_objs, branch_id=None, check_dependencies=False, **kwargs
+    ):
+        """Add documents to a branch.
+
+        With check_dependencies=True the documents are added in dependency
+        order and every depends_on target must be in the branch or in the
+        batch; otherwise ValueError is raised before anything is added. With
+        check_dependencies="report" the missing targets are returned instead,
+        as (doc_id, dep_name, missing_id) tuples, and nothing is added unless
+        that list is empty.
+        """
         if branch_id is None:
             branch_id = self.current_branch_id
+        self._check_not_frozen(branch_id)
+        missing = []
+        if check_dependencies:
+            document_objs = order_by_dependencies(list(document_objs))
+            missing = self._missing_batch_dependencies(document_objs, branch_id)
+            if missing and check_dependencies != "report":
+                shown = ", ".join(f"{d} ({n}) -> {m}" for d, n, m in missing[:10])
+                more = f" and {len(missing) - 10} more" if len(missing) > 10 else ""
+                raise ValueError(
+                    f"{len(missing)} dependencies refer to documents that are not "
+                    f"in branch '{branch_id}': {shown}{more}"
+                )
+            if missing:
+                return missing
         # Validation and other logic from the Matlab code would be ported here
+        index = self._dependency_indexes.get(branch_id)
         for doc in document_objs:
             self._do_add_doc(doc, branch_id, **kwargs)
+            if index is not None:
+                index.add(doc.id(), dependency_ids(doc.document_properties))
+        if check_dependencies == "report":
+            return missing
+
+    def _missing_batch_dependencies(self, document_objs, branch_id):
+        """Return (doc_id, dep_name, missing_id) for unresolved batch references."""
+        batch_ids = {doc.id() for doc in document_objs}
+        refs = []
+        for doc in document_objs:
+            depends_on = doc.document_properties.get("depends_on") or []
+            if isinstance(depends_on, Mapping):
+                depends_on = [depends_on]
+            for dep in depends_on:
+                value = dep.get("value") if isinstance(dep, Mapping) else None
+                if value and value not in batch_ids:
+                    refs.append((doc.id(), dep.get("name"), str(value)))
+        if not refs:
+            return []
+        existing = self._existing_doc_ids({r[2] for r in refs}, branch_id)
+        return [r for r in refs if r[2] not in existing]
+
+    def _existing_doc_ids(self, doc_ids, branch_id):
+        """Return the subset of doc_ids that are in the branch."""
+        return set(doc_ids) & set(self.get_doc_ids(branch_id))
+
+    def update_doc(self, document_obj, branch_id=None, **kwargs):
+        """Replace the stored content of a document that is already in a branch.
+
+        Unlike remove_docs followed by add_docs, the document keeps its branch
+        memberships and implementations only rewrite what changed.
+        """
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        self._check_not_frozen(branch_id)
+        result = self._do_update_doc(document_obj, branch_id, **kwargs)
+        # The document changed on every branch that holds it
+        deps = dependency_ids(document_obj.document_properties)
+        for index in self._dependency_indexes.values():
+            index.update(document_obj.id(), deps)
+        return result
+
+    def _do_update_doc(self, document_obj, branch_id, **kwargs):
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support in-place document updates."
+        )
 
     # ... other document-related methods would follow ...
 
@@ -137,15 +236,78 @@ class Database(abc.ABC):
     def _do_get_doc(self, document_id, OnMissing="error", **kwargs):
         pass
 
-    def remove_docs(self, document_ids, branch_id=None, **kwargs):
+    def remove_docs(
+        self, document_ids, branch_id=None, cascade=False, dry_run=False, **kwargs
+    ):
+        """Remove documents from a branch.
+
+        With cascade=True every document that depends on them, directly or
+        through other documents, is removed too, in one step. With
+        dry_run=True nothing is removed. In both cases the ids that are (or
+        would be) removed are returned.
+        """
         if not isinstance(document_ids, list):
             document_ids = [document_ids]
 
         if branch_id is None:
             branch_id = self.current_branch_id
-
+        if not dry_run:
+            self._check_not_frozen(branch_id)
+
+        if not cascade and not dry_run:
+            index = self._dependency_indexes.get(branch_id)
+            for doc_id in document_ids:
+                self._do_remove_doc(doc_id, branch_id, **kwargs)
+                if index is not None:
+                    index.remove(doc_id)
+            return None
+
+        present = self._existing_doc_ids(document_ids, branch_id)
+        absent = [doc_id for doc_id in document_ids if doc_id not in present]
+        on_missing = kwargs.get("OnMissing", "error").lower()
+        if absent and on_missing == "warn":
+            print(f"Warning: Document ids {absent} not found for removal.")
+        elif absent and on_missing != "ignore":
+            raise ValueError(f"Document ids {absent} not found for removal.")
+
+        seeds = [doc_id for doc_id in dict.fromkeys(document_ids) if doc_id in present]
+        removed = list(seeds)
+        if cascade and seeds:
+            removed += self._dependents_closure(seeds, branch_id)
+        if dry_run or not removed:
+            return removed
+
+        self._do_remove_docs(removed, branch_id)
+        index = self._dependency_indexes.get(branch_id)
+        if index is not None:
+            for doc_id in removed:
+                index.remove(doc_id)
+        return removed
+
+    def _do_remove_docs(self, document_ids, branch_id):
+        """Remove documents known to be in the branch; implementations batch this."""
         for doc_id in document_ids:
-            self._do_remove_doc(doc_id, branch_id, **kwargs)
+            self._do_remove_doc(doc_id, branch_id)
+
+    def _dependents_closure(self, doc_ids, branch_id):
+        """Return the ids in the branch that depend on doc_ids, transitively."""
+        children = {}
+        for doc_id, deps in self._declared_dependencies(branch_id).items():
+            for dep in deps:
+                children.setdefault(dep, []).append(doc_id)
+        seen = set(doc_ids)
+        closure = []
+        frontier = list(doc_ids)
+        while frontier:
+            next_frontier = []
+            for doc_id in frontier:
+                for child in children.get(doc_id, ()):
+                    if child not in seen:
+                        seen.add(child)
+                        closure.append(child)
+                        next_frontier.append(child)
+            frontier = next_frontier
+        return closure
 
     @abc.abstractmethod
     def _do_remove_doc(self, document_id, branch_id, **kwargs):
@@ -153,12 +315,55 @@ class Database(abc.ABC):
 
     def delete_branch(self, branch_id):
         # Validation logic would go here
+        self._check_not_frozen(branch_id)
         self._do_delete_branch(branch_id)
+        index = self._dependency_indexes.pop(branch_id, None)
+        if index is not None:
+            index.invalidate()
 
     @abc.abstractmethod
     def _do_delete_branch(self, branch_id):
         pass
 
+    def dependency_index(self, branch_id=None):
+        """Return the in-memory dependency graph of a branch.
+
+        The index is built on first use and from then on updated in place by
+        add_docs, remove_docs and update_doc, so repeated parent and child
+        lookups do not touch the database. See did.dependency_index.
+        """
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        index = self._dependency_indexes.get(branch_id)
+        if index is None:
+            index = DependencyIndex(branch_id, self._declared_dependencies)
+            self._dependency_indexes[branch_id] = index
+        return index
+
+    def drop_dependency_index(self, branch_id=None):
+        """Stop maintaining the dependency index of a branch."""
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        self._dependency_indexes.pop(branch_id, None)
+
+    def _invalidate_dependency_index(self, branch_id):
+        index = self._dependency_indexes.get(branch_id)
+        if index is not None:
+            index.invalidate()
+
+    def _declared_dependencies(self, branch_id):
+        """Return {doc_id: set of ids it depends on} for a branch.
+
+        Loads every document; implementations can read this from an index.
+        """
+        doc_ids = self.get_doc_ids(branch_id)
+        docs = self.get_docs(doc_ids, OnMissing="ignore") if doc_ids else []
+        if not isinstance(docs, list):
+            docs = [docs]
+        return {
+            doc.id(): dependency_ids(doc.document_properties) for doc in docs if doc
+        }
+
     def get_sub_branches(self, branch_id=None):
         if branch_id is None:
             branch_id = self.current_branch_id
@@ -0,0 +1,232 @@
+from collections import deque
+from collections.abc import Mapping
+
+
+def dependency_ids(document_properties):
+    """Return the ids a document's depends_on entries refer to."""
+    depends_on = document_properties.get("depends_on") or []
+    if isinstance(depends_on, Mapping):
+        depends_on = [depends_on]
+    return {
+        str(dep.get("value"))
+        for dep in depends_on
+        if isinstance(dep, Mapping) and dep.get("value")
+    }
+
+
+def order_by_dependencies(document_objs):
+    """Sort documents so each comes after the documents it depends on.
+
+    Only dependencies within document_objs are considered; otherwise the
+    input order is kept. Raises ValueError if they depend on each other in a
+    cycle.
+    """
+    position = {doc.id(): i for i, doc in enumerate(document_objs)}
+    blocked_by = [0] * len(document_objs)
+    unblocks = [[] for _ in document_objs]
+    for i, doc in enumerate(document_objs):
+        for dep in dependency_ids(doc.document_properties):
+            j = position.get(dep)
+            if j is not None and j != i:
+                blocked_by[i] += 1
+                unblocks[j].append(i)
+
+    ready = deque(i for i, n in enumerate(blocked_by) if n == 0)
+    order = []
+    while ready:
+        i = ready.popleft()
+        order.append(document_objs[i])
+        for k in unblocks[i]:
+            blocked_by[k] -= 1
+            if blocked_by[k] == 0:
+                ready.append(k)
+    if len(order) != len(document_objs):
+        raise ValueError("The documents' dependencies contain a cycle.")
+    return order
+
+
+class DependencyIndex:
+    """An in-memory dependency graph of one branch, kept up to date in place.
+
+    Obtain one with Database.dependency_index(branch_id). It is built once
+    from the database and then updated by the database whenever documents
+    are added to, removed from or updated in the branch, so lookups never
+    touch the database.
+
+    An edge runs from a document to each document it depends on that is in
+    the branch. References to documents that are not in the branch are kept
+    and become edges when such a document is added. version is incremented
+    on every change.
+    """
+
+    def __init__(self, branch_id, loader):
+        self.branch_id = branch_id
+        self.version = 0
+        self._loader = loader
+        self._stale = True
+        self._declared = {}  # doc_id -> set of ids it depends on
+        self._parents = {}  # doc_id -> set of present dependencies
+        self._children = {}  # doc_id -> set of present dependents
+        self._waiting = {}  # missing doc_id -> set of doc_ids that reference it
+        self._cache = {}  # name -> derived result at _cache_version
+        self._cache_version = None
+        self._ensure()
+
+    # --- Maintenance ---
+
+    def _ensure(self):
+        if self._stale:
+            self._stale = False
+            declared = self._loader(self.branch_id)
+            self._declared = {}
+            self._parents = {doc_id: set() for doc_id in declared}
+            self._children = {doc_id: set() for doc_id in declared}
+            self._waiting = {}
+            for doc_id, deps in declared.items():
+                self._link(doc_id, deps)
+            self.version += 1
+
+    def invalidate(self):
+        """Rebuild from the database on next use."""
+        self._stale = True
+        self._cache = {}
+        self.version += 1
+
+    def _link(self, doc_id, deps):
+        deps = set(deps)
+        deps.discard(doc_id)
+        self._declared[doc_id] = deps
+        for dep in deps:
+            if dep in self._parents:
+                self._parents[doc_id].add(dep)
+                self._children[dep].add(doc_id)
+            else:
+                self._waiting.setdefault(dep, set()).add(doc_id)
+
+    def _unlink(self, doc_id):
+        for dep in self._declared.pop(doc_id, ()):
+            if dep in self._children:
+                self._children[dep].discard(doc_id)
+            else:
+                waiting = self._waiting.get(dep)
+                if waiting is not None:
+                    waiting.discard(doc_id)
+                    if not waiting:
+                        del self._waiting[dep]
+        self._parents[doc_id] = set()
+
+    def add(self, doc_id, deps=()):
+        """Add a document and the ids it depends on."""
+        if self._stale:
+            return
+        if doc_id in self._parents:
+            return
+        self._parents[doc_id] = set()
+        self._children[doc_id] = set()
+        # Documents that were waiting for this one now have an edge to it
+        for dependent in self._waiting.pop(doc_id, ()):
+            self._parents[dependent].add(doc_id)
+            self._children[doc_id].add(dependent)
+        self._link(doc_id, deps)
+        self.version += 1
+
+    def remove(self, doc_id):
+        """Remove a document; its dependents keep waiting for it."""
+        if self._stale or doc_id not in self._parents:
+            return
+        self._unlink(doc_id)
+        for dependent in self._children.pop(doc_id):
+            self._parents[dependent].discard(doc_id)
+            self._waiting.setdefault(doc_id, set()).add(dependent)
+        del self._parents[doc_id]
+        self.version += 1
+
+    def update(self, doc_id, deps):
+        """Replace the dependencies of a document already in the index."""
+        if self._stale or doc_id not in self._parents:
+            return
+        if set(deps) - {doc_id} == self._declared.get(doc_id, set()):
+            return
+        self._unlink(doc_id)
+        self._link(doc_id, deps)
+        self.version += 1
+
+    # --- Lookups ---
+
+    def __contains__(self, doc_id):
+        self._ensure()
+        return doc_id in self._parents
+
+    def __len__(self):
+        self._ensure()
+        return len(self._parents)
+
+    def parents(self, doc_id):
+        """Return the ids of the branch documents doc_id depends on."""
+        self._ensure()
+        return set(self._parents.get(doc_id, ()))
+
+    def children(self, doc_id):
+        """Return the ids of the branch documents that depend on doc_id."""
+        self._ensure()
+        return set(self._children.get(doc_id, ()))
+
+    def missing(self):
+        """Return {missing_id: set of doc_ids that depend on it}."""
+        self._ensure()
+        return {k: set(v) for k, v in self._waiting.items()}
+
+    def _cached(self, name, compute):
+        self._ensure()
+        if self._cache_version != self.version:
+            self._cache.clear()
+            self._cache_version = self.version
+        if name not in self._cache:
+            self._cache[name] = compute()
+        return self._cache[name]
+
+    def topological_order(self):
+        """Return all ids with every document after the documents it depends on.
+
+        Raises ValueError if the dependencies contain a cycle.
+        """
+
+        def compute():
+            remaining = {doc_id: len(p) for doc_id, p in self._parents.items()}
+            queue = deque(sorted(d for d, n in remaining.items() if n == 0))
+            order = []
+            while queue:
+                doc_id = queue.popleft()
+                order.append(doc_id)
+                for child in sorted(self._children[doc_id]):
+                    remaining[child] -= 1
+                    if remaining[child] == 0:
+                        queue.append(child)
+            if len(order) != len(remaining):
+                raise ValueError("The dependency graph contains a cycle.")
+            return order
+
+        return list(self._cached("topological_order", compute))
+
+    def connected_components(self):
+        """Return the weakly connected components as a list of sets of ids."""
+
+        def compute():
+            seen = set()
+            components = []
+            for start in self._parents:
+                if start in seen:
+                    continue
+                component = {start}
+                queue = deque([start])
+                while queue:
+                    doc_id = queue.popleft()
+                    for other in self._parents[doc_id] | self._children[doc_id]:
+                        if other not in component:
+                            component.add(other)
+                            queue.append(other)
+                seen |= component
+                components.append(component)
+            return components
+
+        return [set(c) for c in self._cached("connected_components", compute)]
@@ -1,14 +1,63 @@
 import json
 import os
+import sys
+from collections.abc import Mapping
 from datetime import datetime
+from types import MappingProxyType
 from . import datastructures
 from . import ido
 from .common import PathConstants
 
 
+def interned_dict(pairs):
+    """Build a dict with interned keys; usable as a json object_pairs_hook.
+
+    Documents of the same class repeat the same key strings, so interning
+    lets every document share one copy of each key.
+    """
+    intern = sys.intern
+    return {intern(k): v for k, v in pairs}
+
+
+def intern_keys(value):
+    """Return a copy of a JSON-like tree with all dict keys interned."""
+    if isinstance(value, Mapping):
+        intern = sys.intern
+        return {intern(k): intern_keys(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [intern_keys(v) for v in value]
+    return value
+
+
+def freeze(value):
+    """Return an immutable view of a JSON-like tree.
+
+    Dicts become read-only MappingProxyType views with interned keys and
+    lists become tuples. Frozen properties can be shared safely between
+    documents, but must be thawed before they are modified or serialized.
+    """
+    if isinstance(value, Mapping):
+        intern = sys.intern
+        return MappingProxyType({intern(k): freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Return a mutable copy of a tree produced by freeze."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
 class Document:
+    __slots__ = ("document_properties",)
+
     def __init__(self, document_type="base", **kwargs):
-        if isinstance(document_type, dict):
+        if isinstance(document_type, Mapping):
             self.document_properties = document_type
         else:
             self.document_properties = self.read_blank_definition(document_type)
@@ -31,9 +80,100 @@ class Document:
 
             self._reset_file_info()
 
+    @classmethod
+    def create_many(cls, document_type="base", n=None, **columnar_fields):
+        """Create many documents of one class from column arrays.
+
+        Each keyword argument maps a (possibly dotted) field path to a list or
+        NumPy array holding one value per document, e.g.
+        ``Document.create_many("demoA", 3, **{"demoA.value": [1, 2, 3]})``.
+        The blank definition is read and the field paths are resolved once for
+        the whole batch; ids are generated in bulk and all documents share a
+        single datestamp. The returned list can be passed directly to
+        ``Database.add_docs``.
+        """
+        columns = {}
+        for key, values in columnar_fields.items():
+            if hasattr(values, "tolist"):
+                values = values.tolist()
+            elif not isinstance(values, list):
+                values = list(values)
+            if n is None:
+                n = len(values)
+            if len(values) != n:
+                raise ValueError(
+                    f"Column '{key}' has {len(values)} values, expected {n}."
+                )
+            columns[key] = values
+        if n is None:
+            raise ValueError("n must be given when no columns are provided.")
+
+        template = cls.read_blank_definition(document_type)
+        template.setdefault("base", {})
+
+        # Resolve every path against the template once, creating intermediate
+        # dicts the same way __init__ does, and remember the parent key path.
+        plans = []
+        for key, values in columns.items():
+            path = key.split(".")
+            if len(path) == 1:
+                if key in template:
+                    plans.append(((), key, values))
+                continue
+            d = template
+            for p in path[:-1]:
+                if not isinstance(d.get(p), dict):
+                    d[p] = {}
+                d = d[p]
+            d[path[-1]] = None
+            plans.append((tuple(path[:-1]), path[-1], values))
+
+        blank = cls(template)
+        blank._reset_file_info()
+        template_json = json.dumps(blank.document_properties)
+
+        ids = ido.IDO.unique_ids(n)
+        datestamp = str(datetime.utcnow())
+
+        docs = []
+        for i in range(n):
+            props = json.loads(template_json)
+            props["base"]["id"] = ids[i]
+            props["base"]["datestamp"] = datestamp
+            for parents, leaf, values in plans:
+                d = props
+                for p in parents:
+                    d = d[p]
+                d[leaf] = values[i]
+            docs.append(cls(props))
+        return docs
+
     def id(self):
         return self.document_properties.get("base", {}).get("id")
 
+    def compact(self, frozen=False):
+        """Reduce the memory held by this document's properties.
+
+        Dict keys are interned so that they are shared with every other
+        compacted document. With frozen=True the properties also become an
+        immutable view (see freeze); call thaw() before modifying them.
+        Returns self.
+        """
+        if frozen:
+            self.document_properties = freeze(self.document_properties)
+        else:
+            self.document_properties = intern_keys(self.document_properties)
+        return self
+
+    def is_frozen(self):
+        return isinstance(self.document_properties, MappingProxyType)
+
+    def thaw(self):
+        """Replace frozen properties with a mutable copy. Returns self."""
+        if self.is_frozen():
+            self.document_properties = thaw(self.document_properties)
+        return self
+
     def set_properties(self, **kwargs):
         for key, value in kwargs.items():
             # This is a simplified way to set properties. A full implementation
@@ -58,10 +198,13 @@ class Document:
         """Normalize file_info to a list.
 
         MATLAB's jsonencode converts single-element cell arrays to scalars,
-        so file_info may arrive as a bare dict instead of a list.
+        so file_info may arrive as a bare dict instead of a list. Frozen
+        documents hold it as a tuple of read-only mappings.
         """
-        if isinstance(file_info, dict):
+        if isinstance(file_info, Mapping):
             return [file_info] if file_info else []
+        if isinstance(file_info, tuple):
+            return list(file_info)
         if not isinstance(file_info, list):
             return []
         return file_info
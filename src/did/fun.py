@@ -1,3 +1,7 @@
+import hashlib
+import math
+from collections import OrderedDict
+
 import networkx as nx
 
 
@@ -8,8 +12,8 @@ def docs_to_graph(document_objs):
     This function mimics the behavior of the Matlab `docs2graph` function.
     """
     g = nx.DiGraph()
-    nodes = [doc.id() for doc in document_objs]
-    g.add_nodes_from(nodes)
+    nodes = {doc.id() for doc in document_objs}
+    g.add_nodes_from(doc.id() for doc in document_objs)
 
     for doc in document_objs:
         here_node = doc.id()
@@ -36,21 +40,32 @@ def find_all_dependencies(graph, doc_ids):
     return list(all_deps)
 
 
-def find_docs_missing_dependencies(db, *dependency_names):
-    """
-    Finds documents that have dependencies on documents that do not exist.
+def find_docs_missing_dependencies(db, *dependency_names, branch_id=None):
     """
-    from .query import Query
-
-    q = Query("depends_on", "hasfield", "", "")
-    docs_with_deps = db.search(q)
+    Finds dependencies on documents that do not exist in a branch.
 
-    missing_deps_docs = []
+    Returns a list of (doc_id, dep_name, missing_id) tuples, one per depends_on
+    entry whose target is missing. If dependency_names are given, only those
+    depends_on names are checked. Databases that provide
+    find_missing_dependencies (such as SQLiteDB) answer this in a single query;
+    for others the branch's documents are loaded and checked one by one.
+    """
+    if hasattr(db, "find_missing_dependencies"):
+        return db.find_missing_dependencies(dependency_names, branch_id=branch_id)
 
-    all_doc_ids = db.all_doc_ids()
+    doc_ids = db.get_doc_ids(branch_id)
+    present = set(doc_ids)
+    docs = db.get_docs(doc_ids, OnMissing="ignore") if doc_ids else []
+    if not isinstance(docs, list):
+        docs = [docs]
 
-    for doc in docs_with_deps:
+    missing = []
+    for doc in docs:
+        if doc is None:
+            continue
         dependencies = doc.document_properties.get("depends_on", [])
+        if isinstance(dependencies, dict):
+            dependencies = [dependencies]
         for dep in dependencies:
             dep_name = dep.get("name")
             dep_value = dep.get("value")
@@ -58,50 +73,232 @@ def find_docs_missing_dependencies(db, *dependency_names):
             if dependency_names and dep_name not in dependency_names:
                 continue
 
-            if dep_value and dep_value not in all_doc_ids:
-                missing_deps_docs.append(doc)
-                break  # Move to the next document
+            if dep_value and dep_value not in present:
+                missing.append((doc.id(), dep_name, dep_value))
+
+    return missing
+
 
-    return missing_deps_docs
+# Layouts of recently plotted graphs, keyed by graph contents and layout name
+_LAYOUT_CACHE = OrderedDict()
+_LAYOUT_CACHE_SIZE = 8
 
 
-def plot_interactive_doc_graph(docs, g, layout="spring"):
+def _graph_key(g, layout):
+    digest = hashlib.sha1(layout.encode("utf-8"))
+    for node in sorted(map(str, g.nodes)):
+        digest.update(node.encode("utf-8") + b"\0")
+    digest.update(b"\1")
+    for a, b in sorted((str(a), str(b)) for a, b in g.edges):
+        digest.update(a.encode("utf-8") + b"\0" + b.encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+def graph_layout(g, layout="spring"):
+    """
+    Returns node positions for a graph, reusing the layout of identical graphs.
+
+    The cache is keyed by the graph's nodes and edges, so plotting the same
+    graph again does not recompute the (slow) layout.
+    """
+    key = _graph_key(g, layout)
+    pos = _LAYOUT_CACHE.get(key)
+    if pos is None:
+        if layout == "layered":
+            pos = nx.nx_agraph.graphviz_layout(g, prog="dot")
+        else:
+            pos = nx.spring_layout(g, seed=0)
+        _LAYOUT_CACHE[key] = pos
+        while len(_LAYOUT_CACHE) > _LAYOUT_CACHE_SIZE:
+            _LAYOUT_CACHE.popitem(last=False)
+    else:
+        _LAYOUT_CACHE.move_to_end(key)
+    return pos
+
+
+class NodeLocator:
+    """
+    Finds the node nearest to a point using a uniform grid over the layout.
+
+    Nodes are bucketed into square cells holding about one node each, so a
+    lookup only inspects the cells around the point.
+    """
+
+    def __init__(self, pos):
+        self.pos = pos
+        self.cells = {}
+        if not pos:
+            self.cell_size = 1.0
+            return
+        xs = [p[0] for p in pos.values()]
+        ys = [p[1] for p in pos.values()]
+        extent = max(max(xs) - min(xs), max(ys) - min(ys)) or 1.0
+        self.cell_size = extent / max(1.0, math.sqrt(len(pos)))
+        for node, (x, y) in pos.items():
+            self.cells.setdefault(self._cell(x, y), []).append(node)
+        kxs = [k[0] for k in self.cells]
+        kys = [k[1] for k in self.cells]
+        self.bounds = (min(kxs), max(kxs), min(kys), max(kys))
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _ring(self, cx, cy, ring):
+        """Yields the cells on the perimeter of a ring, clipped to the bounds."""
+        if ring == 0:
+            yield cx, cy
+            return
+        min_kx, max_kx, min_ky, max_ky = self.bounds
+        x0, x1 = max(cx - ring, min_kx), min(cx + ring, max_kx)
+        y0, y1 = max(cy - ring + 1, min_ky), min(cy + ring - 1, max_ky)
+        for ky in (cy - ring, cy + ring):
+            if min_ky <= ky <= max_ky:
+                for kx in range(x0, x1 + 1):
+                    yield kx, ky
+        for kx in (cx - ring, cx + ring):
+            if min_kx <= kx <= max_kx:
+                for ky in range(y0, y1 + 1):
+                    yield kx, ky
+
+    def nearest(self, x, y):
+        """Returns the node closest to (x, y), or None if there are no nodes."""
+        if not self.cells:
+            return None
+        cx, cy = self._cell(x, y)
+        best, best_dist = None, float("inf")
+        min_kx, max_kx, min_ky, max_ky = self.bounds
+        # Rings closer than the occupied bounds hold no cells
+        ring = max(0, min_kx - cx, cx - max_kx, min_ky - cy, cy - max_ky)
+        max_ring = max(cx - min_kx, max_kx - cx, cy - min_ky, max_ky - cy)
+        while ring <= max_ring:
+            for key in self._ring(cx, cy, ring):
+                for node in self.cells.get(key, ()):
+                    px, py = self.pos[node]
+                    dist = (px - x) ** 2 + (py - y) ** 2
+                    if dist < best_dist:
+                        best, best_dist = node, dist
+            # Cells further out are at least ring * cell_size away
+            if best is not None and best_dist <= (ring * self.cell_size) ** 2:
+                break
+            ring += 1
+        return best
+
+
+def _doc_class(doc):
+    try:
+        return doc.document_properties["document_class"]["class_name"]
+    except (KeyError, TypeError):
+        return "unknown"
+
+
+def cluster_by_class(g, pos, docs_by_id):
+    """
+    Collapses a graph into one node per document class.
+
+    Returns (cluster_pos, sizes, edges): the centroid of each class's nodes,
+    the number of nodes per class, and {(class_a, class_b): count} for the
+    edges between classes.
+    """
+    members = {}
+    for node in g.nodes:
+        cls = _doc_class(docs_by_id.get(node))
+        members.setdefault(cls, []).append(node)
+    cluster_pos = {
+        cls: (
+            sum(pos[n][0] for n in nodes) / len(nodes),
+            sum(pos[n][1] for n in nodes) / len(nodes),
+        )
+        for cls, nodes in members.items()
+    }
+    sizes = {cls: len(nodes) for cls, nodes in members.items()}
+    node_class = {n: cls for cls, nodes in members.items() for n in nodes}
+    edges = {}
+    for a, b in g.edges:
+        key = (node_class[a], node_class[b])
+        if key[0] != key[1]:
+            edges[key] = edges.get(key, 0) + 1
+    return cluster_pos, sizes, edges
+
+
+def plot_interactive_doc_graph(docs, g, layout="spring", max_nodes=2000):
     """
     Plots an interactive document graph.
 
     This function mimics the behavior of the Matlab `plotinteractivedocgraph` function.
+    Layouts are cached per graph, and clicks are resolved through a spatial
+    index. Graphs with more than max_nodes nodes are first drawn as one node
+    per document class; zooming in until at most max_nodes nodes are in view
+    draws those nodes individually.
     """
     import matplotlib.pyplot as plt
 
     fig, ax = plt.subplots()
 
-    if layout == "layered":
-        pos = nx.nx_agraph.graphviz_layout(g, prog="dot")
-    else:
-        pos = nx.spring_layout(g)
+    pos = graph_layout(g, layout)
+    locator = NodeLocator(pos)
+    docs_by_id = {doc.id(): doc for doc in docs}
+
+    def draw_nodes(nodes):
+        nx.draw(g.subgraph(nodes), pos, with_labels=len(nodes) <= 200, ax=ax)
+
+    def draw_clusters():
+        cluster_pos, sizes, cluster_edges = cluster_by_class(g, pos, docs_by_id)
+        cg = nx.DiGraph()
+        cg.add_nodes_from(cluster_pos)
+        cg.add_edges_from(cluster_edges)
+        largest = max(sizes.values())
+        nx.draw(
+            cg,
+            cluster_pos,
+            ax=ax,
+            with_labels=True,
+            labels={cls: f"{cls} ({n})" for cls, n in sizes.items()},
+            node_size=[300 + 2700 * sizes[cls] / largest for cls in cg.nodes],
+        )
 
-    nx.draw(g, pos, with_labels=True, ax=ax)
+    state = {"redrawing": False}
+
+    def on_zoom(axes):
+        # Level of detail: individual nodes once few enough of them are visible
+        if state["redrawing"]:
+            return
+        xlim, ylim = axes.get_xlim(), axes.get_ylim()
+        x0, x1 = sorted(xlim)
+        y0, y1 = sorted(ylim)
+        visible = [n for n, (x, y) in pos.items() if x0 <= x <= x1 and y0 <= y <= y1]
+        state["redrawing"] = True
+        try:
+            # Remove the drawn artists; Axes.clear() would also drop the callbacks
+            for artist in (
+                list(axes.collections) + list(axes.patches) + list(axes.texts)
+            ):
+                artist.remove()
+            if len(visible) <= max_nodes:
+                draw_nodes(visible)
+            else:
+                draw_clusters()
+            axes.set_xlim(xlim)
+            axes.set_ylim(ylim)
+        finally:
+            state["redrawing"] = False
+
+    if g.number_of_nodes() > max_nodes:
+        draw_clusters()
+        ax.callbacks.connect("xlim_changed", on_zoom)
+        ax.callbacks.connect("ylim_changed", on_zoom)
+    else:
+        draw_nodes(list(g.nodes))
 
     def on_click(event):
         if event.inaxes is None:
             return
 
         # Find the closest node to the click
-        min_dist = float("inf")
-        closest_node = None
-        for node, (x, y) in pos.items():
-            dist = (x - event.xdata) ** 2 + (y - event.ydata) ** 2
-            if dist < min_dist:
-                min_dist = dist
-                closest_node = node
+        closest_node = locator.nearest(event.xdata, event.ydata)
 
         if closest_node:
             # Find the corresponding document
-            clicked_doc = None
-            for doc in docs:
-                if doc.id() == closest_node:
-                    clicked_doc = doc
-                    break
+            clicked_doc = docs_by_id.get(closest_node)
 
             if clicked_doc:
                 print(f"Clicked node: {closest_node}")
@@ -20,6 +20,14 @@ class IDO:
         # Using UUID4 for simplicity and robustness
         return str(uuid.uuid4())
 
+    @staticmethod
+    def unique_ids(n):
+        """
+        Generates a list of n unique IDs.
+        """
+        uuid4 = uuid.uuid4
+        return [str(uuid4()) for _ in range(n)]
+
     @staticmethod
     def is_valid(id_value):
         """
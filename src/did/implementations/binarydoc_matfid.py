@@ -1,41 +1,189 @@
+import math
+import re
+
+import numpy as np
+
 from ..binarydoc import BinaryDoc
-from ..file import Fileobj
+from ..file import Fileobj, machine_format_byteorder, matlab_type_code
+
+_PRECISION_RE = re.compile(
+    r"^\s*(?:(\d+)\s*\*\s*)?(\*)?\s*([^=]+?)\s*(?:=>\s*(.+?))?\s*$"
+)
+
+
+def parse_precision(precision):
+    """
+    Parses a MATLAB fread/fwrite precision string.
+
+    Accepts 'type', '*type', 'in=>out' and a leading block count 'N*'.
+    Returns (block, in_type, out_type): block is the number of values read
+    or written between skips, in_type is the NumPy type code stored in the
+    file, and out_type is the type code to return, or "char" for text. As in
+    MATLAB, a bare 'type' returns doubles and '*type' returns the input type.
+    """
+    match = _PRECISION_RE.match(precision)
+    if not match:
+        raise ValueError(f"Invalid precision '{precision}'.")
+    block, same, in_name, out_name = match.groups()
+    in_type = matlab_type_code(in_name)
+    if out_name is not None:
+        out_type = (
+            "char" if out_name.strip().lower() == "char" else matlab_type_code(out_name)
+        )
+    elif same:
+        out_type = "char" if in_name.strip().lower() == "char" else in_type
+    else:
+        out_type = "f8"
+    return int(block) if block else 1, in_type, out_type
 
 
 class BinaryDocMatfid(BinaryDoc, Fileobj):
     def __init__(self, key="", doc_unique_id="", **kwargs):
-        super().__init__(**kwargs)
+        # BinaryDoc comes first in the MRO but does not chain __init__
+        BinaryDoc.__init__(self)
+        Fileobj.__init__(self, **kwargs)
         self.key = key
         self.doc_unique_id = doc_unique_id
         # Ensure machine format is little-endian for cross-platform compatibility
         self.machineformat = "l"
 
     def fclose(self):
-        super().fclose()
+        Fileobj.fclose(self)
         # Reset properties after closing
         self.permission = "r"
 
-    # The abstract methods from BinaryDoc would be implemented here,
-    # likely by calling the corresponding methods of the Fileobj superclass.
+    # The abstract methods of BinaryDoc are implemented by the Fileobj
+    # superclass; BinaryDoc precedes it in the MRO, so call Fileobj directly.
 
-    def fopen(self):
-        return super().fopen()
+    def fopen(self, permission=None, machineformat=None, filename=None):
+        return Fileobj.fopen(self, permission, machineformat, filename)
 
     def fseek(self, location, reference):
-        return super().fseek(location, reference)
+        return Fileobj.fseek(self, location, reference)
 
     def ftell(self):
-        return super().ftell()
+        return Fileobj.ftell(self)
 
     def feof(self):
-        return super().feof()
+        return Fileobj.feof(self)
+
+    def _dtype(self, type_code):
+        return np.dtype(type_code).newbyteorder(
+            machine_format_byteorder(self.machineformat)
+        )
 
     def fwrite(self, data, precision=None, skip=0):
-        # The precision and skip parameters would need to be handled
-        # using Python's struct module for a full implementation.
-        return super().fwrite(data)
+        """
+        Writes data with a MATLAB precision, returning the number of values written.
+
+        Without a precision, data is written as raw bytes. skip is the number
+        of bytes passed over before each value (or each block of N values for
+        'N*type'); the bytes skipped keep their previous contents.
+        """
+        if precision is None:
+            return Fileobj.fwrite(self, data)
+        if not self.fid:
+            return 0
+
+        block, in_type, _ = parse_precision(precision)
+        dtype = self._dtype(in_type)
+        if isinstance(data, str):
+            data = np.frombuffer(data.encode("latin-1"), dtype="u1")
+        values = np.asarray(data).ravel(order="F").astype(dtype)
+
+        if skip == 0:
+            values.tofile(self.fid)
+            return values.size
+
+        # Lay the values out in a buffer of [skip bytes, block values] records
+        n_blocks = math.ceil(values.size / block)
+        record = skip + block * dtype.itemsize
+        start = self.fid.tell()
+        buffer = np.zeros(n_blocks * record, dtype="u1")
+        if self.fid.readable():
+            existing = np.frombuffer(self.fid.read(buffer.size), dtype="u1")
+            buffer[: existing.size] = existing
+            self.fid.seek(start)
+        layout = np.dtype(
+            {
+                "names": ["v"],
+                "formats": [(dtype, (block,))],
+                "offsets": [skip],
+                "itemsize": record,
+            }
+        )
+        slots = buffer.view(layout)["v"].reshape(-1)
+        slots[: values.size] = values
+        # The last block may be partial; write nothing past its last value
+        end = (n_blocks - 1) * record + skip
+        end += (values.size - (n_blocks - 1) * block) * dtype.itemsize
+        buffer[:end].tofile(self.fid)
+        return values.size
 
     def fread(self, count=-1, precision=None, skip=0):
-        # The precision and skip parameters would need to be handled
-        # using Python's struct module for a full implementation.
-        return super().fread(count)
+        """
+        Reads data with a MATLAB precision such as 'int16', '*uint8' or 'N*double=>single'.
+
+        Without a precision, raw bytes are returned as before. count is a
+        number of values (-1 or inf for all) or a shape (m, n), filled in
+        column-major order as in MATLAB, where n may be inf. skip is the
+        number of bytes passed over after each value, or after each block of
+        N values for 'N*type'. Returns a NumPy array, or a str for char output.
+        """
+        if precision is None:
+            return Fileobj.fread(self, count)
+        if not self.fid:
+            return np.empty(0)
+
+        shape = None
+        if isinstance(count, (tuple, list)):
+            shape = tuple(count)
+            rows, cols = shape
+            count = -1 if cols is None or math.isinf(cols) else int(rows * cols)
+        elif count is None or (isinstance(count, float) and math.isinf(count)):
+            count = -1
+        count = int(count)
+
+        block, in_type, out_type = parse_precision(precision)
+        dtype = self._dtype(in_type)
+
+        if skip == 0:
+            values = np.fromfile(self.fid, dtype=dtype, count=count)
+        else:
+            record = block * dtype.itemsize + skip
+            start = self.fid.tell()
+            if count < 0:
+                raw = self.fid.read()
+            else:
+                raw = self.fid.read(math.ceil(count / block) * record)
+            n_full, rest = divmod(len(raw), record)
+            n_values = n_full * block + min(block, rest // dtype.itemsize)
+            if count >= 0:
+                n_values = min(n_values, count)
+            padded = np.zeros((n_full + 1) * record, dtype="u1")
+            padded[: len(raw)] = np.frombuffer(raw, dtype="u1")
+            layout = np.dtype(
+                {
+                    "names": ["v"],
+                    "formats": [(dtype, (block,))],
+                    "offsets": [0],
+                    "itemsize": record,
+                }
+            )
+            values = padded.view(layout)["v"].reshape(-1)[:n_values].copy()
+            # Leave the file after the last value read and its skip
+            full_blocks, partial = divmod(n_values, block)
+            position = start + full_blocks * record + partial * dtype.itemsize
+            self.fid.seek(min(position, start + len(raw)))
+
+        if shape is not None:
+            rows = int(shape[0])
+            if values.size % rows:
+                values = np.concatenate(
+                    [values, np.zeros(rows - values.size % rows, dtype=values.dtype)]
+                )
+            values = values.reshape((rows, -1), order="F")
+
+        if out_type == "char":
+            return values.astype("u1").tobytes().decode("latin-1")
+        return values.astype(out_type)
@@ -201,3 +201,123 @@ def doc_to_sql(doc):
             meta_tables.append(table)
 
     return meta_tables
+
+
+class FlatteningPlan:
+    """Cached flattening state shared by all documents of one class.
+
+    Holds the superclass strings already computed for this class, the mapping
+    from (group, column) to the dotted field_name stored in the fields table,
+    the group each field_name belongs to, and a field_idx lookup that a
+    database can fill in as it assigns indices.
+    """
+
+    def __init__(self, class_name):
+        self.class_name = class_name
+        self.superclass = {}  # superclass key -> superclass string
+        self.names = {}  # (group, column) -> field_name
+        self.groups = {}  # field_name -> group
+        self.field_idx = {}  # field_name -> field_idx
+
+
+def _superclass_key(doc_props):
+    """Return a hashable key that determines _get_superclass_str's result."""
+    sc = doc_props.get("superclasses")
+    if isinstance(sc, (list, dict)):
+        key = ["top"]
+    else:
+        key = ["document_class"]
+        dc = doc_props.get("document_class")
+        sc = dc.get("superclasses") if isinstance(dc, dict) else None
+    if isinstance(sc, dict):
+        sc = [sc]
+    if isinstance(sc, list):
+        for item in sc:
+            if isinstance(item, str):
+                key.append(item)
+            elif isinstance(item, dict) and "definition" in item:
+                key.append(("definition", item["definition"]))
+    return tuple(key)
+
+
+_META_COLUMNS = (
+    "class",
+    "superclass",
+    "datestamp",
+    "creation",
+    "deletion",
+    "depends_on",
+)
+
+
+def flattening_plan(doc_props, plans):
+    """Return the FlatteningPlan for doc_props' class, creating it in plans."""
+    class_name = _get_class_name(doc_props)
+    plan = plans.get(class_name)
+    if plan is None:
+        plan = plans[class_name] = FlatteningPlan(class_name)
+    return plan
+
+
+def _numeric_value(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _iter_group(plan, group, d, prefix):
+    names = plan.names
+    for key, value in d.items():
+        col_name = f"{prefix}___{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from _iter_group(plan, group, value, col_name)
+            continue
+        if col_name == "doc_id":
+            continue
+        field_name = names.get((group, col_name))
+        if field_name is None:
+            field_name = f"{group}.{col_name}".replace("___", ".")
+            names[(group, col_name)] = field_name
+            plan.groups.setdefault(field_name, group)
+        if isinstance(value, list):
+            yield field_name, str(value), None
+        else:
+            yield field_name, value, _numeric_value(value)
+
+
+def iter_doc_fields(doc_props, plan=None):
+    """Stream the flattened fields of a document in a single pass.
+
+    Yields (field_name, value, numeric_value) tuples for exactly the columns
+    that doc_to_sql produces (excluding doc_id columns), in the same order.
+    field_name is the dotted name used in the fields table (e.g. 'meta.class',
+    'demoA.value'); numeric_value is the value as a float for int and float
+    values and None otherwise. Pass the FlatteningPlan from flattening_plan to
+    reuse cached per-class work across documents.
+    """
+    if plan is None:
+        plan = FlatteningPlan(_get_class_name(doc_props))
+    if not plan.names:
+        for col in _META_COLUMNS:
+            plan.names[("meta", col)] = f"meta.{col}"
+            plan.groups[f"meta.{col}"] = "meta"
+
+    yield "meta.class", plan.class_name, None
+
+    sc_key = _superclass_key(doc_props)
+    superclass = plan.superclass.get(sc_key)
+    if superclass is None:
+        superclass = plan.superclass[sc_key] = _get_superclass_str(doc_props)
+    yield "meta.superclass", superclass, None
+
+    datestamp = get_field(doc_props, ["base.datestamp", "ndi_document.datestamp"])
+    yield "meta.datestamp", datestamp, _numeric_value(datestamp)
+    yield "meta.creation", "", None
+    yield "meta.deletion", "", None
+    yield "meta.depends_on", _serialize_depends_on(doc_props), None
+
+    for group, field_value in doc_props.items():
+        if group in _SKIP_FIELDS:
+            continue
+        if isinstance(field_value, dict):
+            yield from _iter_group(plan, group, field_value, "")
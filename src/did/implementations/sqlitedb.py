@@ -1,6 +1,7 @@
 import sqlite3
 import os
 import re as _re
+from collections.abc import Mapping
 from ..database import Database
 
 
@@ -22,10 +23,24 @@ def _sql_escape(value):
 
 
 class SQLiteDB(Database):
-    def __init__(self, filename):
+    # Copy-on-write branch chains deeper than this are compacted when a new
+    # branch is added on top of them.
+    MAX_BRANCH_CHAIN_DEPTH = 8
+
+    # gc only deletes untracked files in the file store that are older than
+    # this many seconds, so blobs of an ingest still in progress are kept.
+    FILE_STORE_GRACE_PERIOD = 3600
+
+    def __init__(self, filename, copy_on_write_branches=False, ingest_files=False):
         super().__init__(connection=filename)
         self.dbid = None
+        self.copy_on_write_branches = copy_on_write_branches
+        self.ingest_files = ingest_files
         self._fields_cache = {}  # (class, field_name) -> field_idx
+        self._flattening_plans = {}  # document class -> doc2sql.FlatteningPlan
+        self._snapshots = {}  # frozen branch_id -> read-only sqlite3 connection
+        self._snapshot_search_cache = {}  # (branch_id, query repr) -> doc ids
+        self._value_stats_cache = {}  # branch_id -> (version, field value stats)
         self._open_db()
 
     def _open_db(self):
@@ -38,9 +53,20 @@ class SQLiteDB(Database):
         self.dbid.row_factory = sqlite3.Row
 
         if is_new:
+            # Must be set before the first table is created; lets gc() return
+            # freed pages to the file system with PRAGMA incremental_vacuum.
+            self.dbid.execute("PRAGMA auto_vacuum = INCREMENTAL")
             self._create_db_tables()
+        self._ensure_aux_tables()
+
+        rows = self.do_run_sql_query("SELECT branch_id FROM frozen_branches")
+        self.frozen_branch_ids = [row["branch_id"] for row in rows]
 
     def _close_db(self):
+        for conn in self._snapshots.values():
+            conn.close()
+        self._snapshots.clear()
+        self._snapshot_search_cache.clear()
         if self.dbid:
             self.dbid.close()
             self.dbid = None
@@ -121,6 +147,232 @@ class SQLiteDB(Database):
 
         self.dbid.commit()
 
+    # Tables and indexes created by _create_aux_tables
+    _AUX_SCHEMA_NAMES = (
+        "did_properties",
+        "branch_overlays",
+        "branch_overlays_base",
+        "branch_removed",
+        "doc_hashes",
+        "doc_hashes_hash",
+        "doc_dependencies",
+        "doc_dependencies_doc",
+        "doc_dependencies_dep",
+        "branch_doc_removals",
+        "branch_doc_removals_branch",
+        "frozen_branches",
+        "doc_data_doc_idx",
+        "branch_stats",
+        "branch_class_stats",
+        "branch_field_stats",
+        "file_blobs",
+        "doc_files",
+    )
+
+    def _ensure_aux_tables(self):
+        """Create the Python-side tables that are missing, if any.
+
+        A database that already has all of them is not written to. When the
+        file is read-only, the missing tables are created empty in an
+        in-memory database attached for this connection instead; SQLite
+        resolves unqualified table names in the main database first, so the
+        tables the file does have are still used.
+        """
+        rows = self.do_run_sql_query(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'index')"
+        )
+        if {row["name"] for row in rows}.issuperset(self._AUX_SCHEMA_NAMES):
+            return
+        try:
+            self._create_aux_tables()
+        except sqlite3.OperationalError as e:
+            self.dbid.rollback()
+            if "readonly" not in str(e):
+                raise
+            self.dbid.execute("ATTACH DATABASE ':memory:' AS did_aux")
+            self._create_aux_tables("did_aux.")
+
+    def _create_aux_tables(self, schema=""):
+        """Create the Python-side bookkeeping tables if they do not exist yet.
+
+        These tables are not part of the MATLAB schema and are ignored by
+        DID-matlab, so they are also added to databases created elsewhere.
+        schema, e.g. "did_aux.", creates them in an attached database.
+        """
+        cursor = self.dbid.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}did_properties (
+                name TEXT NOT NULL PRIMARY KEY,
+                value
+            )
+        """)
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {schema}did_properties (name, value) VALUES ('write_generation', 0)"
+        )
+
+        # Copy-on-write branches: a branch with a row in branch_overlays holds
+        # only its own additions in branch_docs and its removals relative to
+        # base_branch_id in branch_removed.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}branch_overlays (
+                branch_id TEXT NOT NULL PRIMARY KEY,
+                base_branch_id TEXT NOT NULL,
+                FOREIGN KEY(branch_id) REFERENCES branches(branch_id),
+                FOREIGN KEY(base_branch_id) REFERENCES branches(branch_id)
+            )
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}branch_overlays_base "
+            "ON branch_overlays (base_branch_id)"
+        )
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}branch_removed (
+                branch_id TEXT NOT NULL,
+                doc_idx INTEGER NOT NULL,
+                PRIMARY KEY(branch_id, doc_idx)
+            )
+        """)
+
+        # Content hashes of stored documents, ignoring base.id and
+        # base.datestamp (see _content_hash). Filled on insert and update, and
+        # backfilled on demand for documents written by other implementations.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}doc_hashes (
+                doc_idx INTEGER NOT NULL PRIMARY KEY,
+                content_hash TEXT NOT NULL
+            )
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}doc_hashes_hash ON doc_hashes (content_hash)"
+        )
+
+        # One row per depends_on entry: doc_idx depends on the document whose
+        # id is dep_doc_id (which may not exist). Maintained together with
+        # doc_hashes.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}doc_dependencies (
+                doc_idx INTEGER NOT NULL,
+                dep_name TEXT NOT NULL,
+                dep_doc_id TEXT NOT NULL
+            )
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}doc_dependencies_doc "
+            "ON doc_dependencies (doc_idx)"
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}doc_dependencies_dep "
+            "ON doc_dependencies (dep_doc_id)"
+        )
+
+        # Documents removed from a branch: when the removed membership began
+        # (NULL for documents a copy-on-write branch inherited) and when it
+        # ended. merge_branch uses it to see a branch as it was at a fork.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}branch_doc_removals (
+                branch_id TEXT NOT NULL,
+                doc_idx INTEGER NOT NULL,
+                added REAL,
+                removed REAL NOT NULL
+            )
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}branch_doc_removals_branch "
+            "ON branch_doc_removals (branch_id, removed)"
+        )
+
+        # Frozen branches and the file name of their read-only snapshot,
+        # relative to the database file's directory.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}frozen_branches (
+                branch_id TEXT NOT NULL PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                timestamp REAL,
+                FOREIGN KEY(branch_id) REFERENCES branches(branch_id)
+            )
+        """)
+
+        # Catalog updates, update_doc and deletions look up doc_data by
+        # document; an index does not change the tables DID-matlab reads.
+        if not schema:
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS doc_data_doc_idx ON doc_data (doc_idx)"
+            )
+
+        # Statistics catalog, kept up to date on every membership change (see
+        # _apply_stats_delta). A branch without a branch_stats row has no
+        # catalog yet and is rebuilt the first time stats() is called for it.
+        # version is bumped on every change to the branch.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}branch_stats (
+                branch_id TEXT NOT NULL PRIMARY KEY,
+                doc_count INTEGER NOT NULL,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}branch_class_stats (
+                branch_id TEXT NOT NULL,
+                class_name TEXT NOT NULL,
+                doc_count INTEGER NOT NULL,
+                PRIMARY KEY(branch_id, class_name)
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}branch_field_stats (
+                branch_id TEXT NOT NULL,
+                field_idx INTEGER NOT NULL,
+                doc_count INTEGER NOT NULL,
+                PRIMARY KEY(branch_id, field_idx)
+            )
+        """)
+
+        # Content-addressed file store: one file_blobs row per file in
+        # <database>.files/, keyed by the SHA-256 of its content, with the
+        # number of doc_files rows that refer to it. doc_files maps each
+        # ingested (document, file name) to its blob. Both are Python-side:
+        # the MATLAB files table is left as it is.
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}file_blobs (
+                uid TEXT NOT NULL PRIMARY KEY,
+                size INTEGER NOT NULL,
+                ref_count INTEGER NOT NULL
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}doc_files (
+                doc_idx INTEGER NOT NULL,
+                filename TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                orig_location TEXT NOT NULL,
+                PRIMARY KEY(doc_idx, filename)
+            )
+        """)
+        self.dbid.commit()
+
+    def _bump_write_generation(self, cursor):
+        """Increment the write generation inside the caller's transaction."""
+        cursor.execute(
+            "UPDATE did_properties SET value = value + 1 WHERE name = 'write_generation'"
+        )
+
+    def write_generation(self):
+        """Return a counter that increases with every committed document write.
+
+        Caches of database content can store this value and compare it later
+        to find out whether they are stale, including after writes from other
+        connections to the same file.
+        """
+        rows = self.do_run_sql_query(
+            "SELECT value FROM did_properties WHERE name = 'write_generation'"
+        )
+        return rows[0]["value"] if rows else 0
+
+    def _reset_field_caches(self):
+        """Forget cached field_idx values, e.g. after a rolled back insert."""
+        self._fields_cache.clear()
+        self._flattening_plans.clear()
+
     def do_run_sql_query(self, query_str, params=()):
         cursor = self.dbid.cursor()
         cursor.execute(query_str, params)
@@ -133,41 +385,283 @@ class SQLiteDB(Database):
         rows = self.do_run_sql_query("SELECT DISTINCT branch_id FROM branches")
         return [row["branch_id"] for row in rows]
 
-    def _do_add_branch(self, branch_id, parent_branch_id):
+    def _do_add_branch(self, branch_id, parent_branch_id, **kwargs):
+        """Add a branch, copying or overlaying the parent's documents.
+
+        With copy_on_write=True (default: self.copy_on_write_branches) the new
+        branch only records its parent as a base in branch_overlays, which
+        takes constant time. Otherwise the parent's membership is copied into
+        branch_docs with a single INSERT ... SELECT, which is what DID-matlab
+        expects to find; compact_branch converts an overlay branch into this
+        form.
+        """
         import time
 
+        copy_on_write = kwargs.get("copy_on_write", self.copy_on_write_branches)
         cursor = self.dbid.cursor()
 
         # Handle empty string parent as NULL
         if parent_branch_id == "":
             parent_branch_id = None
 
+        if (
+            copy_on_write
+            and parent_branch_id
+            and self._branch_chain_depth(cursor, parent_branch_id)
+            >= self.MAX_BRANCH_CHAIN_DEPTH
+        ):
+            self._compact_branch(cursor, parent_branch_id)
+
         # Add the new branch
+        now = time.time()
         cursor.execute(
             "INSERT INTO branches (branch_id, parent_id, timestamp) VALUES (?, ?, ?)",
-            (branch_id, parent_branch_id, time.time()),
+            (branch_id, parent_branch_id, now),
+        )
+
+        if parent_branch_id and copy_on_write:
+            cursor.execute(
+                "INSERT INTO branch_overlays (branch_id, base_branch_id) VALUES (?, ?)",
+                (branch_id, parent_branch_id),
+            )
+        elif parent_branch_id:
+            # Copy docs from parent branch
+            members_sql, params = self._branch_members_sql(cursor, parent_branch_id)
+            cursor.execute(
+                "INSERT OR IGNORE INTO branch_docs (branch_id, doc_idx, timestamp) "
+                f"SELECT ?, doc_idx, ? FROM ({members_sql})",
+                (branch_id, now) + params,
+            )
+
+        self._copy_branch_stats(cursor, parent_branch_id, branch_id)
+        self._bump_write_generation(cursor)
+        self.dbid.commit()
+
+    # --- Copy-on-write branch membership ---
+
+    _CHAIN_CTE = (
+        "WITH RECURSIVE chain(branch_id, depth) AS ("
+        "SELECT ?, 0 "
+        "UNION ALL "
+        "SELECT o.base_branch_id, chain.depth + 1 "
+        "FROM branch_overlays o JOIN chain ON o.branch_id = chain.branch_id) "
+    )
+
+    _CHAIN_MEMBERS = (
+        "SELECT DISTINCT bd.doc_idx AS doc_idx "
+        "FROM chain c JOIN branch_docs bd ON bd.branch_id = c.branch_id "
+        "WHERE NOT EXISTS ("
+        "SELECT 1 FROM chain c2 JOIN branch_removed r "
+        "ON r.branch_id = c2.branch_id AND r.doc_idx = bd.doc_idx "
+        "WHERE c2.depth < c.depth)"
+    )
+
+    def _branch_base(self, cursor, branch_id):
+        """Return the base branch of a copy-on-write branch, or None."""
+        cursor.execute(
+            "SELECT base_branch_id FROM branch_overlays WHERE branch_id = ?",
+            (branch_id,),
         )
+        row = cursor.fetchone()
+        return row["base_branch_id"] if row else None
 
-        # Copy docs from parent branch
-        if parent_branch_id:
+    def _overlay_children(self, cursor, branch_id):
+        """Return the copy-on-write branches whose base is branch_id."""
+        cursor.execute(
+            "SELECT branch_id FROM branch_overlays WHERE base_branch_id = ?",
+            (branch_id,),
+        )
+        return [row["branch_id"] for row in cursor.fetchall()]
+
+    def _branch_chain_depth(self, cursor, branch_id):
+        """Return how many copy-on-write levels lie below branch_id."""
+        cursor.execute(
+            self._CHAIN_CTE + "SELECT MAX(depth) AS depth FROM chain", (branch_id,)
+        )
+        return cursor.fetchone()["depth"] or 0
+
+    def _branch_members_sql(self, cursor, branch_id):
+        """Return (sql, params) for a SELECT of the doc_idx values in a branch.
+
+        Ordinary branches read branch_docs directly. Copy-on-write branches
+        resolve their membership with a recursive CTE over the chain of base
+        branches: a document belongs to the branch if some branch in the chain
+        lists it in branch_docs and no branch above that one removed it.
+        """
+        if self._branch_base(cursor, branch_id) is None:
+            return "SELECT doc_idx FROM branch_docs WHERE branch_id = ?", (branch_id,)
+        return self._CHAIN_CTE + self._CHAIN_MEMBERS, (branch_id,)
+
+    def _is_branch_member(self, cursor, branch_id, doc_idx):
+        """Check membership of a single document without resolving the branch."""
+        if self._branch_base(cursor, branch_id) is None:
             cursor.execute(
-                "SELECT doc_idx FROM branch_docs WHERE branch_id = ?",
-                (parent_branch_id,),
+                "SELECT 1 FROM branch_docs WHERE branch_id = ? AND doc_idx = ?",
+                (branch_id, doc_idx),
             )
-            doc_indices = [row["doc_idx"] for row in cursor.fetchall()]
-            for doc_idx in doc_indices:
+            return cursor.fetchone() is not None
+        cursor.execute(
+            self._CHAIN_CTE + "SELECT 1 FROM chain c JOIN branch_docs bd "
+            "ON bd.branch_id = c.branch_id AND bd.doc_idx = ? "
+            "WHERE NOT EXISTS ("
+            "SELECT 1 FROM chain c2 JOIN branch_removed r "
+            "ON r.branch_id = c2.branch_id AND r.doc_idx = bd.doc_idx "
+            "WHERE c2.depth < c.depth) LIMIT 1",
+            (branch_id, doc_idx),
+        )
+        return cursor.fetchone() is not None
+
+    def _compact_branch(self, cursor, branch_id):
+        """Materialize a copy-on-write branch into branch_docs (no commit)."""
+        import time
+
+        if self._branch_base(cursor, branch_id) is None:
+            return
+        members_sql, params = self._branch_members_sql(cursor, branch_id)
+        cursor.execute(
+            "INSERT OR IGNORE INTO branch_docs (branch_id, doc_idx, timestamp) "
+            f"SELECT ?, doc_idx, ? FROM ({members_sql})",
+            (branch_id, time.time()) + params,
+        )
+        cursor.execute("DELETE FROM branch_removed WHERE branch_id = ?", (branch_id,))
+        cursor.execute("DELETE FROM branch_overlays WHERE branch_id = ?", (branch_id,))
+
+    def compact_branch(self, branch_id):
+        """Flatten a copy-on-write branch into an ordinary branch.
+
+        The branch's full membership is written to branch_docs, so it no longer
+        depends on its base branches and DID-matlab can read it. Branches built
+        on top of it are unaffected.
+        """
+        cursor = self.dbid.cursor()
+        self._compact_branch(cursor, branch_id)
+        self._bump_write_generation(cursor)
+        self.dbid.commit()
+
+    def compact_branches(self, max_depth=0):
+        """Compact every copy-on-write branch whose chain is deeper than max_depth.
+
+        With the default max_depth=0 all overlay branches become ordinary
+        branches.
+        """
+        cursor = self.dbid.cursor()
+        cursor.execute("SELECT branch_id FROM branch_overlays")
+        branch_ids = [row["branch_id"] for row in cursor.fetchall()]
+        depths = {b: self._branch_chain_depth(cursor, b) for b in branch_ids}
+        # Shallow branches first: compacting them shortens deeper chains.
+        for branch_id in sorted(branch_ids, key=depths.get):
+            if self._branch_chain_depth(cursor, branch_id) > max_depth:
+                self._compact_branch(cursor, branch_id)
+        self._bump_write_generation(cursor)
+        self.dbid.commit()
+
+    def _add_branch_member(self, cursor, branch_id, doc_idx):
+        """Add doc_idx to a branch, keeping copy-on-write children unchanged.
+
+        Returns False if the document was already in the branch. Raises
+        sqlite3.IntegrityError like a plain branch_docs insert would.
+        """
+        import time
+
+        base = self._branch_base(cursor, branch_id)
+        children = self._overlay_children(cursor, branch_id)
+        if base is not None or children:
+            if self._is_branch_member(cursor, branch_id, doc_idx):
+                return False
+            # Children were branched before this document arrived.
+            cursor.executemany(
+                "INSERT OR IGNORE INTO branch_removed (branch_id, doc_idx) VALUES (?, ?)",
+                [(child, doc_idx) for child in children],
+            )
+            if base is not None:
                 cursor.execute(
-                    "INSERT OR IGNORE INTO branch_docs (branch_id, doc_idx, timestamp) VALUES (?, ?, ?)",
-                    (branch_id, doc_idx, time.time()),
+                    "DELETE FROM branch_removed WHERE branch_id = ? AND doc_idx = ?",
+                    (branch_id, doc_idx),
                 )
+        cursor.execute(
+            "INSERT INTO branch_docs (branch_id, doc_idx, timestamp) VALUES (?, ?, ?)",
+            (branch_id, doc_idx, time.time()),
+        )
+        self._apply_stats_delta(cursor, branch_id, "SELECT ?", (doc_idx,), 1)
+        return True
 
-        self.dbid.commit()
+    def _record_removals(self, cursor, branch_id, docs_sql, params):
+        """Log that the branch members selected by docs_sql are being removed.
+
+        Call before the removal; docs_sql must only select current members.
+        """
+        import time
+
+        cursor.execute(
+            "INSERT INTO branch_doc_removals (branch_id, doc_idx, added, removed) "
+            f"SELECT ?, m.doc_idx, bd.timestamp, ? FROM ({docs_sql}) m "
+            "LEFT JOIN branch_docs bd ON bd.branch_id = ? AND bd.doc_idx = m.doc_idx",
+            (branch_id, time.time()) + tuple(params) + (branch_id,),
+        )
+
+    def _remove_branch_member(self, cursor, branch_id, doc_idx):
+        """Remove doc_idx from a branch, keeping copy-on-write children unchanged.
+
+        Returns False if the document was not in the branch.
+        """
+        import time
+
+        base = self._branch_base(cursor, branch_id)
+        children = self._overlay_children(cursor, branch_id)
+        if base is None and not children:
+            self._record_removals(
+                cursor,
+                branch_id,
+                "SELECT doc_idx FROM branch_docs WHERE branch_id = ? AND doc_idx = ?",
+                (branch_id, doc_idx),
+            )
+            cursor.execute(
+                "DELETE FROM branch_docs WHERE branch_id = ? AND doc_idx = ?",
+                (branch_id, doc_idx),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._apply_stats_delta(cursor, branch_id, "SELECT ?", (doc_idx,), -1)
+            return True
+        if not self._is_branch_member(cursor, branch_id, doc_idx):
+            return False
+        self._record_removals(cursor, branch_id, "SELECT ? AS doc_idx", (doc_idx,))
+        self._apply_stats_delta(cursor, branch_id, "SELECT ?", (doc_idx,), -1)
+        # Children that still see the document keep their own reference to it.
+        now = time.time()
+        for child in children:
+            cursor.execute(
+                "SELECT 1 FROM branch_removed WHERE branch_id = ? AND doc_idx = ?",
+                (child, doc_idx),
+            )
+            if cursor.fetchone() is None:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO branch_docs (branch_id, doc_idx, timestamp) "
+                    "VALUES (?, ?, ?)",
+                    (child, doc_idx, now),
+                )
+        cursor.execute(
+            "DELETE FROM branch_docs WHERE branch_id = ? AND doc_idx = ?",
+            (branch_id, doc_idx),
+        )
+        if base is not None and self._is_branch_member(cursor, branch_id, doc_idx):
+            cursor.execute(
+                "INSERT OR IGNORE INTO branch_removed (branch_id, doc_idx) VALUES (?, ?)",
+                (branch_id, doc_idx),
+            )
+        return True
 
     def _do_get_doc_ids(self, branch_id=None):
-        if branch_id:
+        snapshot = self._snapshot(branch_id) if branch_id else None
+        if snapshot is not None:
+            rows = snapshot.execute("SELECT doc_id FROM docs").fetchall()
+        elif branch_id:
+            members_sql, params = self._branch_members_sql(
+                self.dbid.cursor(), branch_id
+            )
             rows = self.do_run_sql_query(
-                "SELECT d.doc_id FROM docs d JOIN branch_docs bd ON d.doc_idx = bd.doc_idx WHERE bd.branch_id = ?",
-                (branch_id,),
+                f"SELECT d.doc_id FROM docs d WHERE d.doc_idx IN ({members_sql})",
+                params,
             )
         else:
             rows = self.do_run_sql_query("SELECT doc_id FROM docs")
@@ -182,6 +676,10 @@ class SQLiteDB(Database):
         """
         # Convert ___ back to . for the stored field_name
         full_field_name = f"{group_name}.{field_name}".replace("___", ".")
+        return self._lookup_field_idx(cursor, group_name, full_field_name)
+
+    def _lookup_field_idx(self, cursor, group_name, full_field_name):
+        """Look up or create the field_idx for an already-dotted field_name."""
         json_name = full_field_name.replace(".", "___")
 
         cache_key = (group_name, full_field_name)
@@ -205,123 +703,1346 @@ class SQLiteDB(Database):
         return field_idx
 
     def _populate_doc_data(self, cursor, doc_idx, document_obj):
-        """Flatten document via doc2sql and insert into fields/doc_data tables."""
-        from .doc2sql import doc_to_sql
+        """Flatten document via doc2sql and insert into fields/doc_data tables.
+
+        Uses doc2sql's streaming flattener with a per-class FlatteningPlan, so
+        superclass strings, field names and field_idx values are resolved once
+        per class rather than once per document.
+        """
+        from .doc2sql import flattening_plan, iter_doc_fields
+
+        props = document_obj.document_properties
+        plan = flattening_plan(props, self._flattening_plans)
+        field_idx_map = plan.field_idx
+        rows = []
+
+        for field_name, value, _ in iter_doc_fields(props, plan):
+            field_idx = field_idx_map.get(field_name)
+            if field_idx is None:
+                field_idx = self._lookup_field_idx(
+                    cursor, plan.groups[field_name], field_name
+                )
+                field_idx_map[field_name] = field_idx
+            if value is None:
+                value = ""
+            rows.append((doc_idx, field_idx, str(value)))
+
+        if rows:
+            cursor.executemany(
+                "INSERT INTO doc_data (doc_idx, field_idx, value) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    @staticmethod
+    def _matlab_compatible_props(props):
+        """Return props with single-element lists unwrapped to scalars.
+
+        MATLAB's jsonencode converts single-element cell arrays to scalars.
+        This replicates that behavior so DID-matlab can read Python-created databases.
+
+        The caller's props are never modified or deep-copied: only the
+        containers on the path to an unwrapped value (the top level,
+        document_class and files) are shallow-copied, and everything else is
+        shared with the original tree. Key order is preserved, so encoding the
+        result gives the same bytes as encoding a fully rewritten deep copy.
+        """
+        out = props
+
+        # Unwrap document_class.superclasses
+        dc = props.get("document_class", {})
+        sc = dc.get("superclasses")
+        if isinstance(sc, list) and len(sc) == 1:
+            out = dict(out)
+            out["document_class"] = dict(dc)
+            out["document_class"]["superclasses"] = sc[0]
+
+        # Unwrap depends_on
+        dep = props.get("depends_on")
+        if isinstance(dep, list) and len(dep) == 1:
+            if out is props:
+                out = dict(out)
+            out["depends_on"] = dep[0]
+
+        # Unwrap files.file_info
+        files = props.get("files")
+        if isinstance(files, dict):
+            fi = files.get("file_info")
+            if isinstance(fi, list) and len(fi) == 1:
+                if out is props:
+                    out = dict(out)
+                out["files"] = dict(files)
+                out["files"]["file_info"] = fi[0]
+
+        return out
+
+    @staticmethod
+    def _matlab_json(props):
+        """Encode props as MATLAB-compatible JSON for the docs.json_code column."""
+        import json
+
+        return json.dumps(SQLiteDB._matlab_compatible_props(props))
+
+    @staticmethod
+    def _content_hash(props):
+        """Hash a document's MATLAB-compatible properties, ignoring its identity.
+
+        base.id and base.datestamp are left out so that two documents with the
+        same content hash the same even if they were created separately.
+        """
+        import hashlib
+        import json
+
+        props = SQLiteDB._matlab_compatible_props(props)
+        base = props.get("base")
+        if isinstance(base, dict) and ("id" in base or "datestamp" in base):
+            props = dict(props)
+            props["base"] = {
+                k: v for k, v in base.items() if k not in ("id", "datestamp")
+            }
+        encoded = json.dumps(props, sort_keys=True, default=str)
+        return hashlib.sha1(encoded.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _dependency_rows(doc_idx, props):
+        """Return doc_dependencies rows for a document's depends_on entries."""
+        depends_on = props.get("depends_on")
+        if isinstance(depends_on, dict):
+            depends_on = [depends_on]
+        if not isinstance(depends_on, (list, tuple)):
+            return []
+        rows = []
+        for dep in depends_on:
+            if isinstance(dep, Mapping):
+                name = dep.get("name")
+                value = dep.get("value")
+                if name and value:
+                    rows.append((doc_idx, str(name), str(value)))
+        return rows
+
+    def _index_doc(self, cursor, doc_idx, props):
+        """Write the doc_hashes and doc_dependencies rows for a document."""
+        cursor.execute(
+            "INSERT OR REPLACE INTO doc_hashes (doc_idx, content_hash) VALUES (?, ?)",
+            (doc_idx, self._content_hash(props)),
+        )
+        cursor.execute("DELETE FROM doc_dependencies WHERE doc_idx = ?", (doc_idx,))
+        rows = self._dependency_rows(doc_idx, props)
+        if rows:
+            cursor.executemany(
+                "INSERT INTO doc_dependencies (doc_idx, dep_name, dep_doc_id) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def _backfill_side_tables(self):
+        """Index documents that have no doc_hashes row yet.
+
+        Documents written by other implementations (or by older versions of
+        this one) lack content hashes and dependency rows until this runs.
+        """
+        import json
+
+        cursor = self.dbid.cursor()
+        cursor.execute(
+            "SELECT doc_idx, json_code FROM docs "
+            "WHERE doc_idx NOT IN (SELECT doc_idx FROM doc_hashes)"
+        )
+        rows = cursor.fetchall()
+        for row in rows:
+            self._index_doc(cursor, row["doc_idx"], json.loads(row["json_code"]))
+        if rows:
+            self.dbid.commit()
+
+    _DOC_TABLES = (
+        "branch_removed",
+        "branch_doc_removals",
+        "doc_hashes",
+        "doc_dependencies",
+        "doc_data",
+        "doc_files",
+        "files",
+        "docs",
+    )
+
+    def _delete_doc_rows(self, cursor, doc_indices):
+        """Delete documents and everything keyed by their doc_idx (no commit)."""
+        if isinstance(doc_indices, int):
+            doc_indices = [doc_indices]
+        doc_indices = list(doc_indices)
+        # Stay below SQLite's limit on host parameters per statement
+        for start in range(0, len(doc_indices), 500):
+            chunk = doc_indices[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            # Release the documents' references to the file store
+            cursor.execute(
+                "SELECT uid, COUNT(*) AS n FROM doc_files "
+                f"WHERE doc_idx IN ({placeholders}) GROUP BY uid",
+                chunk,
+            )
+            cursor.executemany(
+                "UPDATE file_blobs SET ref_count = ref_count - ? WHERE uid = ?",
+                [(r["n"], r["uid"]) for r in cursor.fetchall()],
+            )
+            for table in self._DOC_TABLES:
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE doc_idx IN ({placeholders})", chunk
+                )
+
+    @staticmethod
+    def _normalize_loaded_props(props):
+        """Ensure superclasses, depends_on, file_info, and locations are always lists.
+
+        Inverse of _matlab_compatible_props. Mutates and returns props.
+        """
+        dc = props.get("document_class", {})
+        sc = dc.get("superclasses")
+        if sc is not None and not isinstance(sc, list):
+            dc["superclasses"] = [sc]
+
+        dep = props.get("depends_on")
+        if dep is not None and not isinstance(dep, list):
+            props["depends_on"] = [dep]
+
+        # Re-wrap files.file_info (but not locations, which may be a bare dict
+        # from add_file in the Python API)
+        files = props.get("files")
+        if isinstance(files, dict):
+            fi = files.get("file_info")
+            if isinstance(fi, dict):
+                files["file_info"] = [fi]
+
+        return props
+
+    def _do_add_doc(self, document_obj, branch_id, **kwargs):
+        import time
+
+        doc_id = document_obj.id()
+        cursor = self.dbid.cursor()
+
+        cursor.execute("SELECT doc_idx FROM docs WHERE doc_id = ?", (doc_id,))
+        row = cursor.fetchone()
+
+        if row:
+            doc_idx = row["doc_idx"]
+        else:
+            json_code = self._matlab_json(document_obj.document_properties)
+            cursor.execute(
+                "INSERT INTO docs (doc_id, json_code, timestamp) VALUES (?, ?, ?)",
+                (doc_id, json_code, time.time()),
+            )
+            doc_idx = cursor.lastrowid
+            self._index_doc(cursor, doc_idx, document_obj.document_properties)
+
+            # Populate fields and doc_data tables (matching MATLAB's doc2sql behavior)
+            self._populate_doc_data(cursor, doc_idx, document_obj)
+            try:
+                self._sync_doc_files(cursor, doc_idx, document_obj.document_properties)
+            except Exception:
+                self.dbid.rollback()
+                raise
+
+        try:
+            if self._add_branch_member(cursor, branch_id, doc_idx):
+                self._bump_write_generation(cursor)
+            self.dbid.commit()
+        except sqlite3.IntegrityError as e:
+            if "FOREIGN KEY" in str(e):
+                raise ValueError(f"Branch '{branch_id}' does not exist.")
+            # Ignore other integrity errors (duplicates)
+            pass
+
+    def _do_update_doc(self, document_obj, branch_id, **kwargs):
+        """Update a stored document in place, rewriting only changed fields.
+
+        The new flattened fields are diffed against the doc_data rows already
+        stored for the document; only rows whose value changed are updated,
+        and rows for fields that appeared or disappeared are inserted or
+        deleted. json_code is rewritten and the write generation bumped, all in
+        one transaction. Branch membership is left untouched, so the change is
+        visible on every branch that contains the document.
+
+        Returns the number of doc_data rows that were inserted, updated or
+        deleted.
+        """
+        import time
+        from .doc2sql import flattening_plan, iter_doc_fields
+
+        doc_id = document_obj.id()
+        cursor = self.dbid.cursor()
+
+        cursor.execute("SELECT doc_idx FROM docs WHERE doc_id = ?", (doc_id,))
+        row = cursor.fetchone()
+        if not row or not self._is_branch_member(cursor, branch_id, row["doc_idx"]):
+            raise ValueError(f"Document {doc_id} not found in branch {branch_id}")
+        doc_idx = row["doc_idx"]
+        for frozen_id in self.frozen_branch_ids:
+            if self._is_branch_member(cursor, frozen_id, doc_idx):
+                raise ValueError(
+                    f"Document {doc_id} is part of frozen branch '{frozen_id}'."
+                )
+
+        try:
+            # The document's contribution to the catalog of every branch that
+            # holds it is taken out here and added back once rewritten.
+            cursor.execute("SELECT branch_id FROM branch_stats")
+            stats_branches = [
+                r["branch_id"]
+                for r in cursor.fetchall()
+                if self._is_branch_member(cursor, r["branch_id"], doc_idx)
+            ]
+            for b in stats_branches:
+                self._apply_stats_delta(cursor, b, "SELECT ?", (doc_idx,), -1)
+
+            props = document_obj.document_properties
+            plan = flattening_plan(props, self._flattening_plans)
+            field_idx_map = plan.field_idx
+            new_values = {}
+            for field_name, value, _ in iter_doc_fields(props, plan):
+                field_idx = field_idx_map.get(field_name)
+                if field_idx is None:
+                    field_idx = self._lookup_field_idx(
+                        cursor, plan.groups[field_name], field_name
+                    )
+                    field_idx_map[field_name] = field_idx
+                new_values.setdefault(field_idx, []).append(
+                    "" if value is None else str(value)
+                )
+
+            old_rows = {}
+            cursor.execute(
+                "SELECT rowid, field_idx, value FROM doc_data WHERE doc_idx = ? "
+                "ORDER BY rowid",
+                (doc_idx,),
+            )
+            for r in cursor.fetchall():
+                old_rows.setdefault(r["field_idx"], []).append((r["rowid"], r["value"]))
+
+            updates, deletes, inserts = [], [], []
+            for field_idx in old_rows.keys() | new_values.keys():
+                old = old_rows.get(field_idx, [])
+                new = new_values.get(field_idx, [])
+                if len(old) == len(new):
+                    for (rowid, old_value), new_value in zip(old, new):
+                        if old_value != new_value:
+                            updates.append((new_value, rowid))
+                else:
+                    deletes.extend((rowid,) for rowid, _ in old)
+                    inserts.extend((doc_idx, field_idx, v) for v in new)
+
+            if deletes:
+                cursor.executemany("DELETE FROM doc_data WHERE rowid = ?", deletes)
+            if updates:
+                cursor.executemany(
+                    "UPDATE doc_data SET value = ? WHERE rowid = ?", updates
+                )
+            if inserts:
+                cursor.executemany(
+                    "INSERT INTO doc_data (doc_idx, field_idx, value) VALUES (?, ?, ?)",
+                    inserts,
+                )
+
+            cursor.execute(
+                "UPDATE docs SET json_code = ?, timestamp = ? WHERE doc_idx = ?",
+                (self._matlab_json(props), time.time(), doc_idx),
+            )
+            self._index_doc(cursor, doc_idx, props)
+            self._sync_doc_files(cursor, doc_idx, props)
+            for b in stats_branches:
+                self._apply_stats_delta(cursor, b, "SELECT ?", (doc_idx,), 1)
+            self._bump_write_generation(cursor)
+            self.dbid.commit()
+        except Exception:
+            self.dbid.rollback()
+            self._reset_field_caches()
+            raise
+
+        return len(updates) + len(deletes) + len(inserts)
+
+    # --- Branch comparison ---
+
+    def diff_branches(self, branch_a, branch_b, by_content=False, stream=False):
+        """Compare the documents of two branches in SQL.
+
+        Returns {"added": [...], "removed": [...]}: the doc ids in branch_b but
+        not in branch_a, and those in branch_a but not in branch_b, computed
+        with EXCEPT over the branches' memberships.
+
+        Documents are stored once and shared between branches, so a doc id
+        present in both branches always has the same content. With
+        by_content=True the comparison uses stored content hashes instead of
+        ids, so a document that was re-created on one side with identical
+        content (but a new id and datestamp) is not reported as a change.
+
+        With stream=True a generator of ("added", doc_id) and
+        ("removed", doc_id) tuples is returned instead, which reads rows from
+        SQLite in batches and does not hold the full diff in memory.
+        """
+        if by_content:
+            self._backfill_side_tables()
+        cursor = self.dbid.cursor()
+        sql_a, params_a = self._branch_members_sql(cursor, branch_a)
+        sql_b, params_b = self._branch_members_sql(cursor, branch_b)
+
+        def one_side(label, sql_new, params_new, sql_old, params_old):
+            if by_content:
+                query = (
+                    "SELECT d.doc_id FROM docs d "
+                    "JOIN doc_hashes h ON h.doc_idx = d.doc_idx "
+                    f"WHERE d.doc_idx IN ({sql_new}) "
+                    "AND h.content_hash NOT IN ("
+                    "SELECT h2.content_hash FROM doc_hashes h2 "
+                    f"WHERE h2.doc_idx IN ({sql_old}))"
+                )
+            else:
+                query = (
+                    "SELECT d.doc_id FROM docs d WHERE d.doc_idx IN ("
+                    f"SELECT doc_idx FROM ({sql_new}) "
+                    f"EXCEPT SELECT doc_idx FROM ({sql_old}))"
+                )
+            return label, query, params_new + params_old
+
+        sides = [
+            one_side("added", sql_b, params_b, sql_a, params_a),
+            one_side("removed", sql_a, params_a, sql_b, params_b),
+        ]
+
+        if stream:
+            return self._stream_diff(sides)
+
+        result = {}
+        for label, query, params in sides:
+            result[label] = [
+                row["doc_id"] for row in self.do_run_sql_query(query, params)
+            ]
+        return result
+
+    def _stream_diff(self, sides, batch_size=10000):
+        for label, query, params in sides:
+            cursor = self.dbid.cursor()
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield label, row["doc_id"]
+
+    # --- Branch merging ---
+
+    def _branch_path(self, cursor, branch_id):
+        """Return [(branch_id, timestamp), ...] from branch_id up to its root."""
+        cursor.execute(
+            "WITH RECURSIVE path(branch_id, parent_id, timestamp, depth) AS ("
+            "SELECT branch_id, parent_id, timestamp, 0 FROM branches WHERE branch_id = ? "
+            "UNION ALL "
+            "SELECT b.branch_id, b.parent_id, b.timestamp, path.depth + 1 "
+            "FROM branches b JOIN path ON b.branch_id = path.parent_id) "
+            "SELECT branch_id, timestamp FROM path ORDER BY depth",
+            (branch_id,),
+        )
+        return [(row["branch_id"], row["timestamp"]) for row in cursor.fetchall()]
+
+    def _merge_base_sql(self, cursor, ancestor, path):
+        """SQL for the ancestor's documents as seen when path forked from it.
+
+        Documents the ancestor gained after the fork (branch_docs rows newer
+        than the forking branch) are excluded, and documents it held at the
+        fork but removed since (see branch_doc_removals) are included.
+        Returns (sql, params).
+        """
+        if ancestor is None:
+            return "SELECT NULL AS doc_idx WHERE 0", ()
+        members_sql, params = self._branch_members_sql(cursor, ancestor)
+        names = [b for b, _ in path]
+        i = names.index(ancestor)
+        if i == 0:
+            return f"SELECT doc_idx FROM ({members_sql})", params
+        fork_time = path[i - 1][1]
+        return (
+            f"SELECT doc_idx FROM (SELECT doc_idx FROM ({members_sql}) "
+            "EXCEPT SELECT doc_idx FROM branch_docs "
+            "WHERE branch_id = ? AND timestamp > ?) "
+            "UNION SELECT doc_idx FROM branch_doc_removals "
+            "WHERE branch_id = ? AND removed > ? AND (added IS NULL OR added <= ?)",
+            params + (ancestor, fork_time, ancestor, fork_time, fork_time),
+        )
+
+    def merge_branch(self, source_branch_id, target_branch_id, strategy="fail"):
+        """Apply a branch's changes to another branch in one transaction.
+
+        The changes are the documents source_branch_id added and removed
+        relative to its nearest common ancestor with target_branch_id (for a
+        child merged back into its parent, the parent as it was when the child
+        was created). They are applied to target_branch_id with set-based SQL.
+
+        A conflict is a document that one side removed while the other side
+        still depends on it: either the source removed it and a document that
+        will remain in the target depends on it, or the target removed it and
+        a document the source added depends on it. strategy decides what
+        happens then:
+
+        - "fail": raise ValueError and change nothing.
+        - "source": apply all of the source's changes, and restore documents
+          the target removed that the source's additions depend on.
+        - "target": skip the source's conflicting removals and the source's
+          additions that depend on documents the target removed.
+
+        Returns {"added": [...], "removed": [...], "conflicts": [...]} with the
+        doc ids added to and removed from the target, and the conflicting
+        doc ids.
+        """
+        import time
+
+        if strategy not in ("fail", "source", "target"):
+            raise ValueError(f"Unknown merge strategy '{strategy}'.")
+
+        self._check_not_frozen(target_branch_id)
+        self._backfill_side_tables()
+        cursor = self.dbid.cursor()
+        for branch_id in (source_branch_id, target_branch_id):
+            cursor.execute("SELECT 1 FROM branches WHERE branch_id = ?", (branch_id,))
+            if not cursor.fetchone():
+                raise ValueError(f"Branch '{branch_id}' does not exist.")
+
+        source_path = self._branch_path(cursor, source_branch_id)
+        target_path = self._branch_path(cursor, target_branch_id)
+        target_names = {b for b, _ in target_path}
+        ancestor = next((b for b, _ in source_path if b in target_names), None)
+
+        try:
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS merge_sets ("
+                "kind TEXT NOT NULL, doc_idx INTEGER NOT NULL, "
+                "PRIMARY KEY(kind, doc_idx))"
+            )
+            cursor.execute("DELETE FROM temp.merge_sets")
+
+            def fill(kind, sql, params):
+                cursor.execute(
+                    "INSERT OR IGNORE INTO temp.merge_sets (kind, doc_idx) "
+                    f"SELECT ?, doc_idx FROM ({sql})",
+                    (kind,) + params,
+                )
+
+            src_sql, src_params = self._branch_members_sql(cursor, source_branch_id)
+            tgt_sql, tgt_params = self._branch_members_sql(cursor, target_branch_id)
+            base_src = self._merge_base_sql(cursor, ancestor, source_path)
+            base_tgt = self._merge_base_sql(cursor, ancestor, target_path)
+            # A side that is the ancestor itself is seen as of the other
+            # side's fork, so its changes since then count as its own.
+            if ancestor == target_branch_id:
+                base_tgt = base_src
+            elif ancestor == source_branch_id:
+                base_src = base_tgt
+            fill("base_src", *base_src)
+            fill("base_tgt", *base_tgt)
+            fill(
+                "src_added",
+                f"SELECT doc_idx FROM ({src_sql}) EXCEPT SELECT doc_idx FROM "
+                "temp.merge_sets WHERE kind = 'base_src'",
+                src_params,
+            )
+            fill(
+                "src_removed",
+                "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'base_src' "
+                f"EXCEPT SELECT doc_idx FROM ({src_sql})",
+                src_params,
+            )
+            fill(
+                "tgt_removed",
+                "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'base_tgt' "
+                f"EXCEPT SELECT doc_idx FROM ({tgt_sql})",
+                tgt_params,
+            )
+
+            # Source removed, but a document that stays in the target needs it
+            fill(
+                "conflict_src",
+                "SELECT DISTINCT r.doc_idx FROM temp.merge_sets r "
+                "JOIN docs d ON d.doc_idx = r.doc_idx "
+                "JOIN doc_dependencies dd ON dd.dep_doc_id = d.doc_id "
+                "WHERE r.kind = 'src_removed' "
+                f"AND (dd.doc_idx IN ({tgt_sql}) OR dd.doc_idx IN ("
+                "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'src_added')) "
+                "AND dd.doc_idx NOT IN ("
+                "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'src_removed')",
+                tgt_params,
+            )
+            # Target removed, but a document the source added needs it
+            fill(
+                "conflict_tgt",
+                "SELECT DISTINCT t.doc_idx FROM temp.merge_sets t "
+                "JOIN docs d ON d.doc_idx = t.doc_idx "
+                "JOIN doc_dependencies dd ON dd.dep_doc_id = d.doc_id "
+                "WHERE t.kind = 'tgt_removed' AND dd.doc_idx IN ("
+                "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'src_added')",
+                (),
+            )
+
+            def ids(kinds):
+                placeholders = ",".join("?" for _ in kinds)
+                cursor.execute(
+                    "SELECT DISTINCT d.doc_id FROM temp.merge_sets m "
+                    "JOIN docs d ON d.doc_idx = m.doc_idx "
+                    f"WHERE m.kind IN ({placeholders}) ORDER BY d.doc_id",
+                    tuple(kinds),
+                )
+                return [row["doc_id"] for row in cursor.fetchall()]
+
+            conflicts = ids(["conflict_src", "conflict_tgt"])
+            if conflicts and strategy == "fail":
+                raise ValueError(
+                    f"Merging '{source_branch_id}' into '{target_branch_id}' "
+                    f"conflicts on documents: {', '.join(conflicts)}"
+                )
+
+            if strategy == "target":
+                fill(
+                    "to_add",
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'src_added' "
+                    "EXCEPT SELECT dd.doc_idx FROM doc_dependencies dd "
+                    "JOIN docs d ON d.doc_id = dd.dep_doc_id "
+                    "JOIN temp.merge_sets c ON c.doc_idx = d.doc_idx "
+                    "AND c.kind = 'conflict_tgt'",
+                    (),
+                )
+                fill(
+                    "to_remove",
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'src_removed' "
+                    "EXCEPT SELECT doc_idx FROM temp.merge_sets "
+                    "WHERE kind = 'conflict_src'",
+                    (),
+                )
+            else:
+                fill(
+                    "to_add",
+                    "SELECT doc_idx FROM temp.merge_sets "
+                    "WHERE kind IN ('src_added', 'conflict_tgt')",
+                    (),
+                )
+                fill(
+                    "to_remove",
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'src_removed'",
+                    (),
+                )
+
+            # Only report and apply changes the target does not have yet
+            cursor.execute(
+                "DELETE FROM temp.merge_sets WHERE kind = 'to_add' "
+                f"AND doc_idx IN ({tgt_sql})",
+                tgt_params,
+            )
+            cursor.execute(
+                "DELETE FROM temp.merge_sets WHERE kind = 'to_remove' "
+                f"AND doc_idx NOT IN ({tgt_sql})",
+                tgt_params,
+            )
+            added = ids(["to_add"])
+            removed = ids(["to_remove"])
+
+            if self._branch_base(
+                cursor, target_branch_id
+            ) is None and not self._overlay_children(cursor, target_branch_id):
+                # Catalog deltas only count documents whose membership changes
+                self._apply_stats_delta(
+                    cursor,
+                    target_branch_id,
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'to_add' "
+                    "AND doc_idx NOT IN "
+                    "(SELECT doc_idx FROM branch_docs WHERE branch_id = ?)",
+                    (target_branch_id,),
+                    1,
+                )
+                self._apply_stats_delta(
+                    cursor,
+                    target_branch_id,
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'to_remove' "
+                    "AND doc_idx IN "
+                    "(SELECT doc_idx FROM branch_docs WHERE branch_id = ?)",
+                    (target_branch_id,),
+                    -1,
+                )
+                cursor.execute(
+                    "INSERT OR IGNORE INTO branch_docs (branch_id, doc_idx, timestamp) "
+                    "SELECT ?, doc_idx, ? FROM temp.merge_sets WHERE kind = 'to_add'",
+                    (target_branch_id, time.time()),
+                )
+                self._record_removals(
+                    cursor,
+                    target_branch_id,
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'to_remove' "
+                    "AND doc_idx IN "
+                    "(SELECT doc_idx FROM branch_docs WHERE branch_id = ?)",
+                    (target_branch_id,),
+                )
+                cursor.execute(
+                    "DELETE FROM branch_docs WHERE branch_id = ? AND doc_idx IN ("
+                    "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'to_remove')",
+                    (target_branch_id,),
+                )
+            else:
+                for kind, apply in (
+                    ("to_add", self._add_branch_member),
+                    ("to_remove", self._remove_branch_member),
+                ):
+                    cursor.execute(
+                        "SELECT doc_idx FROM temp.merge_sets WHERE kind = ?", (kind,)
+                    )
+                    for row in cursor.fetchall():
+                        apply(cursor, target_branch_id, row["doc_idx"])
+
+            # Documents no branch refers to any more are deleted, as in remove_docs
+            cursor.execute(
+                "SELECT doc_idx FROM temp.merge_sets WHERE kind = 'to_remove' "
+                "AND doc_idx NOT IN (SELECT doc_idx FROM branch_docs)"
+            )
+            self._delete_doc_rows(cursor, [row["doc_idx"] for row in cursor.fetchall()])
+
+            cursor.execute("DELETE FROM temp.merge_sets")
+            self._bump_write_generation(cursor)
+            self.dbid.commit()
+        except Exception:
+            self.dbid.rollback()
+            raise
+
+        self._invalidate_dependency_index(target_branch_id)
+        return {"added": added, "removed": removed, "conflicts": conflicts}
+
+    # --- Dependency graph ---
+
+    def dependency_graph(self, branch_id=None, query=None, format="networkx"):
+        """Build the dependency graph of a branch from doc_dependencies.
+
+        Nodes are the documents of the branch, or only those matching query if
+        given; there is an edge from B to A if A depends on B, as in
+        fun.docs_to_graph. Edges are read in SQL and no document is decoded.
+
+        format="networkx" returns a networkx.DiGraph. format="csr" returns
+        (indptr, indices, ids): the adjacency matrix in compressed sparse row
+        form as NumPy arrays, where row i lists the positions of the documents
+        that depend on ids[i]; ids is sorted by insertion order.
+        """
+        if format not in ("networkx", "csr"):
+            raise ValueError(f"Unknown graph format '{format}'.")
+        if branch_id is None:
+            branch_id = self.current_branch_id
+
+        self._backfill_side_tables()
+        cursor = self.dbid.cursor()
+        cursor.execute("DROP TABLE IF EXISTS temp.graph_nodes")
+        cursor.execute(
+            "CREATE TEMP TABLE graph_nodes ("
+            "pos INTEGER PRIMARY KEY, doc_idx INTEGER NOT NULL UNIQUE, "
+            "doc_id TEXT NOT NULL UNIQUE)"
+        )
+        try:
+            if query is not None:
+                ids = self.search(query, branch_id)
+                cursor.execute("CREATE TEMP TABLE graph_ids (doc_id TEXT)")
+                cursor.executemany(
+                    "INSERT INTO temp.graph_ids (doc_id) VALUES (?)",
+                    [(i,) for i in ids],
+                )
+                cursor.execute(
+                    "INSERT INTO temp.graph_nodes (pos, doc_idx, doc_id) "
+                    "SELECT NULL, doc_idx, doc_id FROM docs "
+                    "WHERE doc_id IN (SELECT doc_id FROM temp.graph_ids) "
+                    "ORDER BY doc_idx"
+                )
+            else:
+                members_sql, params = self._branch_members_sql(cursor, branch_id)
+                cursor.execute(
+                    "INSERT INTO temp.graph_nodes (pos, doc_idx, doc_id) "
+                    "SELECT NULL, doc_idx, doc_id FROM docs "
+                    f"WHERE doc_idx IN ({members_sql}) ORDER BY doc_idx",
+                    params,
+                )
+
+            cursor.execute("SELECT doc_id FROM temp.graph_nodes ORDER BY pos")
+            ids = [row["doc_id"] for row in cursor.fetchall()]
+            # pos starts at 1; edges run from the dependency to the dependent
+            cursor.execute(
+                "SELECT DISTINCT there.pos - 1 AS src, here.pos - 1 AS dst "
+                "FROM doc_dependencies d "
+                "JOIN temp.graph_nodes here ON here.doc_idx = d.doc_idx "
+                "JOIN temp.graph_nodes there ON there.doc_id = d.dep_doc_id "
+                "ORDER BY src, dst"
+            )
+            edges = cursor.fetchall()
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS temp.graph_ids")
+            cursor.execute("DROP TABLE IF EXISTS temp.graph_nodes")
+
+        if format == "csr":
+            import numpy as np
+
+            src = np.fromiter((e[0] for e in edges), dtype=np.int64, count=len(edges))
+            indices = np.fromiter(
+                (e[1] for e in edges), dtype=np.int64, count=len(edges)
+            )
+            indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(src, minlength=len(ids)), out=indptr[1:])
+            return indptr, indices, ids
+
+        import networkx as nx
+
+        g = nx.DiGraph()
+        g.add_nodes_from(ids)
+        g.add_edges_from((ids[e[0]], ids[e[1]]) for e in edges)
+        return g
+
+    def _declared_dependencies(self, branch_id):
+        self._backfill_side_tables()
+        cursor = self.dbid.cursor()
+        members_sql, params = self._branch_members_sql(cursor, branch_id)
+        cursor.execute(
+            "SELECT docs.doc_id AS doc_id, d.dep_doc_id AS dep_doc_id FROM docs "
+            "LEFT JOIN doc_dependencies d ON d.doc_idx = docs.doc_idx "
+            f"WHERE docs.doc_idx IN ({members_sql})",
+            params,
+        )
+        declared = {}
+        for row in cursor.fetchall():
+            deps = declared.setdefault(row["doc_id"], set())
+            if row["dep_doc_id"] is not None:
+                deps.add(row["dep_doc_id"])
+        return declared
+
+    def _existing_doc_ids(self, doc_ids, branch_id):
+        cursor = self.dbid.cursor()
+        cursor.execute("DROP TABLE IF EXISTS temp.lookup_ids")
+        cursor.execute("CREATE TEMP TABLE lookup_ids (doc_id TEXT PRIMARY KEY)")
+        try:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO temp.lookup_ids (doc_id) VALUES (?)",
+                [(doc_id,) for doc_id in doc_ids],
+            )
+            members_sql, params = self._branch_members_sql(cursor, branch_id)
+            cursor.execute(
+                "SELECT docs.doc_id FROM temp.lookup_ids l "
+                "JOIN docs ON docs.doc_id = l.doc_id "
+                f"WHERE docs.doc_idx IN ({members_sql})",
+                params,
+            )
+            return {row["doc_id"] for row in cursor.fetchall()}
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS temp.lookup_ids")
+
+    def find_dependents(
+        self, doc_ids, depth=None, direction="down", branch_id=None, class_name=None
+    ):
+        """Find the documents transitively linked to doc_ids by depends_on.
+
+        direction="down" follows dependents (documents that depend on doc_ids,
+        those that depend on them, and so on); direction="up" follows the
+        dependencies instead. Only documents of the branch are visited. The
+        walk is a recursive query in SQLite and no document is decoded.
+
+        Returns a list of (doc_id, depth) tuples sorted by depth, where depth
+        is the length of the shortest chain from doc_ids (1 for direct
+        dependents). The documents in doc_ids themselves are not returned.
+        depth limits how many steps are taken, and class_name (a name or a
+        list of names) keeps only documents of those classes in the result.
+        """
+        if direction not in ("down", "up"):
+            raise ValueError(f"Unknown direction '{direction}'.")
+        if isinstance(doc_ids, str):
+            doc_ids = [doc_ids]
+        if branch_id is None:
+            branch_id = self.current_branch_id
+
+        self._backfill_side_tables()
+        cursor = self.dbid.cursor()
+        members_sql, member_params = self._branch_members_sql(cursor, branch_id)
+        if depth is None:
+            # No shortest chain is longer than the number of documents. They
+            # are counted here rather than read from the statistics catalog,
+            # which other programs writing to the file do not keep up to date.
+            cursor.execute(f"SELECT COUNT(*) FROM ({members_sql})", member_params)
+            depth = cursor.fetchone()[0]
+        if not doc_ids or depth < 1:
+            return []
+
+        if direction == "down":
+            step = (
+                "SELECT nxt.doc_id, walk.depth + 1 FROM walk "
+                "JOIN doc_dependencies d ON d.dep_doc_id = walk.doc_id "
+                "JOIN docs nxt ON nxt.doc_idx = d.doc_idx "
+            )
+        else:
+            step = (
+                "SELECT nxt.doc_id, walk.depth + 1 FROM walk "
+                "JOIN docs cur ON cur.doc_id = walk.doc_id "
+                "JOIN doc_dependencies d ON d.doc_idx = cur.doc_idx "
+                "JOIN docs nxt ON nxt.doc_id = d.dep_doc_id "
+            )
+        placeholders = ",".join("?" for _ in doc_ids)
+        query = (
+            "WITH RECURSIVE walk(doc_id, depth) AS ("
+            f"SELECT doc_id, 0 FROM docs WHERE doc_id IN ({placeholders}) "
+            "UNION "
+            f"{step}WHERE walk.depth < ? AND nxt.doc_idx IN ({members_sql})) "
+            "SELECT walk.doc_id AS doc_id, MIN(walk.depth) AS depth FROM walk "
+            "JOIN docs ON docs.doc_id = walk.doc_id "
+        )
+        params = tuple(doc_ids) + (depth,) + tuple(member_params)
+        if class_name is not None:
+            names = [class_name] if isinstance(class_name, str) else list(class_name)
+            query += (
+                "JOIN doc_data dd ON dd.doc_idx = docs.doc_idx "
+                "JOIN fields f ON f.field_idx = dd.field_idx "
+                "AND f.field_name = 'meta.class' "
+                f"WHERE dd.value IN ({','.join('?' for _ in names)}) "
+            )
+            params += tuple(names)
+        query += (
+            "GROUP BY walk.doc_id HAVING MIN(walk.depth) > 0 ORDER BY depth, doc_id"
+        )
+
+        cursor.execute(query, params)
+        return [(row["doc_id"], row["depth"]) for row in cursor.fetchall()]
+
+    def find_missing_dependencies(self, dependency_names=None, branch_id=None):
+        """Find depends_on references to documents that are not in a branch.
+
+        Runs a single anti-join between doc_dependencies and the branch's
+        documents. dependency_names restricts the check to those depends_on
+        names. Returns (doc_id, dep_name, missing_id) tuples, ordered by
+        document.
+        """
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        if isinstance(dependency_names, str):
+            dependency_names = [dependency_names]
+
+        self._backfill_side_tables()
+        cursor = self.dbid.cursor()
+        members_sql, member_params = self._branch_members_sql(cursor, branch_id)
+        query = (
+            "SELECT docs.doc_id AS doc_id, d.dep_name AS dep_name, "
+            "d.dep_doc_id AS missing_id "
+            "FROM doc_dependencies d JOIN docs ON docs.doc_idx = d.doc_idx "
+            f"WHERE d.doc_idx IN ({members_sql}) "
+            "AND NOT EXISTS (SELECT 1 FROM docs t WHERE t.doc_id = d.dep_doc_id "
+            f"AND t.doc_idx IN ({members_sql})) "
+        )
+        params = tuple(member_params) * 2
+        if dependency_names:
+            query += f"AND d.dep_name IN ({','.join('?' for _ in dependency_names)}) "
+            params += tuple(dependency_names)
+        query += "ORDER BY d.doc_idx, d.rowid"
+
+        cursor.execute(query, params)
+        return [
+            (row["doc_id"], row["dep_name"], row["missing_id"])
+            for row in cursor.fetchall()
+        ]
+
+    # --- Statistics catalog ---
+
+    def _class_field_idx(self, cursor):
+        """Return the field_idx of meta.class, or None if no document has one."""
+        cursor.execute("SELECT field_idx FROM fields WHERE field_name = 'meta.class'")
+        row = cursor.fetchone()
+        return row["field_idx"] if row else None
+
+    def _apply_stats_delta(self, cursor, branch_id, docs_sql, params, sign):
+        """Add (sign=1) or subtract (sign=-1) documents from a branch's catalog.
+
+        docs_sql/params select the doc_idx values that entered or left the
+        branch; their doc_data rows must still exist. Nothing is done for
+        branches whose catalog has not been built yet.
+        """
+        cursor.execute(
+            "UPDATE branch_stats SET doc_count = doc_count + ? * "
+            f"(SELECT COUNT(*) FROM ({docs_sql})), version = version + 1 "
+            "WHERE branch_id = ?",
+            (sign,) + tuple(params) + (branch_id,),
+        )
+        if cursor.rowcount == 0:
+            return
+        class_idx = self._class_field_idx(cursor)
+        if class_idx is not None:
+            cursor.execute(
+                "INSERT INTO branch_class_stats (branch_id, class_name, doc_count) "
+                "SELECT ?, value, ? * COUNT(*) FROM doc_data "
+                f"WHERE field_idx = ? AND doc_idx IN ({docs_sql}) GROUP BY value "
+                "ON CONFLICT(branch_id, class_name) "
+                "DO UPDATE SET doc_count = doc_count + excluded.doc_count",
+                (branch_id, sign, class_idx) + tuple(params),
+            )
+        cursor.execute(
+            "INSERT INTO branch_field_stats (branch_id, field_idx, doc_count) "
+            "SELECT ?, field_idx, ? * COUNT(DISTINCT doc_idx) FROM doc_data "
+            f"WHERE doc_idx IN ({docs_sql}) GROUP BY field_idx "
+            "ON CONFLICT(branch_id, field_idx) "
+            "DO UPDATE SET doc_count = doc_count + excluded.doc_count",
+            (branch_id, sign) + tuple(params),
+        )
+        if sign < 0:
+            for table in ("branch_class_stats", "branch_field_stats"):
+                cursor.execute(
+                    f"DELETE FROM {table} WHERE branch_id = ? AND doc_count <= 0",
+                    (branch_id,),
+                )
+
+    def _copy_branch_stats(self, cursor, parent_branch_id, branch_id):
+        """Start a new branch's catalog as a copy of its parent's."""
+        if parent_branch_id is None:
+            cursor.execute(
+                "INSERT OR REPLACE INTO branch_stats (branch_id, doc_count) "
+                "VALUES (?, 0)",
+                (branch_id,),
+            )
+            return
+        cursor.execute(
+            "INSERT OR REPLACE INTO branch_stats (branch_id, doc_count) "
+            "SELECT ?, doc_count FROM branch_stats WHERE branch_id = ?",
+            (branch_id, parent_branch_id),
+        )
+        for table, key in (
+            ("branch_class_stats", "class_name"),
+            ("branch_field_stats", "field_idx"),
+        ):
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {table} (branch_id, {key}, doc_count) "
+                f"SELECT ?, {key}, doc_count FROM {table} WHERE branch_id = ?",
+                (branch_id, parent_branch_id),
+            )
 
-        meta_tables = doc_to_sql(document_obj)
-        rows = []
+    def _drop_branch_stats(self, cursor, branch_id):
+        for table in ("branch_stats", "branch_class_stats", "branch_field_stats"):
+            cursor.execute(f"DELETE FROM {table} WHERE branch_id = ?", (branch_id,))
+        self._value_stats_cache.pop(branch_id, None)
 
-        for table in meta_tables:
-            group_name = table["name"]
-            for col in table["columns"]:
-                col_name = col["name"]
-                if col_name == "doc_id":
-                    continue  # skip doc_id columns
-                field_idx = self._get_field_idx(cursor, group_name, col_name)
-                value = col["value"]
-                if value is None:
-                    value = ""
-                rows.append((doc_idx, field_idx, str(value)))
+    def _rebuild_branch_stats(self, cursor, branch_id):
+        """Recompute a branch's catalog from scratch (no commit)."""
+        self._drop_branch_stats(cursor, branch_id)
+        cursor.execute(
+            "INSERT INTO branch_stats (branch_id, doc_count) VALUES (?, 0)",
+            (branch_id,),
+        )
+        members_sql, params = self._branch_members_sql(cursor, branch_id)
+        self._apply_stats_delta(cursor, branch_id, members_sql, params, 1)
 
-        if rows:
-            cursor.executemany(
-                "INSERT INTO doc_data (doc_idx, field_idx, value) VALUES (?, ?, ?)",
-                rows,
+    def _ensure_branch_stats(self, cursor, branch_id):
+        """Build a branch's catalog if it has none; return its document count."""
+        cursor.execute(
+            "SELECT doc_count FROM branch_stats WHERE branch_id = ?", (branch_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("SELECT 1 FROM branches WHERE branch_id = ?", (branch_id,))
+            if cursor.fetchone() is None:
+                return 0
+            self._rebuild_branch_stats(cursor, branch_id)
+            self.dbid.commit()
+            cursor.execute(
+                "SELECT doc_count FROM branch_stats WHERE branch_id = ?", (branch_id,)
             )
+            row = cursor.fetchone()
+        return row["doc_count"]
 
-    @staticmethod
-    def _matlab_compatible_props(props):
-        """Return a deep copy of props with single-element lists unwrapped to scalars.
-
-        MATLAB's jsonencode converts single-element cell arrays to scalars.
-        This replicates that behavior so DID-matlab can read Python-created databases.
-        """
-        import copy
+    def stats(self, branch_id=None, values=True, top=10, rebuild=False):
+        """Return summary statistics for the documents of a branch.
 
-        props = copy.deepcopy(props)
+        The result is a dictionary with "doc_count", "classes" (class name ->
+        number of documents) and "fields" (field name -> {"doc_count": number
+        of documents with the field}). These come from a catalog that is
+        updated on every add, remove, update and merge, so reading them does
+        not touch the documents.
 
-        # Unwrap document_class.superclasses
-        dc = props.get("document_class", {})
-        sc = dc.get("superclasses")
-        if isinstance(sc, list) and len(sc) == 1:
-            dc["superclasses"] = sc[0]
+        With values=True each field also gets "distinct" (its number of
+        distinct values) and "histogram", a list of the `top` most common
+        (value, count) pairs. These are computed in SQL on the first call after
+        the branch changes and cached until the next change.
 
-        # Unwrap depends_on
-        dep = props.get("depends_on")
-        if isinstance(dep, list) and len(dep) == 1:
-            props["depends_on"] = dep[0]
+        The catalog is built the first time it is needed; rebuild=True forces
+        that, e.g. after another program has written to the database.
+        """
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        cursor = self.dbid.cursor()
+        cursor.execute("SELECT 1 FROM branches WHERE branch_id = ?", (branch_id,))
+        if not cursor.fetchone():
+            raise ValueError(f"Branch '{branch_id}' does not exist.")
 
-        # Unwrap files.file_info
-        files = props.get("files")
-        if isinstance(files, dict):
-            fi = files.get("file_info")
-            if isinstance(fi, list):
-                if len(fi) == 1:
-                    files["file_info"] = fi[0]
+        if rebuild:
+            self._rebuild_branch_stats(cursor, branch_id)
+            self.dbid.commit()
+        doc_count = self._ensure_branch_stats(cursor, branch_id)
+        cursor.execute(
+            "SELECT version FROM branch_stats WHERE branch_id = ?", (branch_id,)
+        )
+        version = cursor.fetchone()["version"]
 
-        return props
+        cursor.execute(
+            "SELECT class_name, doc_count FROM branch_class_stats "
+            "WHERE branch_id = ? ORDER BY class_name",
+            (branch_id,),
+        )
+        classes = {r["class_name"]: r["doc_count"] for r in cursor.fetchall()}
+        cursor.execute(
+            "SELECT f.field_idx, f.field_name, s.doc_count "
+            "FROM branch_field_stats s JOIN fields f ON f.field_idx = s.field_idx "
+            "WHERE s.branch_id = ? ORDER BY f.field_name",
+            (branch_id,),
+        )
+        field_rows = cursor.fetchall()
+        fields = {r["field_name"]: {"doc_count": r["doc_count"]} for r in field_rows}
 
-    @staticmethod
-    def _normalize_loaded_props(props):
-        """Ensure superclasses, depends_on, file_info, and locations are always lists.
+        if values:
+            value_stats = self._field_value_stats(cursor, branch_id, version, top)
+            for r in field_rows:
+                distinct, histogram = value_stats.get(r["field_idx"], (0, []))
+                fields[r["field_name"]]["distinct"] = distinct
+                fields[r["field_name"]]["histogram"] = histogram
 
-        Inverse of _matlab_compatible_props. Mutates and returns props.
-        """
-        dc = props.get("document_class", {})
-        sc = dc.get("superclasses")
-        if sc is not None and not isinstance(sc, list):
-            dc["superclasses"] = [sc]
+        return {"doc_count": doc_count, "classes": classes, "fields": fields}
 
-        dep = props.get("depends_on")
-        if dep is not None and not isinstance(dep, list):
-            props["depends_on"] = [dep]
+    def _field_value_stats(self, cursor, branch_id, version, top):
+        """Return {field_idx: (distinct, [(value, count), ...])} for a branch."""
+        cached = self._value_stats_cache.get(branch_id)
+        if cached is not None and cached[0] == (version, top):
+            return cached[1]
 
-        # Re-wrap files.file_info (but not locations, which may be a bare dict
-        # from add_file in the Python API)
-        files = props.get("files")
-        if isinstance(files, dict):
-            fi = files.get("file_info")
-            if isinstance(fi, dict):
-                files["file_info"] = [fi]
+        members_sql, params = self._branch_members_sql(cursor, branch_id)
+        cursor.execute(
+            "SELECT field_idx, value, COUNT(*) AS n FROM doc_data "
+            f"WHERE doc_idx IN ({members_sql}) GROUP BY field_idx, value "
+            "ORDER BY field_idx, n DESC, value",
+            params,
+        )
+        result = {}
+        for r in cursor.fetchall():
+            distinct, histogram = result.get(r["field_idx"], (0, []))
+            if len(histogram) < top:
+                histogram.append((r["value"], r["n"]))
+            result[r["field_idx"]] = (distinct + 1, histogram)
+        self._value_stats_cache[branch_id] = ((version, top), result)
+        return result
+
+    # --- Frozen branches ---
+
+    def _snapshot_path(self, branch_id):
+        import hashlib
+        from ..file import string_to_filestring
+
+        digest = hashlib.sha1(branch_id.encode("utf-8")).hexdigest()[:8]
+        return os.path.join(
+            os.path.basename(self.connection) + ".frozen",
+            f"{string_to_filestring(branch_id)}_{digest}.sqlite",
+        )
 
-        return props
+    def _do_freeze_branch(self, branch_id):
+        """Make a branch immutable and build its read-optimized snapshot.
 
-    def _do_add_doc(self, document_obj, branch_id, **kwargs):
-        import json
+        The snapshot is a separate SQLite file next to the database holding
+        only the branch's documents, their doc_data rows sorted by
+        (field_idx, value) and the fields table, with indexes for search. It
+        is opened read-only with immutable=1, so reads on the frozen branch
+        take no locks and never see later writes to the main database.
+        """
         import time
 
-        doc_id = document_obj.id()
         cursor = self.dbid.cursor()
+        cursor.execute("SELECT 1 FROM branches WHERE branch_id = ?", (branch_id,))
+        if not cursor.fetchone():
+            raise ValueError(f"Branch '{branch_id}' does not exist.")
+        if branch_id in self.frozen_branch_ids:
+            return
 
-        cursor.execute("SELECT doc_idx FROM docs WHERE doc_id = ?", (doc_id,))
-        row = cursor.fetchone()
+        relative = self._snapshot_path(branch_id)
+        db_dir = os.path.dirname(os.path.abspath(self.connection))
+        path = os.path.join(db_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)
 
-        if row:
-            doc_idx = row["doc_idx"]
-        else:
-            json_code = json.dumps(
-                self._matlab_compatible_props(document_obj.document_properties)
+        self.dbid.commit()
+        members_sql, params = self._branch_members_sql(cursor, branch_id)
+        cursor.execute("ATTACH DATABASE ? AS snap", (path,))
+        try:
+            cursor.execute(
+                "CREATE TABLE snap.docs ("
+                "doc_idx INTEGER PRIMARY KEY, doc_id TEXT NOT NULL UNIQUE, "
+                "json_code TEXT)"
             )
             cursor.execute(
-                "INSERT INTO docs (doc_id, json_code, timestamp) VALUES (?, ?, ?)",
-                (doc_id, json_code, time.time()),
+                "INSERT INTO snap.docs (doc_idx, doc_id, json_code) "
+                "SELECT doc_idx, doc_id, json_code FROM main.docs "
+                f"WHERE doc_idx IN ({members_sql}) ORDER BY doc_idx",
+                params,
             )
-            doc_idx = cursor.lastrowid
+            cursor.execute(
+                "CREATE TABLE snap.fields ("
+                "field_idx INTEGER PRIMARY KEY, class TEXT, "
+                "field_name TEXT NOT NULL UNIQUE, json_name TEXT)"
+            )
+            cursor.execute(
+                "INSERT INTO snap.fields SELECT field_idx, class, field_name, "
+                "json_name FROM main.fields ORDER BY field_idx"
+            )
+            cursor.execute(
+                "CREATE TABLE snap.doc_data ("
+                "doc_idx INTEGER NOT NULL, field_idx INTEGER NOT NULL, value BLOB)"
+            )
+            cursor.execute(
+                "INSERT INTO snap.doc_data (doc_idx, field_idx, value) "
+                "SELECT dd.doc_idx, dd.field_idx, dd.value FROM main.doc_data dd "
+                "JOIN snap.docs d ON d.doc_idx = dd.doc_idx "
+                "ORDER BY dd.field_idx, dd.value"
+            )
+            cursor.execute(
+                "CREATE INDEX snap.doc_data_field_value ON doc_data (field_idx, value)"
+            )
+            cursor.execute("CREATE INDEX snap.doc_data_doc ON doc_data (doc_idx)")
+            cursor.execute("ANALYZE snap")
+            cursor.execute(
+                "INSERT INTO main.frozen_branches (branch_id, snapshot, timestamp) "
+                "VALUES (?, ?, ?)",
+                (branch_id, relative, time.time()),
+            )
+            self._bump_write_generation(cursor)
+            self.dbid.commit()
+        except Exception:
+            self.dbid.rollback()
+            raise
+        finally:
+            cursor.execute("DETACH DATABASE snap")
+
+        self.frozen_branch_ids.append(branch_id)
+
+    def _do_unfreeze_branch(self, branch_id):
+        """Make a frozen branch writable again and delete its snapshot."""
+        conn = self._snapshots.pop(branch_id, None)
+        if conn is not None:
+            conn.close()
+        self._snapshot_search_cache = {
+            k: v for k, v in self._snapshot_search_cache.items() if k[0] != branch_id
+        }
+        cursor = self.dbid.cursor()
+        cursor.execute(
+            "SELECT snapshot FROM frozen_branches WHERE branch_id = ?", (branch_id,)
+        )
+        row = cursor.fetchone()
+        cursor.execute("DELETE FROM frozen_branches WHERE branch_id = ?", (branch_id,))
+        self._bump_write_generation(cursor)
+        self.dbid.commit()
+        if branch_id in self.frozen_branch_ids:
+            self.frozen_branch_ids.remove(branch_id)
+        if row:
+            db_dir = os.path.dirname(os.path.abspath(self.connection))
+            path = os.path.join(db_dir, row["snapshot"])
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _snapshot(self, branch_id):
+        """Return the read-only snapshot connection of a frozen branch, or None."""
+        if branch_id not in self.frozen_branch_ids:
+            return None
+        conn = self._snapshots.get(branch_id)
+        if conn is None:
+            from urllib.parse import quote
 
-            # Populate fields and doc_data tables (matching MATLAB's doc2sql behavior)
-            self._populate_doc_data(cursor, doc_idx, document_obj)
+            rows = self.do_run_sql_query(
+                "SELECT snapshot FROM frozen_branches WHERE branch_id = ?",
+                (branch_id,),
+            )
+            if not rows:
+                return None
+            db_dir = os.path.dirname(os.path.abspath(self.connection))
+            path = os.path.join(db_dir, rows[0]["snapshot"])
+            conn = sqlite3.connect(
+                f"file:{quote(path)}?mode=ro&immutable=1",
+                uri=True,
+                check_same_thread=False,
+            )
+            conn.row_factory = sqlite3.Row
+            conn.create_function("regexp", 2, _sqlite_regexp, deterministic=True)
+            self._snapshots[branch_id] = conn
+        return conn
 
-        try:
+    # --- Garbage collection ---
+
+    def _orphan_doc_count(self, cursor):
+        cursor.execute(
+            "SELECT COUNT(*) FROM docs WHERE NOT EXISTS ("
+            "SELECT 1 FROM branch_docs bd WHERE bd.doc_idx = docs.doc_idx)"
+        )
+        return cursor.fetchone()[0]
+
+    def gc(
+        self, batch_size=1000, progress=None, vacuum="incremental", vacuum_into=None
+    ):
+        """Delete documents that no branch refers to and reclaim their space.
+
+        Unreferenced documents are found with an anti-join of docs against
+        branch_docs (copy-on-write branches only ever see documents that some
+        branch lists in branch_docs). They are deleted, together with their
+        doc_data, files and side-table rows, in transactions of at most
+        batch_size documents. Because every batch commits on its own, gc can
+        be interrupted at any point and simply run again to continue.
+
+        progress, if given, is called as progress(deleted, total) after every
+        batch; returning False stops the collection early.
+
+        Afterwards free pages are handed back to the file system:
+        vacuum="incremental" runs PRAGMA incremental_vacuum (effective for
+        databases created with auto_vacuum=INCREMENTAL, which SQLiteDB does for
+        new files), vacuum="full" runs VACUUM, and vacuum=None skips this
+        step. With vacuum_into set to a file name, a compacted copy of the
+        database is written there with VACUUM INTO instead.
+
+        Files in the file store that no document refers to any more are
+        deleted once the collection is complete (see _collect_file_blobs).
+
+        Returns {"deleted": n, "complete": bool}, with "files_deleted": n
+        added when store files were deleted.
+        """
+        cursor = self.dbid.cursor()
+        total = self._orphan_doc_count(cursor)
+        deleted = 0
+        complete = True
+
+        while True:
             cursor.execute(
-                "INSERT INTO branch_docs (branch_id, doc_idx, timestamp) VALUES (?, ?, ?)",
-                (branch_id, doc_idx, time.time()),
+                "SELECT doc_idx FROM docs WHERE NOT EXISTS ("
+                "SELECT 1 FROM branch_docs bd WHERE bd.doc_idx = docs.doc_idx) "
+                "LIMIT ?",
+                (batch_size,),
             )
-            self.dbid.commit()
-        except sqlite3.IntegrityError as e:
-            if "FOREIGN KEY" in str(e):
-                raise ValueError(f"Branch '{branch_id}' does not exist.")
-            # Ignore other integrity errors (duplicates)
-            pass
+            batch = [row["doc_idx"] for row in cursor.fetchall()]
+            if not batch:
+                break
+            try:
+                self._delete_doc_rows(cursor, batch)
+                self._bump_write_generation(cursor)
+                self.dbid.commit()
+            except Exception:
+                self.dbid.rollback()
+                raise
+            deleted += len(batch)
+            if progress is not None and progress(deleted, total) is False:
+                complete = self._orphan_doc_count(cursor) == 0
+                break
+
+        result = {"deleted": deleted, "complete": complete}
+        if complete:
+            files_deleted = self._collect_file_blobs(cursor)
+            if files_deleted:
+                result["files_deleted"] = files_deleted
+
+        if vacuum_into is not None:
+            self.dbid.execute("VACUUM INTO ?", (vacuum_into,))
+        elif vacuum == "incremental":
+            self.dbid.execute("PRAGMA incremental_vacuum").fetchall()
+        elif vacuum == "full":
+            self.dbid.execute("VACUUM")
+        elif vacuum is not None:
+            raise ValueError(f"Unknown vacuum mode '{vacuum}'.")
+
+        return result
 
     # --- SQL-based search (matching MATLAB's database.m) ---
 
@@ -335,77 +2056,299 @@ class SQLiteDB(Database):
         # Register regexp function for sqlite
         self.dbid.create_function("regexp", 2, _sqlite_regexp)
 
+        if self._snapshot(branch_id) is not None:
+            # Frozen branches never change, so their results can be reused
+            key = (branch_id, repr(search_params))
+            if key not in self._snapshot_search_cache:
+                self._snapshot_search_cache[key] = self._search_doc_ids(
+                    search_params, branch_id
+                )
+            return list(self._snapshot_search_cache[key])
+
         doc_ids = self._search_doc_ids(search_params, branch_id)
         return doc_ids
 
+    # Fraction of a field's documents a leaf is assumed to match, used to
+    # order the clauses of an AND (see _plan_search).
+    _LEAF_SELECTIVITY = {
+        "exact_string": 0.1,
+        "exact_string_anycase": 0.1,
+        "exact_number": 0.1,
+        "contains_string": 0.25,
+        "regexp": 0.25,
+        "lessthan": 0.33,
+        "lessthaneq": 0.33,
+        "greaterthan": 0.33,
+        "greaterthaneq": 0.33,
+        "hasfield": 1.0,
+        "depends_on": 0.1,
+    }
+
+    # Candidate sets up to this size are passed to SQL leaves as parameters
+    _MAX_CANDIDATE_PARAMS = 500
+
+    def explain(self, query_obj, branch_id=None, analyze=False):
+        """Return the plan search() would use for a query.
+
+        The plan is a tree of dictionaries with "operation", "estimate" (the
+        expected number of matching documents, from the statistics catalog)
+        and "method" ("sql", "brute_force", "and" or "or"); leaves also have
+        "field" and "and"/"or" nodes have "children" in execution order.
+        With analyze=True the query is run as well and every node gets "rows",
+        the number of documents it returned, or "skipped": True if an earlier
+        clause of its AND already matched nothing.
+        """
+        if branch_id is None:
+            branch_id = self.current_branch_id
+        self.dbid.create_function("regexp", 2, _sqlite_regexp)
+        plan = self._plan_search(query_obj.to_search_structure(), branch_id)
+        if analyze:
+            self._run_search_plan(plan, branch_id, None, annotate=True)
+        return plan
+
     def _search_doc_ids(self, search_struct, branch_id):
-        """Recursively search for doc_ids matching the search structure.
+        """Search for doc_ids matching the search structure.
 
         Matches MATLAB's search_doc_ids: struct arrays are AND'd, 'or' operations
-        are unioned, leaf queries go through SQL.
+        are unioned, leaf queries go through SQL. The clauses of an AND are run
+        most selective first, each one only over the documents the previous
+        ones matched, stopping as soon as none are left.
+        """
+        plan = self._plan_search(search_struct, branch_id, build_catalog=False)
+        return self._run_search_plan(plan, branch_id, None)
+
+    def _plan_search(self, search_struct, branch_id, build_catalog=True):
+        """Build the plan tree for a search structure (see explain).
+
+        With build_catalog=False the search only reads: a branch without a
+        statistics catalog keeps its clauses in the order they were written,
+        and the catalog is not read at all when no AND has clauses to order.
         """
+        cursor = self.dbid.cursor()
+        if build_catalog:
+            self._ensure_branch_stats(cursor, branch_id)
+        elif not self._has_and(search_struct):
+            return self._plan_node(search_struct, 0, {}, {})
+
+        cursor.execute(
+            "SELECT doc_count FROM branch_stats WHERE branch_id = ?", (branch_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return self._plan_node(search_struct, 0, {}, {})
+        cursor.execute(
+            "SELECT f.field_name, s.doc_count FROM branch_field_stats s "
+            "JOIN fields f ON f.field_idx = s.field_idx WHERE s.branch_id = ?",
+            (branch_id,),
+        )
+        field_counts = {r["field_name"]: r["doc_count"] for r in cursor.fetchall()}
+        cursor.execute(
+            "SELECT class_name, doc_count FROM branch_class_stats WHERE branch_id = ?",
+            (branch_id,),
+        )
+        class_counts = {r["class_name"]: r["doc_count"] for r in cursor.fetchall()}
+        return self._plan_node(
+            search_struct, row["doc_count"], field_counts, class_counts
+        )
+
+    @classmethod
+    def _has_and(cls, search_struct):
+        """Return whether a search structure has an AND of several clauses."""
         if isinstance(search_struct, list):
-            if not search_struct:
-                return []
-            # AND: intersect results from all sub-queries
-            result = None
-            for item in search_struct:
-                ids = self._search_doc_ids(item, branch_id)
-                if result is None:
-                    result = set(ids)
-                else:
-                    result &= set(ids)
-            return list(result) if result else []
+            return len(search_struct) > 1 or any(
+                cls._has_and(item) for item in search_struct
+            )
+        if isinstance(search_struct, dict):
+            operation = search_struct.get("operation", "").lstrip("~").lower()
+            if operation == "or":
+                return any(
+                    cls._has_and(search_struct.get(p)) for p in ("param1", "param2")
+                )
+        return False
+
+    def _plan_node(self, search_struct, doc_count, field_counts, class_counts):
+        if isinstance(search_struct, list):
+            children = [
+                self._plan_node(item, doc_count, field_counts, class_counts)
+                for item in search_struct
+            ]
+            # Brute-force leaves load every candidate document, so they go last
+            children.sort(key=lambda c: (c["method"] == "brute_force", c["estimate"]))
+            estimate = min((c["estimate"] for c in children), default=0)
+            return {
+                "operation": "and",
+                "method": "and",
+                "estimate": estimate,
+                "children": children,
+            }
 
         if not isinstance(search_struct, dict):
-            return []
+            return {"operation": "none", "method": "none", "estimate": 0}
 
         operation = search_struct.get("operation", "")
-        negation = False
-        op = operation
-        if op.startswith("~"):
-            negation = True
-            op = op[1:]
-        op_lower = op.lower()
+        negation = operation.startswith("~")
+        op_lower = operation.lstrip("~").lower()
 
         if op_lower == "or":
-            # OR: union results from param1 and param2
-            p1 = search_struct.get("param1")
-            p2 = search_struct.get("param2")
-            ids1 = self._search_doc_ids(p1, branch_id) if p1 else []
-            ids2 = self._search_doc_ids(p2, branch_id) if p2 else []
-            result = list(set(ids1) | set(ids2))
+            children = [
+                self._plan_node(p, doc_count, field_counts, class_counts)
+                for p in (search_struct.get("param1"), search_struct.get("param2"))
+                if p
+            ]
+            estimate = min(doc_count, sum(c["estimate"] for c in children))
+            node = {
+                "operation": operation,
+                "method": "or",
+                "estimate": estimate,
+                "children": children,
+            }
+        else:
+            field = search_struct.get("field", "")
+            sql_clause = self._query_struct_to_sql_str(search_struct)
+            if op_lower == "isa":
+                matched = class_counts.get(search_struct.get("param1"), 0)
+                estimate = matched + 0.1 * (doc_count - matched)
+            elif op_lower == "hasfield":
+                estimate = min(
+                    doc_count,
+                    sum(
+                        n
+                        for name, n in field_counts.items()
+                        if name == field or name.startswith(field + ".")
+                    ),
+                )
+            elif op_lower == "depends_on":
+                estimate = field_counts.get("meta.depends_on", 0) * 0.1
+            elif op_lower in self._LEAF_SELECTIVITY:
+                estimate = field_counts.get(field, 0) * self._LEAF_SELECTIVITY[op_lower]
+            else:
+                estimate = doc_count * 0.5
+            node = {
+                "operation": operation,
+                "field": field,
+                "method": "sql" if sql_clause is not None else "brute_force",
+                "estimate": estimate,
+                "struct": search_struct,
+            }
+            negation = negation and sql_clause is not None
+
+        if negation:
+            node["estimate"] = doc_count - node["estimate"]
+        node["estimate"] = max(0, round(node["estimate"]))
+        return node
+
+    def _run_search_plan(self, node, branch_id, candidates, annotate=False):
+        """Execute a plan node, returning the list of matching doc ids.
+
+        If candidates is a list, only documents in it are considered. A SQL
+        leaf returns its rows in SQL order, an AND keeps the order of the
+        clause it ran first and an OR lists its first child's matches first.
+        """
+        method = node["method"]
+        operation = node["operation"]
+        negation = operation.startswith("~")
+
+        if method == "and":
+            result = candidates
+            children = node["children"]
+            if not children:
+                result = []
+            for i, child in enumerate(children):
+                matched = self._run_search_plan(child, branch_id, result, annotate)
+                if result is not None:
+                    keep = set(matched)
+                    matched = [doc_id for doc_id in result if doc_id in keep]
+                result = matched
+                if not result:
+                    if annotate:
+                        for skipped in children[i + 1 :]:
+                            skipped["skipped"] = True
+                    break
+        elif method == "or":
+            result = {}
+            for child in node["children"]:
+                result.update(
+                    dict.fromkeys(
+                        self._run_search_plan(child, branch_id, candidates, annotate)
+                    )
+                )
+            result = list(result)
             if negation:
-                all_ids = set(self._do_get_doc_ids(branch_id))
-                result = list(all_ids - set(result))
-            return result
+                universe = (
+                    candidates
+                    if candidates is not None
+                    else self._do_get_doc_ids(branch_id)
+                )
+                matched = set(result)
+                result = [doc_id for doc_id in universe if doc_id not in matched]
+        elif method == "sql":
+            result = self._run_sql_leaf(node["struct"], branch_id, candidates)
+        elif method == "brute_force":
+            result = self._brute_force_search(node["struct"], branch_id, candidates)
+        else:
+            result = []
 
-        # Leaf query: build SQL and execute
-        sql_clause = self._query_struct_to_sql_str(search_struct)
-        if sql_clause is None:
-            # Fallback to brute-force for unsupported operations
-            return self._brute_force_search(search_struct, branch_id)
+        if annotate:
+            node["rows"] = len(result)
+        return result
 
-        query = (
-            "SELECT DISTINCT docs.doc_id FROM docs, branch_docs, doc_data, fields "
-            "WHERE docs.doc_idx = doc_data.doc_idx "
-            "AND docs.doc_idx = branch_docs.doc_idx "
-            "AND branch_docs.branch_id = ? "
-            "AND fields.field_idx = doc_data.field_idx "
-            f"AND {sql_clause}"
-        )
+    def _run_sql_leaf(self, search_struct, branch_id, candidates):
+        """Run one SQL-compatible leaf, restricted to candidates if given."""
+        sql_clause = self._query_struct_to_sql_str(search_struct)
+        negation = search_struct.get("operation", "").startswith("~")
+
+        candidate_sql, candidate_params = "", ()
+        if candidates is not None and len(candidates) <= self._MAX_CANDIDATE_PARAMS:
+            candidate_params = tuple(candidates)
+            placeholders = ",".join("?" for _ in candidate_params)
+            candidate_sql = f"AND docs.doc_id IN ({placeholders}) "
+
+        snapshot = self._snapshot(branch_id)
+        if snapshot is not None:
+            # Every document in a snapshot belongs to the branch
+            query = (
+                "SELECT DISTINCT docs.doc_id FROM docs, doc_data, fields "
+                "WHERE docs.doc_idx = doc_data.doc_idx "
+                f"{candidate_sql}"
+                "AND fields.field_idx = doc_data.field_idx "
+                f"AND {sql_clause}"
+            )
+            params = candidate_params
+        else:
+            members_sql, params = self._branch_members_sql(
+                self.dbid.cursor(), branch_id
+            )
+            query = (
+                "SELECT DISTINCT docs.doc_id FROM docs, doc_data, fields "
+                "WHERE docs.doc_idx = doc_data.doc_idx "
+                f"AND docs.doc_idx IN ({members_sql}) "
+                f"{candidate_sql}"
+                "AND fields.field_idx = doc_data.field_idx "
+                f"AND {sql_clause}"
+            )
+            params = params + candidate_params
 
         try:
-            rows = self.do_run_sql_query(query, (branch_id,))
+            if snapshot is not None:
+                rows = snapshot.execute(query, params).fetchall()
+            else:
+                rows = self.do_run_sql_query(query, params)
             matched = [row["doc_id"] for row in rows]
         except sqlite3.OperationalError:
             # Fallback on SQL error
-            return self._brute_force_search(search_struct, branch_id)
+            return self._brute_force_search(search_struct, branch_id, candidates)
 
         if negation:
-            all_ids = set(self._do_get_doc_ids(branch_id))
-            return list(all_ids - set(matched))
-
+            universe = (
+                candidates
+                if candidates is not None
+                else self._do_get_doc_ids(branch_id)
+            )
+            hits = set(matched)
+            return [doc_id for doc_id in universe if doc_id not in hits]
+        if candidates is not None and not candidate_sql:
+            allowed = set(candidates)
+            matched = [doc_id for doc_id in matched if doc_id in allowed]
         return matched
 
     def _query_struct_to_sql_str(self, search_struct):
@@ -494,11 +2437,14 @@ class SQLiteDB(Database):
 
         return None
 
-    def _brute_force_search(self, search_struct, branch_id):
+    def _brute_force_search(self, search_struct, branch_id, candidates=None):
         """Fall back to brute-force field_search for unsupported SQL operations."""
         from ..datastructures import field_search
 
-        doc_ids = self._do_get_doc_ids(branch_id)
+        if candidates is not None:
+            doc_ids = list(candidates)
+        else:
+            doc_ids = self._do_get_doc_ids(branch_id)
         docs = self.get_docs(doc_ids, OnMissing="ignore")
         if docs is None:
             docs = []
@@ -511,19 +2457,37 @@ class SQLiteDB(Database):
                 matched.append(doc.id())
         return matched
 
-    def _do_get_doc(self, document_id, OnMissing="error", **kwargs):
-        from ..document import Document
+    def _decode_doc(self, json_code, compact=False, frozen=False):
+        """Decode a json_code value into a Document.
+
+        With compact=True, dict keys are interned while decoding so that all
+        loaded documents share one copy of each key string. With frozen=True
+        the properties are additionally returned as an immutable view (see
+        did.document.freeze).
+        """
+        from ..document import Document, interned_dict, freeze
         import json
 
+        if compact or frozen:
+            doc_struct = json.loads(json_code, object_pairs_hook=interned_dict)
+        else:
+            doc_struct = json.loads(json_code)
+        doc_struct = self._normalize_loaded_props(doc_struct)
+        if frozen:
+            doc_struct = freeze(doc_struct)
+        return Document(doc_struct)
+
+    def _do_get_doc(self, document_id, OnMissing="error", **kwargs):
         row = self.do_run_sql_query(
             "SELECT json_code FROM docs WHERE doc_id = ?", (document_id,)
         )
 
         if row:
-            json_code = row[0]["json_code"]
-            doc_struct = json.loads(json_code)
-            doc_struct = self._normalize_loaded_props(doc_struct)
-            return Document(doc_struct)
+            return self._decode_doc(
+                row[0]["json_code"],
+                compact=kwargs.get("compact", False),
+                frozen=kwargs.get("frozen", False),
+            )
         else:
             # Handle missing document
             if OnMissing == "warn":
@@ -538,9 +2502,11 @@ class SQLiteDB(Database):
         """Bulk-fetch documents in a single SQL query.
 
         Overrides the base class one-at-a-time loop for efficiency.
+        Pass compact=True to intern property keys, or frozen=True to also make
+        the properties immutable, when holding many documents in memory.
         """
-        from ..document import Document
-        import json
+        compact = kwargs.get("compact", False)
+        frozen = kwargs.get("frozen", False)
 
         is_single = isinstance(document_ids, str)
         if is_single:
@@ -569,17 +2535,19 @@ class SQLiteDB(Database):
 
         # Single SELECT ... WHERE doc_id IN (?, ?, ...)
         placeholders = ",".join("?" for _ in document_ids)
-        rows = self.do_run_sql_query(
-            f"SELECT doc_id, json_code FROM docs WHERE doc_id IN ({placeholders})",
-            tuple(document_ids),
-        )
+        query = f"SELECT doc_id, json_code FROM docs WHERE doc_id IN ({placeholders})"
+        snapshot = self._snapshot(branch_id) if branch_id is not None else None
+        if snapshot is not None:
+            rows = snapshot.execute(query, tuple(document_ids)).fetchall()
+        else:
+            rows = self.do_run_sql_query(query, tuple(document_ids))
 
         # Build lookup dict
         doc_map = {}
         for row in rows:
-            doc_struct = json.loads(row["json_code"])
-            doc_struct = self._normalize_loaded_props(doc_struct)
-            doc_map[row["doc_id"]] = Document(doc_struct)
+            doc_map[row["doc_id"]] = self._decode_doc(
+                row["json_code"], compact=compact, frozen=frozen
+            )
 
         # Preserve original order
         docs = []
@@ -595,14 +2563,209 @@ class SQLiteDB(Database):
             return docs[0] if docs else None
         return docs
 
-    def get_docs_by_branch(self, branch_id=None):
+    def get_docs_by_branch(self, branch_id=None, **kwargs):
         """Return all documents on a branch."""
         if branch_id is None:
             branch_id = self.current_branch_id
         doc_ids = self.get_doc_ids(branch_id)
-        return self.get_docs(doc_ids, OnMissing="ignore")
+        return self.get_docs(doc_ids, OnMissing="ignore", **kwargs)
+
+    # --- File store ---
+
+    def _resolve_location(self, location):
+        """Return the path of a file location, rebasing relative paths on the database's directory."""
+        if not os.path.isabs(location):
+            db_dir = os.path.dirname(os.path.abspath(self.connection))
+            location = os.path.join(db_dir, location)
+        return location
+
+    def _store_dir(self):
+        """Return the directory of the file store, <database>.files/."""
+        return os.path.abspath(self.connection) + ".files"
+
+    def _blob_path(self, uid):
+        """Return the path of the blob with hash uid."""
+        return os.path.join(self._store_dir(), uid[:2], uid)
+
+    @staticmethod
+    def _file_locations(props):
+        """Yield (name, location) for the files a document lists."""
+        files = props.get("files")
+        if not isinstance(files, Mapping):
+            return
+        file_info = files.get("file_info") or []
+        if isinstance(file_info, Mapping):
+            file_info = [file_info]
+        for info in file_info:
+            locations = info.get("locations")
+            if isinstance(locations, list):
+                locations = locations[0] if locations else None
+            if isinstance(locations, Mapping) and locations.get("location"):
+                yield info.get("name"), str(locations["location"])
+
+    _HASH_CHUNK_SIZE = 1 << 20
+
+    def _store_file(self, path):
+        """Store the file at path once, by content, and return (uid, size).
+
+        The file is streamed through SHA-256 first; only content that is not
+        in the store yet is copied, hashing again while copying so that the
+        blob always matches its name.
+        """
+        import hashlib
+        import uuid
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            while chunk := f.read(self._HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        uid = digest.hexdigest()
+        blob = self._blob_path(uid)
+        if os.path.exists(blob):
+            # Keep gc from sweeping it before the caller commits
+            os.utime(blob)
+            return uid, os.path.getsize(blob)
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        tmp = f"{blob}.{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        try:
+            with open(path, "rb") as src, open(tmp, "wb") as dst:
+                while chunk := src.read(self._HASH_CHUNK_SIZE):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            # The file may have changed since it was first hashed
+            uid = digest.hexdigest()
+            blob = self._blob_path(uid)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(tmp, blob)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return uid, os.path.getsize(blob)
+
+    def _sync_doc_files(self, cursor, doc_idx, props):
+        """Bring a document's doc_files rows in line with its file list (no commit).
+
+        Each local file the document lists is put in the file store and gets
+        a doc_files row whose uid is the content hash, counted in file_blobs.
+        Rows for files the document no longer lists, or that now point
+        elsewhere, are dropped and their references released. Locations that
+        are not existing local files (e.g. URLs) are left to open_doc.
+        """
+        if not self.ingest_files:
+            return
+        cursor.execute(
+            "SELECT filename, uid, orig_location FROM doc_files WHERE doc_idx = ?",
+            (doc_idx,),
+        )
+        stored = {
+            r["filename"]: (r["uid"], r["orig_location"]) for r in cursor.fetchall()
+        }
+        wanted = dict(self._file_locations(props))
+
+        for name, (uid, location) in stored.items():
+            if wanted.get(name) != location:
+                cursor.execute(
+                    "DELETE FROM doc_files WHERE doc_idx = ? AND filename = ?",
+                    (doc_idx, name),
+                )
+                cursor.execute(
+                    "UPDATE file_blobs SET ref_count = ref_count - 1 WHERE uid = ?",
+                    (uid,),
+                )
+
+        for name, location in wanted.items():
+            if name is None or stored.get(name, (None, None))[1] == location:
+                continue
+            path = self._resolve_location(location)
+            if not os.path.isfile(path):
+                continue
+            uid, size = self._store_file(path)
+            cursor.execute(
+                "INSERT INTO doc_files (doc_idx, filename, uid, orig_location) "
+                "VALUES (?, ?, ?, ?)",
+                (doc_idx, name, uid, location),
+            )
+            cursor.execute(
+                "INSERT INTO file_blobs (uid, size, ref_count) VALUES (?, ?, 1) "
+                "ON CONFLICT(uid) DO UPDATE SET ref_count = ref_count + 1",
+                (uid, size),
+            )
+
+    def _collect_file_blobs(self, cursor):
+        """Delete store files that no doc_files row refers to; return how many.
+
+        The file_blobs rows are deleted and committed first, so an interrupted
+        run leaves at most a file that is re-used or overwritten by the next
+        ingest of the same content. Files in the store that file_blobs does
+        not list at all, such as blobs written by an ingest that was rolled
+        back and leftover temporary files, are deleted once they are older
+        than FILE_STORE_GRACE_PERIOD.
+        """
+        import time
 
-    def open_doc(self, doc_id, filename):
+        cursor.execute("SELECT uid FROM file_blobs WHERE ref_count <= 0")
+        uids = [r["uid"] for r in cursor.fetchall()]
+        if uids:
+            cursor.executemany(
+                "DELETE FROM file_blobs WHERE uid = ? AND ref_count <= 0",
+                [(uid,) for uid in uids],
+            )
+            self.dbid.commit()
+        deleted = 0
+        for uid in uids:
+            try:
+                os.remove(self._blob_path(uid))
+                deleted += 1
+            except FileNotFoundError:
+                pass
+
+        cursor.execute("SELECT uid FROM file_blobs")
+        known = {r["uid"] for r in cursor.fetchall()}
+        cutoff = time.time() - self.FILE_STORE_GRACE_PERIOD
+        for dirpath, _, names in os.walk(self._store_dir()):
+            for name in names:
+                if name in known:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.path.getmtime(path) <= cutoff:
+                        os.remove(path)
+                        deleted += 1
+                except FileNotFoundError:
+                    pass
+        return deleted
+
+    def file_store_stats(self):
+        """Return the size of the file store and the space deduplication saves.
+
+        Returns {"files": n stored files, "references": n doc_files rows pointing
+        to them, "stored_bytes": bytes on disk, "referenced_bytes": bytes the
+        references would take if each had its own copy}.
+        """
+        rows = self.do_run_sql_query(
+            "SELECT COUNT(*) AS files, COALESCE(SUM(ref_count), 0) AS refs, "
+            "COALESCE(SUM(size), 0) AS stored, "
+            "COALESCE(SUM(size * ref_count), 0) AS referenced "
+            "FROM file_blobs WHERE ref_count > 0"
+        )
+        row = rows[0]
+        return {
+            "files": row["files"],
+            "references": row["refs"],
+            "stored_bytes": row["stored"],
+            "referenced_bytes": row["referenced"],
+        }
+
+    def open_doc(self, doc_id, filename, mmap=False):
+        """Return a ReadOnlyFileobj for a file of a document.
+
+        The file is read from the file store when the document's file was
+        ingested, and from the location in the document otherwise.
+        With mmap=True the file is memory-mapped when opened, so fread and
+        read_array return views instead of copies (see ReadOnlyFileobj).
+        """
         from ..file import ReadOnlyFileobj
 
         doc = self.get_docs(doc_id)
@@ -611,14 +2774,20 @@ class SQLiteDB(Database):
 
         is_in, info, _ = doc.is_in_file_list(filename)
         if is_in:
-            location = info["locations"]["location"]
+            rows = self.do_run_sql_query(
+                "SELECT f.uid FROM doc_files f JOIN docs d ON d.doc_idx = f.doc_idx "
+                "JOIN file_blobs b ON b.uid = f.uid "
+                "WHERE d.doc_id = ? AND f.filename = ?",
+                (doc_id, filename),
+            )
+            if rows:
+                blob = self._blob_path(rows[0]["uid"])
+                if os.path.exists(blob):
+                    return ReadOnlyFileobj(blob, mmap=mmap)
 
             # Rebase path if it's relative, assuming it's relative to the DB location
-            if not os.path.isabs(location):
-                db_dir = os.path.dirname(os.path.abspath(self.connection))
-                location = os.path.join(db_dir, location)
-
-            return ReadOnlyFileobj(location)
+            location = self._resolve_location(info["locations"]["location"])
+            return ReadOnlyFileobj(location, mmap=mmap)
 
         raise FileNotFoundError(f"File {filename} not found in document {doc_id}.")
 
@@ -636,11 +2805,8 @@ class SQLiteDB(Database):
 
         if row:
             doc_idx = row["doc_idx"]
-            # Remove from branch_docs
-            cursor.execute(
-                "DELETE FROM branch_docs WHERE branch_id = ? AND doc_idx = ?",
-                (branch_id, doc_idx),
-            )
+            # Remove from the branch (branch_docs or its copy-on-write overlay)
+            self._remove_branch_member(cursor, branch_id, doc_idx)
 
             # Optional: remove from docs and doc_data if no other branches reference it
             cursor.execute(
@@ -648,9 +2814,9 @@ class SQLiteDB(Database):
             )
             count = cursor.fetchone()[0]
             if count == 0:
-                cursor.execute("DELETE FROM doc_data WHERE doc_idx = ?", (doc_idx,))
-                cursor.execute("DELETE FROM docs WHERE doc_idx = ?", (doc_idx,))
+                self._delete_doc_rows(cursor, doc_idx)
 
+            self._bump_write_generation(cursor)
             self.dbid.commit()
         else:
             # Handle missing document
@@ -660,10 +2826,78 @@ class SQLiteDB(Database):
             elif on_missing != "ignore":
                 raise ValueError(f"Document id '{document_id}' not found for removal.")
 
+    def _dependents_closure(self, doc_ids, branch_id):
+        return [
+            doc_id for doc_id, _ in self.find_dependents(doc_ids, branch_id=branch_id)
+        ]
+
+    def _do_remove_docs(self, document_ids, branch_id):
+        """Remove many documents from a branch in one transaction."""
+        cursor = self.dbid.cursor()
+        cursor.execute("DROP TABLE IF EXISTS temp.remove_set")
+        cursor.execute("CREATE TEMP TABLE remove_set (doc_idx INTEGER PRIMARY KEY)")
+        try:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO temp.remove_set (doc_idx) "
+                "SELECT doc_idx FROM docs WHERE doc_id = ?",
+                [(doc_id,) for doc_id in document_ids],
+            )
+            if self._branch_base(
+                cursor, branch_id
+            ) is None and not self._overlay_children(cursor, branch_id):
+                self._apply_stats_delta(
+                    cursor,
+                    branch_id,
+                    "SELECT doc_idx FROM temp.remove_set WHERE doc_idx IN "
+                    "(SELECT doc_idx FROM branch_docs WHERE branch_id = ?)",
+                    (branch_id,),
+                    -1,
+                )
+                self._record_removals(
+                    cursor,
+                    branch_id,
+                    "SELECT doc_idx FROM temp.remove_set WHERE doc_idx IN "
+                    "(SELECT doc_idx FROM branch_docs WHERE branch_id = ?)",
+                    (branch_id,),
+                )
+                cursor.execute(
+                    "DELETE FROM branch_docs WHERE branch_id = ? AND doc_idx IN "
+                    "(SELECT doc_idx FROM temp.remove_set)",
+                    (branch_id,),
+                )
+            else:
+                cursor.execute("SELECT doc_idx FROM temp.remove_set")
+                for row in cursor.fetchall():
+                    self._remove_branch_member(cursor, branch_id, row["doc_idx"])
+
+            # Documents no branch refers to any more are deleted, as in remove_docs
+            cursor.execute(
+                "SELECT doc_idx FROM temp.remove_set "
+                "WHERE doc_idx NOT IN (SELECT doc_idx FROM branch_docs)"
+            )
+            self._delete_doc_rows(cursor, [row["doc_idx"] for row in cursor.fetchall()])
+            self._bump_write_generation(cursor)
+            self.dbid.commit()
+        except Exception:
+            self.dbid.rollback()
+            raise
+        finally:
+            cursor.execute("DROP TABLE IF EXISTS temp.remove_set")
+
     def _do_delete_branch(self, branch_id):
         cursor = self.dbid.cursor()
+        # Copy-on-write branches built on this one must stop depending on it
+        for child in self._overlay_children(cursor, branch_id):
+            self._compact_branch(cursor, child)
+        cursor.execute("DELETE FROM branch_removed WHERE branch_id = ?", (branch_id,))
+        cursor.execute(
+            "DELETE FROM branch_doc_removals WHERE branch_id = ?", (branch_id,)
+        )
+        cursor.execute("DELETE FROM branch_overlays WHERE branch_id = ?", (branch_id,))
         cursor.execute("DELETE FROM branch_docs WHERE branch_id = ?", (branch_id,))
+        self._drop_branch_stats(cursor, branch_id)
         cursor.execute("DELETE FROM branches WHERE branch_id = ?", (branch_id,))
+        self._bump_write_generation(cursor)
         self.dbid.commit()
 
     def _do_get_sub_branches(self, branch_id):
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestAddDocsCheckDependencies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "ingest.sqlite"))
+        self.db.add_branch("a", "")
+        self.stored = Document("demoA", **{"demoA.value": 0})
+        self.db.add_docs([self.stored], "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def _chain(self):
+        first = Document("demoC", **{"demoC.value": 1})
+        first.set_dependency_value("item1", self.stored.id())
+        second = Document("demoC", **{"demoC.value": 2})
+        second.set_dependency_value("item1", first.id())
+        return first, second
+
+    def test_batch_is_added_in_dependency_order(self):
+        first, second = self._chain()
+        order = []
+        original = self.db._do_add_doc
+
+        def record(doc, branch_id, **kwargs):
+            order.append(doc.id())
+            return original(doc, branch_id, **kwargs)
+
+        self.db._do_add_doc = record
+        self.db.add_docs([second, first], "a", check_dependencies=True)
+        self.assertEqual(order, [first.id(), second.id()])
+        self.assertEqual(len(self.db.get_doc_ids("a")), 3)
+
+    def test_missing_target_rejects_whole_batch(self):
+        first, second = self._chain()
+        dangling = Document("demoC", **{"demoC.value": 3})
+        dangling.set_dependency_value("item1", "no_such_doc")
+        with self.assertRaises(ValueError):
+            self.db.add_docs([first, second, dangling], "a", check_dependencies=True)
+        self.assertEqual(self.db.get_doc_ids("a"), [self.stored.id()])
+
+    def test_target_must_be_in_branch(self):
+        self.db.add_branch("b", "")
+        first, _ = self._chain()
+        missing = self.db.add_docs([first], "b", check_dependencies="report")
+        self.assertEqual(missing, [(first.id(), "item1", self.stored.id())])
+        self.assertEqual(self.db.get_doc_ids("b"), [])
+        self.assertEqual(
+            self.db.add_docs([first], "a", check_dependencies="report"), []
+        )
+        self.assertIn(first.id(), self.db.get_doc_ids("a"))
+
+    def test_cycle_is_rejected(self):
+        a = Document("demoC", **{"demoC.value": 1})
+        b = Document("demoC", **{"demoC.value": 2})
+        a.set_dependency_value("item1", b.id())
+        b.set_dependency_value("item1", a.id())
+        with self.assertRaises(ValueError):
+            self.db.add_docs([a, b], "a", check_dependencies=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import numpy as np
+
+from did.file import BinaryTable, Fileobj, lock_manager
+
+
+class TestBinaryTable(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "table.bin")
+        self.table = BinaryTable(
+            Fileobj(fullpathfilename=self.filename),
+            ["char", "double", "uint16"],
+            [4, 8, 6],
+            [4, 1, 3],
+            8,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _fill(self, n):
+        self.table.append_rows(
+            [(f"r{i}".encode(), i * 1.5, (i, i + 1, i + 2)) for i in range(n)]
+        )
+
+    def test_dtype(self):
+        self.assertEqual(self.table.dtype.names, ("c1", "c2", "c3"))
+        self.assertEqual(self.table.dtype.itemsize, self.table.row_size())
+        with self.assertRaises(ValueError):
+            BinaryTable(Fileobj(fullpathfilename=self.filename), "double", [4], 1, 0)
+
+    def test_append_and_read(self):
+        self.assertEqual(len(self.table.read_rows()), 0)
+        self._fill(5)
+        self.assertEqual(self.table.get_size()[0], 5)
+        self.assertEqual(os.path.getsize(self.filename), 8 + 5 * 18)
+
+        np.testing.assert_array_equal(self.table.read_column(2), np.arange(5) * 1.5)
+        np.testing.assert_array_equal(self.table.read_column(3, 1), [1, 2, 3])
+        rows = self.table.read_rows(slice(1, 3))
+        self.assertEqual(rows["c1"].tolist(), [b"r1", b"r2"])
+        self.assertEqual(self.table.read_row(4, 1), b"r3")
+        self.assertEqual(self.table.read_row(4, 2), 4.5)
+        with self.assertRaises(IndexError):
+            self.table.read_row(6, 1)
+        with self.assertRaises(IndexError):
+            self.table.read_row(1, 4)
+
+    def test_insert_rows(self):
+        self._fill(3)
+        self.table.insert_rows(0, [(b"a", -1.0, (0, 0, 0))])
+        self.table.insert_row(2, (b"b", -2.0, (0, 0, 0)))
+        self.assertEqual(
+            self.table.read_column(1).tolist(), [b"a", b"r0", b"b", b"r1", b"r2"]
+        )
+        with self.assertRaises(IndexError):
+            self.table.insert_row(9, (b"c", 0.0, (0, 0, 0)))
+        self.assertFalse(os.path.exists(self.table.lock_file_name()))
+
+    def test_insert_rows_in_chunks(self):
+        self.table._CHUNK_ROWS = 3
+        self._fill(10)
+        self.table.insert_rows(4, [(b"x", -1.0, (0, 0, 0)), (b"y", -2.0, (0, 0, 0))])
+        self.assertEqual(
+            self.table.read_column(2).tolist(),
+            [0, 1.5, 3, 4.5, -1, -2, 6, 7.5, 9, 10.5, 12, 13.5],
+        )
+        self.assertEqual(os.path.getsize(self.filename), 8 + 12 * 18)
+
+    def test_concurrent_insert_and_read(self):
+        # Each insert puts the next id first, so a consistent read of column
+        # 2 always counts down by one to 0
+        self.table._CHUNK_ROWS = 2
+        self.table.append_rows([(b"r", 0.0, (0, 0, 0))])
+        reader = BinaryTable(
+            Fileobj(fullpathfilename=self.filename),
+            ["char", "double", "uint16"],
+            [4, 8, 6],
+            [4, 1, 3],
+            8,
+        )
+        errors = []
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                ids = reader.read_column(2)
+                if not np.array_equal(ids, np.arange(len(ids))[::-1]):
+                    errors.append(ids)
+                    return
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        try:
+            for i in range(1, 150):
+                self.table.insert_row(0, (b"r", float(i), (0, 0, 0)))
+        finally:
+            done.set()
+            thread.join(30)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.table.get_size()[0], 150)
+
+    def test_reads_wait_for_writers(self):
+        self._fill(2)
+        result = []
+        with lock_manager.lock(self.filename):
+            thread = threading.Thread(
+                target=lambda: result.append(self.table.read_column(2))
+            )
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+        thread.join(5)
+        np.testing.assert_array_equal(result[0], [0, 1.5])
+
+    def test_delete_rows(self):
+        self._fill(6)
+        self.table.delete_rows([2, 5])
+        self.table.delete_row(1)
+        self.assertEqual(self.table.read_column(1).tolist(), [b"r2", b"r3", b"r5"])
+        self.assertFalse(os.path.exists(self.table.temp_file_name()))
+
+    def test_delete_rows_in_chunks(self):
+        self.table._CHUNK_ROWS = 4
+        self._fill(10)
+        self.table.delete_rows(range(2, 11, 2))
+        np.testing.assert_array_equal(self.table.read_column(2), [0, 3, 6, 9, 12])
+
+    def test_write_entry_find_row_and_header(self):
+        self._fill(4)
+        self.table.write_header(b"HDR")
+        self.table.write_entry(3, 2, 99.0)
+        self.table.write_entry(3, 3, [7, 8, 9])
+        self.assertEqual(self.table.read_row(3, 2), 99.0)
+        np.testing.assert_array_equal(self.table.read_row(3, 3), [7, 8, 9])
+        self.assertEqual(self.table.read_header()[:3], b"HDR")
+        self.assertEqual(self.table.find_row(2, 99.0), 3)
+        self.assertEqual(self.table.find_row(3, [7, 8, 9]), 3)
+        self.assertEqual(self.table.find_row(1, b"zz"), 0)
+
+    def test_write_table(self):
+        self._fill(4)
+        self.table.write_header(b"HDR")
+        self.table.write_table(self.table.read_rows(slice(None, None, -1))[:2])
+        self.assertEqual(self.table.read_column(1).tolist(), [b"r3", b"r2"])
+        self.assertEqual(self.table.read_header()[:3], b"HDR")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from did.implementations.binarydoc_matfid import BinaryDocMatfid, parse_precision
+
+
+class TestParsePrecision(unittest.TestCase):
+    def test_forms(self):
+        self.assertEqual(parse_precision("double"), (1, "f8", "f8"))
+        self.assertEqual(parse_precision("int16"), (1, "i2", "f8"))
+        self.assertEqual(parse_precision("*int16"), (1, "i2", "i2"))
+        self.assertEqual(parse_precision("uint8=>single"), (1, "u1", "f4"))
+        self.assertEqual(parse_precision("4*int32=>int64"), (4, "i4", "i8"))
+        self.assertEqual(parse_precision("*char"), (1, "u1", "char"))
+
+    def test_unsupported(self):
+        with self.assertRaises(ValueError):
+            parse_precision("bit4")
+
+
+class TestBinaryDocMatfid(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "data.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _open(self, permission):
+        doc = BinaryDocMatfid(fullpathfilename=self.filename, permission=permission)
+        doc.fopen()
+        self.assertIsNotNone(doc.fid)
+        return doc
+
+    def test_raw_bytes_without_precision(self):
+        doc = self._open("w")
+        self.assertEqual(doc.fwrite(b"abc"), 3)
+        doc.fclose()
+        doc = self._open("r")
+        self.assertEqual(doc.fread(), b"abc")
+        doc.fclose()
+
+    def test_round_trip_little_endian(self):
+        doc = self._open("w")
+        self.assertEqual(doc.fwrite([1, -2, 300], "int16"), 3)
+        doc.fclose()
+        with open(self.filename, "rb") as f:
+            self.assertEqual(f.read(), np.array([1, -2, 300], dtype="<i2").tobytes())
+
+        doc = self._open("r")
+        values = doc.fread(-1, "int16")
+        self.assertEqual(values.dtype, np.float64)
+        np.testing.assert_array_equal(values, [1, -2, 300])
+        doc.frewind()
+        self.assertEqual(doc.fread(2, "*int16").dtype, np.int16)
+        self.assertEqual(doc.ftell(), 4)
+        doc.fclose()
+
+    def test_conversion_and_shape(self):
+        doc = self._open("w")
+        doc.fwrite(np.arange(6), "uint8")
+        doc.fclose()
+        doc = self._open("r")
+        values = doc.fread((2, 3), "uint8=>single")
+        self.assertEqual(values.dtype, np.float32)
+        np.testing.assert_array_equal(values, [[0, 2, 4], [1, 3, 5]])
+        doc.frewind()
+        self.assertEqual(doc.fread((3, float("inf")), "*uint8").shape, (3, 2))
+        doc.fclose()
+
+    def test_skip_reads_strided(self):
+        # Records of one int32 followed by a 4-byte float that is skipped
+        data = np.zeros(5, dtype=[("a", "<i4"), ("b", "<f4")])
+        data["a"] = [10, 20, 30, 40, 50]
+        data.tofile(self.filename)
+        doc = self._open("r")
+        np.testing.assert_array_equal(doc.fread(-1, "*int32", 4), [10, 20, 30, 40, 50])
+        doc.frewind()
+        np.testing.assert_array_equal(doc.fread(2, "int32", 4), [10, 20])
+        self.assertEqual(doc.ftell(), 16)
+        doc.fclose()
+
+    def test_block_skip(self):
+        values = np.arange(12, dtype="<i2")
+        with open(self.filename, "wb") as f:
+            for block in values.reshape(-1, 3):
+                f.write(block.tobytes() + b"\xff" * 2)
+        doc = self._open("r")
+        np.testing.assert_array_equal(doc.fread(-1, "3*int16", 2), values)
+        doc.frewind()
+        np.testing.assert_array_equal(doc.fread(4, "3*int16=>int16", 2), [0, 1, 2, 3])
+        self.assertEqual(doc.ftell(), 10)
+        doc.fclose()
+
+    def test_write_with_skip_keeps_skipped_bytes(self):
+        with open(self.filename, "wb") as f:
+            f.write(b"\x01" * 12)
+        doc = self._open("r+")
+        self.assertEqual(doc.fwrite([7, 8], "uint16", 2), 2)
+        self.assertEqual(doc.ftell(), 8)
+        doc.fclose()
+        with open(self.filename, "rb") as f:
+            self.assertEqual(
+                f.read(), b"\x01\x01\x07\x00\x01\x01\x08\x00" + b"\x01" * 4
+            )
+
+    def test_big_endian_machine_format(self):
+        doc = self._open("w")
+        doc.machineformat = "b"
+        doc.fwrite([1.5, 2.5], "double")
+        doc.fclose()
+        with open(self.filename, "rb") as f:
+            self.assertEqual(f.read(), np.array([1.5, 2.5], dtype=">f8").tobytes())
+        doc = self._open("r")
+        doc.machineformat = "b"
+        np.testing.assert_array_equal(doc.fread(-1, "double"), [1.5, 2.5])
+        doc.fclose()
+
+    def test_char(self):
+        doc = self._open("w")
+        doc.fwrite("hello", "char")
+        doc.fclose()
+        doc = self._open("r")
+        self.assertEqual(doc.fread(-1, "*char"), "hello")
+        doc.fclose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import random
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestBranchStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "stats.sqlite"))
+        self.db.add_branch("a", "")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def _rebuilt(self, branch_id):
+        """Stats recomputed from scratch, to compare the catalog against."""
+        return self.db.stats(branch_id, rebuild=True)
+
+    def test_counts_and_histograms(self):
+        docs = [Document("demoA", **{"demoA.value": i % 3}) for i in range(6)]
+        docs.append(Document("demoB", **{"demoB.value": 1}))
+        self.db.add_docs(docs, "a")
+        stats = self.db.stats("a")
+        self.assertEqual(stats["doc_count"], 7)
+        self.assertEqual(stats["classes"], {"demoA": 6, "demoB": 1})
+        value = stats["fields"]["demoA.value"]
+        self.assertEqual(value["doc_count"], 6)
+        self.assertEqual(value["distinct"], 3)
+        self.assertEqual(sorted(n for _, n in value["histogram"]), [2, 2, 2])
+        self.assertEqual(stats["fields"]["base.id"]["distinct"], 7)
+
+        self.db.remove_docs([docs[0].id(), docs[6].id()], "a")
+        stats = self.db.stats("a", values=False)
+        self.assertEqual(stats["doc_count"], 5)
+        self.assertEqual(stats["classes"], {"demoA": 5})
+        self.assertNotIn("demoB.value", stats["fields"])
+        self.assertNotIn("distinct", stats["fields"]["demoA.value"])
+
+    def test_catalog_matches_rebuild(self):
+        rng = random.Random(3)
+        for copy_on_write in (False, True):
+            branches = ["a"]
+            docs = []
+            for step in range(60):
+                op = rng.random()
+                branch = rng.choice(branches)
+                if op < 0.4:
+                    cls = rng.choice(["demoA", "demoB"])
+                    doc = Document(cls, **{f"{cls}.value": rng.randint(0, 4)})
+                    docs.append(doc)
+                    self.db.add_docs([doc], branch)
+                elif op < 0.6:
+                    ids = self.db.get_doc_ids(branch)
+                    if ids:
+                        self.db.remove_docs([rng.choice(ids)], branch)
+                elif op < 0.7:
+                    name = f"{branch}_{copy_on_write}_{step}"
+                    self.db.add_branch(name, branch, copy_on_write=copy_on_write)
+                    branches.append(name)
+                elif op < 0.8 and len(branches) > 1:
+                    source = rng.choice(branches)
+                    if source != branch:
+                        self.db.merge_branch(source, branch, strategy="source")
+                elif op < 0.9:
+                    ids = set(self.db.get_doc_ids(branch))
+                    candidates = [d for d in docs if d.id() in ids]
+                    if candidates:
+                        doc = rng.choice(candidates)
+                        cls = doc.document_properties["document_class"]["class_name"]
+                        doc.document_properties[cls]["value"] = rng.randint(0, 4)
+                        self.db.update_doc(doc, branch)
+                for b in branches:
+                    self.assertEqual(
+                        self.db.stats(b)["doc_count"], len(self.db.get_doc_ids(b))
+                    )
+            for b in branches:
+                incremental = self.db.stats(b)
+                self.assertEqual(incremental, self._rebuilt(b), b)
+
+
+if __name__ == "__main__":
+    unittest.main()
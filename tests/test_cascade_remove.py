@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestCascadeRemove(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "cascade.sqlite"))
+        self.db.add_branch("a", "")
+        self.root = Document("demoA", **{"demoA.value": 0})
+        self.mid = Document("demoC", **{"demoC.value": 1})
+        self.mid.set_dependency_value("item1", self.root.id())
+        self.leaf = Document("demoC", **{"demoC.value": 2})
+        self.leaf.set_dependency_value("item1", self.mid.id())
+        self.unrelated = Document("demoA", **{"demoA.value": 3})
+        self.db.add_docs([self.root, self.mid, self.leaf, self.unrelated], "a")
+        self.closure = {self.root.id(), self.mid.id(), self.leaf.id()}
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_dry_run_leaves_branch_untouched(self):
+        generation = self.db.write_generation()
+        removed = self.db.remove_docs([self.root.id()], "a", cascade=True, dry_run=True)
+        self.assertEqual(removed[0], self.root.id())
+        self.assertEqual(set(removed), self.closure)
+        self.assertEqual(len(self.db.get_doc_ids("a")), 4)
+        self.assertEqual(self.db.write_generation(), generation)
+
+    def test_cascade_removes_closure_in_one_transaction(self):
+        generation = self.db.write_generation()
+        removed = self.db.remove_docs([self.root.id()], "a", cascade=True)
+        self.assertEqual(set(removed), self.closure)
+        self.assertEqual(self.db.get_doc_ids("a"), [self.unrelated.id()])
+        self.assertEqual(self.db.write_generation(), generation + 1)
+        self.assertEqual(self.db.stats("a", values=False)["doc_count"], 1)
+        # No other branch held them, so the documents themselves are gone
+        rows = self.db.do_run_sql_query("SELECT COUNT(*) AS n FROM docs")
+        self.assertEqual(rows[0]["n"], 1)
+
+    def test_cascade_only_within_branch(self):
+        self.db.add_branch("b", "a", copy_on_write=True)
+        removed = self.db.remove_docs([self.mid.id()], "b", cascade=True)
+        self.assertEqual(set(removed), {self.mid.id(), self.leaf.id()})
+        self.assertEqual(
+            sorted(self.db.get_doc_ids("b")),
+            sorted([self.root.id(), self.unrelated.id()]),
+        )
+        self.assertEqual(len(self.db.get_doc_ids("a")), 4)
+
+    def test_missing_seed(self):
+        with self.assertRaises(ValueError):
+            self.db.remove_docs(["nope"], "a", cascade=True)
+        removed = self.db.remove_docs(
+            ["nope", self.leaf.id()], "a", cascade=True, OnMissing="ignore"
+        )
+        self.assertEqual(removed, [self.leaf.id()])
+
+    def test_documents_written_with_raw_sql(self):
+        # As if another program wrote them: no catalog or side-table updates
+        self.db.add_branch("m", "")
+        chain = [Document("demoA", **{"demoA.value": 0})]
+        for i in range(3):
+            doc = Document("demoC", **{"demoC.value": i})
+            doc.set_dependency_value("item1", chain[-1].id())
+            chain.append(doc)
+        for doc in chain:
+            cursor = self.db.dbid.execute(
+                "INSERT INTO docs (doc_id, json_code, timestamp) VALUES (?, ?, 0)",
+                (doc.id(), self.db._matlab_json(doc.document_properties)),
+            )
+            self.db.dbid.execute(
+                "INSERT INTO branch_docs (branch_id, doc_idx, timestamp) "
+                "VALUES ('m', ?, 0)",
+                (cursor.lastrowid,),
+            )
+        self.db.dbid.commit()
+
+        ids = [doc.id() for doc in chain]
+        removed = self.db.remove_docs([ids[0]], "m", cascade=True, dry_run=True)
+        self.assertEqual(removed, ids)
+        removed = self.db.remove_docs([ids[1]], "m", cascade=True)
+        self.assertEqual(removed, ids[1:])
+        self.assertEqual(self.db.get_doc_ids("m"), ids[:1])
+
+
+if __name__ == "__main__":
+    unittest.main()
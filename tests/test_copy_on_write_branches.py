@@ -0,0 +1,125 @@
+import os
+import random
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+from did.query import Query
+
+
+class TestCopyOnWriteBranches(unittest.TestCase):
+    """Copy-on-write branches must behave exactly like copied branches."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.plain = SQLiteDB(os.path.join(self.tmp.name, "plain.sqlite"))
+        self.cow = SQLiteDB(
+            os.path.join(self.tmp.name, "cow.sqlite"), copy_on_write_branches=True
+        )
+        self.dbs = (self.plain, self.cow)
+
+    def tearDown(self):
+        for db in self.dbs:
+            db.close()
+        self.tmp.cleanup()
+
+    def _check_same(self, branches):
+        for branch in branches:
+            self.assertEqual(
+                sorted(self.plain.get_doc_ids(branch)),
+                sorted(self.cow.get_doc_ids(branch)),
+                f"membership of {branch}",
+            )
+
+    def test_branch_creation_is_overlay(self):
+        docs = [Document("demoA", **{"demoA.value": i}) for i in range(3)]
+        for db in self.dbs:
+            db.add_branch("a", "")
+            db.add_docs(docs)
+            db.add_branch("b", "a")
+        rows = self.cow.do_run_sql_query(
+            "SELECT COUNT(*) AS n FROM branch_docs WHERE branch_id = 'b'"
+        )
+        self.assertEqual(rows[0]["n"], 0)
+        self._check_same(["a", "b"])
+
+        self.cow.compact_branch("b")
+        rows = self.cow.do_run_sql_query(
+            "SELECT COUNT(*) AS n FROM branch_docs WHERE branch_id = 'b'"
+        )
+        self.assertEqual(rows[0]["n"], 3)
+        self._check_same(["a", "b"])
+
+    def test_random_operations(self):
+        rng = random.Random(1)
+        branches = ["root"]
+        parents = {"root": None}
+        docs = []
+        for db in self.dbs:
+            db.add_branch("root", "")
+
+        for step in range(300):
+            op = rng.random()
+            if op < 0.15 or len(branches) < 3:
+                parent = rng.choice(branches)
+                name = f"b{step}"
+                for db in self.dbs:
+                    db.add_branch(name, parent)
+                branches.append(name)
+                parents[name] = parent
+            elif op < 0.55:
+                branch = rng.choice(branches)
+                if docs and rng.random() < 0.3:
+                    doc = rng.choice(docs)
+                else:
+                    doc = Document("demoA", **{"demoA.value": step})
+                    docs.append(doc)
+                for db in self.dbs:
+                    db.add_docs([doc], branch)
+            elif op < 0.85:
+                branch = rng.choice(branches)
+                ids = self.plain.get_doc_ids(branch)
+                if ids:
+                    doc_id = rng.choice(ids)
+                    for db in self.dbs:
+                        db.remove_docs(doc_id, branch)
+            elif op < 0.93:
+                leaves = [b for b in branches if b not in parents.values()]
+                leaf = rng.choice(leaves)
+                if leaf != "root":
+                    for db in self.dbs:
+                        db.delete_branch(leaf)
+                    branches.remove(leaf)
+                    del parents[leaf]
+            else:
+                self.cow.compact_branch(rng.choice(branches))
+            self._check_same(branches)
+
+        q = Query("demoA.value", "lessthan", 150)
+        for branch in branches:
+            self.assertEqual(
+                sorted(self.plain.search(q, branch)),
+                sorted(self.cow.search(q, branch)),
+            )
+
+    def test_deep_chain_is_compacted(self):
+        self.cow.add_branch("b0", "")
+        self.cow.add_docs([Document("demoA")], "b0")
+        for i in range(1, 20):
+            self.cow.add_branch(f"b{i}", f"b{i - 1}")
+        cursor = self.cow.dbid.cursor()
+        self.assertLessEqual(
+            self.cow._branch_chain_depth(cursor, "b19"),
+            SQLiteDB.MAX_BRANCH_CHAIN_DEPTH,
+        )
+        self.assertEqual(len(self.cow.get_doc_ids("b19")), 1)
+
+        self.cow.compact_branches(max_depth=2)
+        for i in range(20):
+            self.assertLessEqual(self.cow._branch_chain_depth(cursor, f"b{i}"), 2)
+            self.assertEqual(len(self.cow.get_doc_ids(f"b{i}")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.fun import docs_to_graph
+from did.implementations.sqlitedb import SQLiteDB
+from did.query import Query
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "graph.sqlite"))
+        self.db.add_branch("a", "")
+        self.root = Document("demoA", **{"demoA.value": 0})
+        self.mid = Document("demoC", **{"demoC.value": 1})
+        self.mid.set_dependency_value("item1", self.root.id())
+        self.leaf = Document("demoC", **{"demoC.value": 2})
+        self.leaf.set_dependency_value("item1", self.mid.id())
+        self.leaf.set_dependency_value("item2", self.root.id())
+        self.leaf.set_dependency_value("item3", "missing_id")
+        self.docs = [self.root, self.mid, self.leaf]
+        self.db.add_docs(self.docs, "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_networkx_matches_docs_to_graph(self):
+        g = self.db.dependency_graph("a")
+        expected = docs_to_graph(self.docs)
+        self.assertEqual(set(g.nodes), set(expected.nodes))
+        self.assertEqual(set(g.edges), set(expected.edges))
+        self.assertTrue(g.has_edge(self.root.id(), self.mid.id()))
+
+    def test_csr(self):
+        indptr, indices, ids = self.db.dependency_graph("a", format="csr")
+        self.assertEqual(ids, [d.id() for d in self.docs])
+        self.assertEqual(indptr.tolist(), [0, 2, 3, 3])
+        self.assertEqual(indices.tolist(), [1, 2, 2])
+
+    def test_query_restricts_nodes(self):
+        g = self.db.dependency_graph("a", query=Query("", "isa", "demoC"))
+        self.assertEqual(set(g.nodes), {self.mid.id(), self.leaf.id()})
+        self.assertEqual(list(g.edges), [(self.mid.id(), self.leaf.id())])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.db.dependency_graph("a", format="dense")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import os
+import random
+import tempfile
+import unittest
+
+from did.dependency_index import DependencyIndex
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestDependencyIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "index.sqlite"))
+        self.db.add_branch("a", "")
+        self.root = Document("demoA", **{"demoA.value": 0})
+        self.child = Document("demoC", **{"demoC.value": 1})
+        self.child.set_dependency_value("item1", self.root.id())
+        self.db.add_docs([self.root, self.child], "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def _fresh(self, branch_id):
+        return DependencyIndex(branch_id, self.db._declared_dependencies)
+
+    def _assert_matches_fresh(self, index):
+        fresh = self._fresh(index.branch_id)
+        self.assertEqual(len(index), len(fresh))
+        for doc_id in self.db.get_doc_ids(index.branch_id):
+            self.assertEqual(index.parents(doc_id), fresh.parents(doc_id))
+            self.assertEqual(index.children(doc_id), fresh.children(doc_id))
+        self.assertEqual(index.missing(), fresh.missing())
+
+    def test_lookups(self):
+        index = self.db.dependency_index("a")
+        self.assertEqual(index.children(self.root.id()), {self.child.id()})
+        self.assertEqual(index.parents(self.child.id()), {self.root.id()})
+        self.assertEqual(index.topological_order(), [self.root.id(), self.child.id()])
+        self.assertEqual(
+            index.connected_components(), [{self.root.id(), self.child.id()}]
+        )
+        self.assertIs(self.db.dependency_index("a"), index)
+
+    def test_updated_in_place(self):
+        index = self.db.dependency_index("a")
+        version = index.version
+        late = Document("demoC", **{"demoC.value": 2})
+        target = Document("demoA", **{"demoA.value": 3})
+        late.set_dependency_value("item1", target.id())
+        self.db.add_docs([late], "a")
+        self.assertGreater(index.version, version)
+        self.assertEqual(index.missing(), {target.id(): {late.id()}})
+
+        # The reference resolves once its target arrives
+        self.db.add_docs([target], "a")
+        self.assertEqual(index.parents(late.id()), {target.id()})
+        self.assertEqual(index.missing(), {})
+
+        self.db.remove_docs([self.root.id()], "a")
+        self.assertEqual(index.parents(self.child.id()), set())
+        self.assertIn(self.root.id(), index.missing())
+
+        late.set_dependency_value("item2", self.child.id(), False)
+        self.db.update_doc(late, "a")
+        self.assertEqual(index.children(self.child.id()), {late.id()})
+        self._assert_matches_fresh(index)
+
+    def test_merge_invalidates(self):
+        self.db.add_branch("b", "a")
+        index = self.db.dependency_index("a")
+        extra = Document("demoC", **{"demoC.value": 5})
+        extra.set_dependency_value("item1", self.child.id())
+        self.db.add_docs([extra], "b")
+        version = index.version
+        self.db.merge_branch("b", "a")
+        self.assertGreater(index.version, version)
+        self.assertEqual(index.children(self.child.id()), {extra.id()})
+
+    def test_derived_results_are_cached_together(self):
+        index = self.db.dependency_index("a")
+        order = index.topological_order()
+        components = index.connected_components()
+        self.assertEqual(
+            set(index._cache), {"topological_order", "connected_components"}
+        )
+        self.assertEqual(index.topological_order(), order)
+        self.assertEqual(index.connected_components(), components)
+
+        self.db.add_docs([Document("demoA", **{"demoA.value": 2})], "a")
+        self.assertEqual(len(index.topological_order()), 3)
+        self.assertEqual(set(index._cache), {"topological_order"})
+
+    def test_random_operations(self):
+        rng = random.Random(7)
+        index = self.db.dependency_index("a")
+        docs = [self.root, self.child]
+        for _ in range(80):
+            ids = self.db.get_doc_ids("a")
+            if rng.random() < 0.6 or not ids:
+                doc = Document("demoC", **{"demoC.value": rng.randint(0, 9)})
+                for name in ("item1", "item2"):
+                    if docs and rng.random() < 0.7:
+                        doc.set_dependency_value(name, rng.choice(docs).id())
+                docs.append(doc)
+                self.db.add_docs([doc], "a")
+            else:
+                self.db.remove_docs([rng.choice(ids)], "a")
+        self._assert_matches_fresh(index)
+        order = index.topological_order()
+        position = {doc_id: i for i, doc_id in enumerate(order)}
+        for doc_id in order:
+            for parent in index.parents(doc_id):
+                self.assertLess(position[parent], position[doc_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestDiffBranches(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _run(self, copy_on_write):
+        db = SQLiteDB(
+            os.path.join(self.tmp.name, f"diff_{copy_on_write}.sqlite"),
+            copy_on_write_branches=copy_on_write,
+        )
+        db.add_branch("a", "")
+        docs = [Document("demoA", **{"demoA.value": i}) for i in range(6)]
+        db.add_docs(docs, "a")
+        db.add_branch("b", "a")
+        db.remove_docs([docs[0].id(), docs[1].id()], "b")
+        new_doc = Document("demoA", **{"demoA.value": 100})
+        db.add_docs([new_doc], "b")
+
+        diff = db.diff_branches("a", "b")
+        self.assertEqual(diff["added"], [new_doc.id()])
+        self.assertEqual(sorted(diff["removed"]), sorted([docs[0].id(), docs[1].id()]))
+
+        streamed = sorted(db.diff_branches("a", "b", stream=True))
+        expected = sorted(
+            [("added", new_doc.id())]
+            + [("removed", docs[0].id()), ("removed", docs[1].id())]
+        )
+        self.assertEqual(streamed, expected)
+        self.assertEqual(db.diff_branches("a", "a"), {"added": [], "removed": []})
+        db.close()
+
+    def test_diff(self):
+        self._run(False)
+
+    def test_diff_copy_on_write(self):
+        self._run(True)
+
+    def test_diff_by_content(self):
+        db = SQLiteDB(os.path.join(self.tmp.name, "content.sqlite"))
+        db.add_branch("a", "")
+        original = Document("demoA", **{"demoA.value": 5})
+        db.add_docs([original], "a")
+        db.add_branch("b", "a")
+
+        # Re-create the same content under a new id on branch b
+        db.remove_docs(original.id(), "b")
+        recreated = Document("demoA", **{"demoA.value": 5})
+        changed = Document("demoA", **{"demoA.value": 6})
+        db.add_docs([recreated, changed], "b")
+
+        by_id = db.diff_branches("a", "b")
+        self.assertEqual(sorted(by_id["added"]), sorted([recreated.id(), changed.id()]))
+        self.assertEqual(by_id["removed"], [original.id()])
+
+        by_content = db.diff_branches("a", "b", by_content=True)
+        self.assertEqual(by_content, {"added": [changed.id()], "removed": []})
+
+        # Hashes are backfilled for documents that lack one
+        db.do_run_sql_query("DELETE FROM doc_hashes")
+        self.assertEqual(db.diff_branches("a", "b", by_content=True), by_content)
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Tests that the streaming flattener emits the same doc_data rows as doc_to_sql."""
+
+import copy
+import os
+
+import pytest
+
+from did.document import Document
+from did.implementations.doc2sql import (
+    FlatteningPlan,
+    doc_to_sql,
+    flattening_plan,
+    iter_doc_fields,
+)
+from did.implementations.sqlitedb import SQLiteDB
+from tests.helpers import make_doc_tree
+
+
+def _legacy_rows(document_obj):
+    """(field_name, value) rows as produced by the original doc_to_sql path."""
+    rows = []
+    for table in doc_to_sql(document_obj):
+        for col in table["columns"]:
+            if col["name"] == "doc_id":
+                continue
+            name = f"{table['name']}.{col['name']}".replace("___", ".")
+            value = "" if col["value"] is None else col["value"]
+            rows.append((name, str(value)))
+    return rows
+
+
+NDI_STYLE_DOCS = [
+    {
+        "document_class": {
+            "class_name": "ndi_document_element",
+            "superclasses": {"definition": "$NDIDOCUMENTPATH/base.json"},
+        },
+        "base": {"id": "abc", "datestamp": "2020", "name": "x"},
+        "depends_on": {"name": "subject_id", "value": "def"},
+        "element": {"name": "e", "ref": 1, "nested": {"a": [1, 2], "b": None}},
+    },
+    {
+        "document_class": {
+            "class_name": "ndi_document_element",
+            "superclasses": [
+                {"definition": "$NDIDOCUMENTPATH/base.json"},
+                {"definition": "$NDIDOCUMENTPATH/demoA.json"},
+            ],
+        },
+        "base": {"id": "ghi", "datestamp": "2021", "doc_id": "skip"},
+        "depends_on": [],
+        "files": {"file_info": []},
+        "element": {"flag": True, "value": 2.5},
+    },
+]
+
+
+class TestIterDocFields:
+    @pytest.fixture(autouse=True)
+    def schema_path(self):
+        Document.set_schema_path(
+            os.path.join(
+                os.path.dirname(__file__),
+                "..",
+                "src",
+                "did",
+                "example_schema",
+                "demo_schema1",
+            )
+        )
+
+    def _docs(self):
+        _, _, docs = make_doc_tree([5, 5, 5])
+        return docs + [Document(copy.deepcopy(p)) for p in NDI_STYLE_DOCS]
+
+    def test_same_rows_as_doc_to_sql(self):
+        plans = {}
+        for doc in self._docs():
+            props = doc.document_properties
+            plan = flattening_plan(props, plans)
+            streamed = [
+                (name, str("" if value is None else value))
+                for name, value, _ in iter_doc_fields(props, plan)
+            ]
+            assert streamed == _legacy_rows(Document(copy.deepcopy(props)))
+
+    def test_numeric_values(self):
+        props = copy.deepcopy(NDI_STYLE_DOCS[1])
+        fields = {name: num for name, _, num in iter_doc_fields(props)}
+        assert fields["element.value"] == 2.5
+        assert fields["element.flag"] is None
+        assert fields["meta.class"] is None
+
+    def test_plan_caches_per_class(self):
+        plan = FlatteningPlan("ndi_document_element")
+        for props in NDI_STYLE_DOCS:
+            list(iter_doc_fields(props, plan))
+        assert len(plan.superclass) == 2
+        assert plan.groups["element.nested.a"] == "element"
+
+    def test_database_doc_data_rows(self, tmp_path):
+        db = SQLiteDB(str(tmp_path / "flatten.sqlite"))
+        db.add_branch("a")
+        docs = self._docs()
+        expected = {}
+        for doc in docs:
+            expected[doc.id()] = sorted(
+                _legacy_rows(Document(copy.deepcopy(doc.document_properties)))
+            )
+            db.add_docs([doc], "a")
+
+        rows = db.do_run_sql_query(
+            "SELECT docs.doc_id, fields.field_name, doc_data.value FROM doc_data "
+            "JOIN docs ON docs.doc_idx = doc_data.doc_idx "
+            "JOIN fields ON fields.field_idx = doc_data.field_idx"
+        )
+        actual = {}
+        for row in rows:
+            actual.setdefault(row["doc_id"], []).append(
+                (row["field_name"], row["value"])
+            )
+        assert {k: sorted(v) for k, v in actual.items()} == expected
+        db.close()
@@ -1,6 +1,9 @@
 import unittest
 import os
+import json
+import tempfile
 from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
 
 
 class TestDocument(unittest.TestCase):
@@ -77,6 +80,99 @@ class TestDocument(unittest.TestCase):
             fI_index_after_removal, "File info should be empty after removing the file."
         )
 
+    def test_create_many(self):
+        import numpy as np
+
+        values = np.arange(5)
+        names = [f"doc{i}" for i in range(5)]
+        docs = Document.create_many(
+            "demoA", 5, **{"demoA.value": values, "base.name": names}
+        )
+        self.assertEqual(len(docs), 5)
+        self.assertEqual(len({doc.id() for doc in docs}), 5)
+
+        for i, doc in enumerate(docs):
+            single = Document("demoA", **{"demoA.value": i, "base.name": names[i]})
+            props = doc.document_properties
+            expected = single.document_properties
+            self.assertEqual(props["demoA"], expected["demoA"])
+            self.assertIsInstance(props["demoA"]["value"], int)
+            self.assertEqual(props["base"]["name"], names[i])
+            self.assertEqual(props.keys(), expected.keys())
+
+        # Documents must not share nested state
+        docs[0].document_properties["demoA"]["value"] = -1
+        self.assertEqual(docs[1].document_properties["demoA"]["value"], 1)
+
+    def test_create_many_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            Document.create_many("demoA", 3, **{"demoA.value": [1, 2]})
+
+    def test_compact_and_frozen(self):
+        doc = Document("demoA", **{"demoA.value": 3})
+        self.assertFalse(hasattr(doc, "__dict__"))
+        expected = json.loads(json.dumps(doc.document_properties))
+
+        other = Document("demoA", **{"demoA.value": 4}).compact()
+        doc.compact()
+        self.assertEqual(doc.document_properties, expected)
+        key = next(k for k in doc.document_properties if k == "demoA")
+        other_key = next(k for k in other.document_properties if k == "demoA")
+        self.assertIs(key, other_key)
+
+        doc.compact(frozen=True)
+        self.assertTrue(doc.is_frozen())
+        self.assertEqual(doc.id(), expected["base"]["id"])
+        with self.assertRaises(TypeError):
+            doc.document_properties["demoA"]["value"] = 5
+
+        doc.thaw()
+        self.assertFalse(doc.is_frozen())
+        self.assertEqual(doc.document_properties, expected)
+
+    def test_frozen_document_keeps_its_files(self):
+        doc = Document("demoFile")
+        doc.add_file("a.bin", "/path/to/a.bin")
+        doc.add_file("b.bin", "/path/to/b.bin")
+        doc.compact(frozen=True)
+        is_in, info, index = doc.is_in_file_list("b.bin")
+        self.assertTrue(is_in)
+        self.assertEqual(info["locations"]["location"], "/path/to/b.bin")
+        self.assertEqual(index, 1)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.bin")
+            with open(path, "wb") as f:
+                f.write(b"abc")
+            db = SQLiteDB(os.path.join(tmp, "frozen_files.sqlite"))
+            db.add_branch("a")
+            doc = Document("demoFile")
+            doc.add_file("a.bin", path)
+            db.add_docs([doc], "a")
+            frozen = db.get_docs([doc.id()], frozen=True)[0]
+            self.assertTrue(frozen.is_in_file_list("a.bin")[0])
+            fileobj = db.open_doc(doc.id(), "a.bin")
+            self.assertEqual(fileobj.fullpathfilename, path)
+            db.close()
+
+    def test_get_docs_frozen(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = SQLiteDB(os.path.join(tmp, "frozen.sqlite"))
+            db.add_branch("a")
+            doc = Document("demoC", **{"demoC.value": 7})
+            doc.set_dependency_value("item1", "abc")
+            db.add_docs([doc], "a")
+
+            plain = db.get_docs(doc.id())
+            compact = db.get_docs([doc.id()], compact=True)[0]
+            frozen = db.get_docs([doc.id()], frozen=True)[0]
+            self.assertEqual(compact.document_properties, plain.document_properties)
+            self.assertTrue(frozen.is_frozen())
+            self.assertEqual(
+                frozen.thaw().document_properties, plain.document_properties
+            )
+            db.close()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import time
+import unittest
+
+from did.file import FileCache
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        os.mkdir(self.cache_dir)
+        self.cache = FileCache(self.cache_dir, max_size=300, reduce_size=200)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _make(self, name, size):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_add_and_get(self):
+        source = self._make("a.bin", 10)
+        self.cache.add_file(source, copy=True)
+        self.assertTrue(os.path.exists(source))
+        path = self.cache.get_file("a.bin")
+        self.assertEqual(path, os.path.join(self.cache_dir, "a.bin"))
+        self.assertIsNone(self.cache.get_file("b.bin"))
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual(stats["current_size"], 10)
+
+        self.cache.add_file(self._make("b.bin", 20), key="renamed")
+        self.assertIn("renamed", self.cache)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "b.bin")))
+        self.assertTrue(self.cache.remove_file("renamed"))
+        self.assertEqual(self.cache.stats()["current_size"], 10)
+        with self.assertRaises(ValueError):
+            self.cache.add_file(source, key="../escape")
+
+    def test_least_recently_used_are_evicted(self):
+        for name in ("a", "b", "c"):
+            self.cache.add_file(self._make(name, 100), key=name)
+            time.sleep(0.01)
+        self.cache.get_file("a")  # b is now the oldest
+        evicted = self.cache.add_file(self._make("d", 100), key="d")
+        self.assertEqual(evicted, ["b", "c"])
+        self.assertEqual(sorted(self.cache.keys()), ["a", "d"])
+        self.assertEqual(self.cache.stats()["current_size"], 200)
+        self.assertFalse(os.path.exists(os.path.join(self.cache_dir, "b")))
+
+    def test_index_is_shared(self):
+        other = FileCache(self.cache_dir)
+        self.assertEqual(other.max_size, 300)
+        self.cache.add_file(self._make("a", 50), key="a")
+        self.assertIsNotNone(other.get_file("a"))
+        other.add_file(self._make("b", 50), key="b")
+        self.assertEqual(sorted(self.cache.keys()), ["a", "b"])
+        self.assertEqual(self.cache.stats()["current_size"], 100)
+
+        # Access times recorded by one object reach the other on flush
+        time.sleep(0.01)
+        other.get_file("a")
+        other.flush()
+        self.cache.set_properties(300, 260)
+        self.assertEqual(self.cache.add_file(self._make("c", 210), key="c"), ["b"])
+        self.assertEqual(sorted(self.cache.keys()), ["a", "c"])
+
+    def test_set_properties_keeps_index(self):
+        self.cache.add_file(self._make("a", 50), key="a")
+        self.cache.set_properties(1000, 500, 0)
+        reopened = FileCache(self.cache_dir)
+        self.assertEqual(reopened.keys(), ["a"])
+        self.assertEqual(reopened.max_size, 1000)
+        self.assertEqual(reopened.stats()["current_size"], 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+SCHEMA_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "src", "did", "example_schema", "demo_schema1"
+)
+
+
+class TestFileStore(unittest.TestCase):
+    def setUp(self):
+        Document.set_schema_path(SCHEMA_PATH)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "store.sqlite")
+        self.db = SQLiteDB(self.db_path, ingest_files=True)
+        self.db.add_branch("a")
+        self.content = b"calibration " * 1000
+        self.uid = hashlib.sha256(self.content).hexdigest()
+
+    def tearDown(self):
+        self.db._close_db()
+        self.tmp.cleanup()
+
+    def _write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def _doc_with_file(self, location, name="calibration.bin"):
+        doc = Document("demoFile")
+        doc.add_file(name, location)
+        return doc
+
+    def _blob(self, uid):
+        return os.path.join(self.db_path + ".files", uid[:2], uid)
+
+    def _files_rows(self):
+        return self.db.do_run_sql_query(
+            "SELECT filename, uid, orig_location FROM doc_files ORDER BY doc_idx"
+        )
+
+    def test_identical_files_are_stored_once(self):
+        first = self._doc_with_file(self._write("one.bin", self.content))
+        second = self._doc_with_file(self._write("two.bin", self.content))
+        other = self._doc_with_file(self._write("other.bin", b"other"))
+        self.db.add_docs([first, second, other], "a")
+
+        self.assertEqual(
+            [r["uid"] for r in self._files_rows()][:2], [self.uid, self.uid]
+        )
+        self.assertTrue(os.path.exists(self._blob(self.uid)))
+        stats = self.db.file_store_stats()
+        self.assertEqual(stats["files"], 2)
+        self.assertEqual(stats["references"], 3)
+        self.assertEqual(stats["stored_bytes"], len(self.content) + 5)
+        self.assertEqual(stats["referenced_bytes"], 2 * len(self.content) + 5)
+
+    def test_open_doc_reads_from_store(self):
+        path = self._write("one.bin", self.content)
+        doc = self._doc_with_file(path)
+        self.db.add_docs([doc], "a")
+        os.remove(path)
+
+        fileobj = self.db.open_doc(doc.id(), "calibration.bin")
+        self.assertEqual(fileobj.fullpathfilename, self._blob(self.uid))
+        fileobj.fopen()
+        self.assertEqual(fileobj.fread(), self.content)
+        fileobj.fclose()
+
+    def test_gc_deletes_unreferenced_files(self):
+        first = self._doc_with_file(self._write("one.bin", self.content))
+        second = self._doc_with_file(self._write("two.bin", self.content))
+        self.db.add_docs([first, second], "a")
+
+        self.db.remove_docs([first.id()], "a")
+        self.assertNotIn("files_deleted", self.db.gc())
+        self.assertTrue(os.path.exists(self._blob(self.uid)))
+
+        self.db.remove_docs([second.id()], "a")
+        self.assertEqual(self.db.gc()["files_deleted"], 1)
+        self.assertFalse(os.path.exists(self._blob(self.uid)))
+        self.assertEqual(self.db.file_store_stats()["files"], 0)
+
+    def test_update_doc_syncs_files(self):
+        doc = self._doc_with_file(self._write("one.bin", self.content))
+        self.db.add_docs([doc], "a")
+        doc.remove_file("calibration.bin")
+        doc.add_file("calibration.bin", self._write("new.bin", b"new content"))
+        self.db.update_doc(doc, "a")
+
+        rows = self._files_rows()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["uid"], hashlib.sha256(b"new content").hexdigest())
+        self.assertEqual(self.db.gc()["files_deleted"], 1)
+        self.assertFalse(os.path.exists(self._blob(self.uid)))
+
+    def test_non_local_locations_are_not_ingested(self):
+        doc = self._doc_with_file("https://example.org/calibration.bin")
+        self.db.add_docs([doc], "a")
+        self.assertEqual(self._files_rows(), [])
+
+    def test_ingest_is_opt_in(self):
+        self.db._close_db()
+        self.db = SQLiteDB(self.db_path)
+        path = self._write("one.bin", self.content)
+        doc = self._doc_with_file(path)
+        self.db.add_docs([doc], "a")
+        self.assertEqual(self._files_rows(), [])
+        self.assertEqual(
+            self.db.open_doc(doc.id(), "calibration.bin").fullpathfilename, path
+        )
+
+    def test_gc_sweeps_blobs_of_rolled_back_ingests(self):
+        store_file = self.db._store_file
+        calls = []
+
+        def failing_store_file(path):
+            calls.append(path)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            return store_file(path)
+
+        doc = Document("demoFile")
+        doc.add_file("first.bin", self._write("one.bin", self.content))
+        doc.add_file("second.bin", self._write("two.bin", b"second"))
+        self.db._store_file = failing_store_file
+        with self.assertRaises(OSError):
+            self.db.add_docs([doc], "a")
+        self.db._store_file = store_file
+        self.assertEqual(self._files_rows(), [])
+        self.assertTrue(os.path.exists(self._blob(self.uid)))
+
+        # Young files may belong to an ingest that has not committed yet
+        self.assertNotIn("files_deleted", self.db.gc())
+        self.db.FILE_STORE_GRACE_PERIOD = 0
+        self.assertEqual(self.db.gc()["files_deleted"], 1)
+        self.assertFalse(os.path.exists(self._blob(self.uid)))
+
+    def test_matlab_files_table_is_untouched(self):
+        first = self._doc_with_file(self._write("one.bin", self.content))
+        second = self._doc_with_file(self._write("two.bin", self.content))
+        self.db.add_docs([first, second], "a")
+        self.assertEqual(len(self._files_rows()), 2)
+        self.assertEqual(self.db.do_run_sql_query("SELECT * FROM files"), [])
+        sql = self.db.do_run_sql_query(
+            "SELECT sql FROM sqlite_master WHERE name = 'files'"
+        )[0]["sql"]
+        self.assertIn("uid TEXT NOT NULL UNIQUE", sql)
+
+
+if __name__ == "__main__":
+    unittest.main()
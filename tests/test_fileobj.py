@@ -1,5 +1,10 @@
+import os
+import tempfile
 import unittest
-from did.file import Fileobj
+
+import numpy as np
+
+from did.file import Fileobj, ReadOnlyFileobj
 
 
 class TestFileobj(unittest.TestCase):
@@ -20,5 +25,51 @@ class TestFileobj(unittest.TestCase):
             Fileobj(customFileHandler=my_handler)
 
 
+class TestReadOnlyFileobjMmap(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "data.bin")
+        self.values = np.arange(100, dtype="<f8")
+        with open(self.filename, "wb") as f:
+            f.write(b"header\nline two\n")
+            f.write(self.values.tobytes())
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fread_returns_views(self):
+        fobj = ReadOnlyFileobj(self.filename, mmap=True).fopen()
+        self.assertEqual(fobj.fgetl(), b"header")
+        self.assertEqual(fobj.fgets(), b"line two\n")
+        chunk = fobj.fread(8)
+        self.assertIsInstance(chunk, memoryview)
+        self.assertEqual(np.frombuffer(chunk, "<f8")[0], 0.0)
+        self.assertEqual(fobj.ftell(), 24)
+        fobj.fseek(-8, 2)
+        self.assertEqual(np.frombuffer(fobj.fread(), "<f8")[0], 99.0)
+        self.assertTrue(fobj.feof())
+        fobj.fclose()
+
+    def test_read_array_matches_copying_mode(self):
+        mapped = ReadOnlyFileobj(self.filename, mmap=True).fopen()
+        plain = ReadOnlyFileobj(self.filename).fopen()
+        view = mapped.read_array(16 + 80, 10, "float64")
+        self.assertFalse(view.flags.owndata)
+        np.testing.assert_array_equal(view, self.values[10:20])
+        np.testing.assert_array_equal(view, plain.read_array(16 + 80, 10, "float64"))
+        self.assertEqual(plain.ftell(), 0)
+        # Closing while a view is alive keeps the view usable
+        mapped.fclose()
+        self.assertEqual(view[0], 10.0)
+        plain.fclose()
+
+    def test_big_endian(self):
+        with open(self.filename, "wb") as f:
+            f.write(np.arange(4, dtype=">i4").tobytes())
+        fobj = ReadOnlyFileobj(self.filename, machineformat="b", mmap=True).fopen()
+        self.assertEqual(fobj.read_array(0, -1, "int32").tolist(), [0, 1, 2, 3])
+        fobj.fclose()
+
+
 if __name__ == "__main__":
     unittest.main()
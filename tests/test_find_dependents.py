@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.fun import docs_to_graph, find_all_dependencies
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestFindDependents(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "deps.sqlite"))
+        self.db.add_branch("a", "")
+        # root <- c1 <- c2 <- c3, and root <- c3 directly
+        self.root = Document("demoA", **{"demoA.value": 0})
+        self.chain = []
+        previous = self.root
+        for i in range(3):
+            doc = Document("demoC", **{"demoC.value": i})
+            doc.set_dependency_value("item1", previous.id())
+            self.chain.append(doc)
+            previous = doc
+        self.chain[2].set_dependency_value("item2", self.root.id())
+        self.other = Document("demoB", **{"demoB.value": 5})
+        self.other.set_dependency_value("item1", self.chain[0].id(), False)
+        self.docs = [self.root] + self.chain + [self.other]
+        self.db.add_docs(self.docs, "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_down_with_depths(self):
+        c1, c2, c3 = (d.id() for d in self.chain)
+        result = self.db.find_dependents([self.root.id()], branch_id="a")
+        self.assertEqual(
+            sorted(result, key=lambda r: (r[1], r[0])),
+            sorted(
+                [(c1, 1), (c3, 1), (c2, 2), (self.other.id(), 2)],
+                key=lambda r: (r[1], r[0]),
+            ),
+        )
+        graph = docs_to_graph(self.docs)
+        self.assertEqual(
+            {doc_id for doc_id, _ in result},
+            set(find_all_dependencies(graph, [self.root.id()])),
+        )
+
+    def test_depth_cap_and_class_filter(self):
+        result = self.db.find_dependents(self.root.id(), depth=1, branch_id="a")
+        self.assertEqual(
+            {doc_id for doc_id, _ in result}, {self.chain[0].id(), self.chain[2].id()}
+        )
+        result = self.db.find_dependents(
+            self.root.id(), branch_id="a", class_name="demoB"
+        )
+        self.assertEqual(result, [(self.other.id(), 2)])
+
+    def test_stale_catalog(self):
+        c1, c2, c3 = (d.id() for d in self.chain)
+        other = self.other.id()
+        self.db.dbid.execute("UPDATE branch_stats SET doc_count = 1")
+        self.db.dbid.commit()
+        found = self.db.find_dependents(self.root.id(), branch_id="a")
+        self.assertEqual(dict(found), {c1: 1, c2: 2, c3: 1, other: 2})
+        found = self.db.find_dependents(c3, direction="up", branch_id="a")
+        self.assertEqual(dict(found), {c2: 1, c1: 2, self.root.id(): 1})
+
+    def test_up(self):
+        result = self.db.find_dependents(
+            self.chain[2].id(), direction="up", branch_id="a"
+        )
+        self.assertEqual(
+            dict(result),
+            {self.chain[1].id(): 1, self.root.id(): 1, self.chain[0].id(): 2},
+        )
+
+    def test_stays_in_branch(self):
+        self.db.add_branch("b", "a")
+        self.db.remove_docs([self.chain[0].id()], "b")
+        result = self.db.find_dependents(self.root.id(), branch_id="b")
+        # Without chain[0], chain[1] no longer reaches the root
+        self.assertEqual(result, [(self.chain[2].id(), 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+from did.query import Query
+
+
+class TestFreezeBranch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "frozen.sqlite")
+        self.db = SQLiteDB(self.filename)
+        self.db.add_branch("a", "")
+        self.docs = [Document("demoA", **{"demoA.value": i}) for i in range(10)]
+        self.db.add_docs(self.docs, "a")
+        self.db.add_branch("b", "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_frozen_branch_rejects_writes(self):
+        self.db.freeze_branch("a")
+        self.assertIn("a", self.db.frozen_branch_ids)
+        extra = Document("demoA", **{"demoA.value": 99})
+        with self.assertRaises(ValueError):
+            self.db.add_docs([extra], "a")
+        with self.assertRaises(ValueError):
+            self.db.remove_docs([self.docs[0].id()], "a")
+        with self.assertRaises(ValueError):
+            self.db.delete_branch("a")
+        # Documents shared with the frozen branch cannot be edited in place
+        self.docs[0].document_properties["demoA"]["value"] = 100
+        with self.assertRaises(ValueError):
+            self.db.update_doc(self.docs[0], "b")
+        # Other branches stay writable
+        self.db.add_docs([extra], "b")
+        self.assertEqual(len(self.db.get_doc_ids("b")), 11)
+
+    def test_reads_and_search_use_snapshot(self):
+        self.db.freeze_branch("a")
+        self.assertEqual(
+            sorted(self.db.get_doc_ids("a")), sorted(d.id() for d in self.docs)
+        )
+        q = Query("demoA.value", "greaterthan", 6)
+        expected = sorted(d.id() for d in self.docs[7:])
+        self.assertEqual(sorted(self.db.search(q, "a")), expected)
+        self.assertEqual(sorted(self.db.search(q, "a")), expected)
+        docs = self.db.get_docs([self.docs[3].id()], branch_id="a")
+        self.assertEqual(docs[0].document_properties["demoA"]["value"], 3)
+
+    def test_freeze_persists_and_unfreeze(self):
+        self.db.freeze_branch("a")
+        self.db.close()
+        self.db = SQLiteDB(self.filename)
+        self.assertEqual(self.db.frozen_branch_ids, ["a"])
+        self.assertEqual(
+            len(self.db.search(Query("demoA.value", "exact_number", 4), "a")), 1
+        )
+        self.db.unfreeze_branch("a")
+        self.assertEqual(self.db.frozen_branch_ids, [])
+        self.db.remove_docs([self.docs[0].id()], "a")
+        self.assertEqual(len(self.db.get_doc_ids("a")), 9)
+        self.assertFalse(os.listdir(self.filename + ".frozen"))
+
+
+if __name__ == "__main__":
+    unittest.main()
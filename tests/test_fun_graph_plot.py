@@ -0,0 +1,61 @@
+import random
+import unittest
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import networkx as nx
+
+from did import fun
+from did.document import Document
+
+
+class TestGraphPlotHelpers(unittest.TestCase):
+    def test_layout_is_cached_by_contents(self):
+        g = nx.path_graph(5, create_using=nx.DiGraph)
+        pos = fun.graph_layout(g)
+        self.assertIs(fun.graph_layout(nx.DiGraph(g)), pos)
+        g.add_edge(4, 0)
+        self.assertIsNot(fun.graph_layout(g), pos)
+
+    def test_locator_matches_linear_scan(self):
+        rng = random.Random(0)
+        pos = {i: (rng.uniform(-1, 1), rng.uniform(-1, 1)) for i in range(500)}
+        locator = fun.NodeLocator(pos)
+        for i in range(300):
+            span = 1.5 if i < 200 else 50.0
+            x, y = rng.uniform(-span, span), rng.uniform(-span, span)
+            expected = min(
+                pos, key=lambda n: (pos[n][0] - x) ** 2 + (pos[n][1] - y) ** 2
+            )
+            self.assertEqual(locator.nearest(x, y), expected)
+        self.assertIsNone(fun.NodeLocator({}).nearest(0, 0))
+
+    def test_cluster_by_class(self):
+        a = Document("demoA", **{"demoA.value": 0})
+        c = Document("demoC", **{"demoC.value": 1})
+        c.set_dependency_value("item1", a.id())
+        g = fun.docs_to_graph([a, c])
+        pos = {a.id(): (0.0, 0.0), c.id(): (1.0, 1.0)}
+        cluster_pos, sizes, edges = fun.cluster_by_class(g, pos, {a.id(): a, c.id(): c})
+        self.assertEqual(sizes, {"demoA": 1, "demoC": 1})
+        self.assertEqual(cluster_pos["demoC"], (1.0, 1.0))
+        self.assertEqual(edges, {("demoA", "demoC"): 1})
+
+    def test_plot_with_level_of_detail(self):
+        docs = [Document("demoA", **{"demoA.value": i}) for i in range(30)]
+        g = fun.docs_to_graph(docs)
+        fun.plot_interactive_doc_graph(docs, g, max_nodes=10)
+        ax = plt.gcf().axes[0]
+        # Zooming onto a single node switches to individual nodes
+        x, y = fun.graph_layout(g)[docs[0].id()]
+        ax.set_xlim(x - 1e-6, x + 1e-6)
+        ax.set_ylim(y - 1e-6, y + 1e-6)
+        self.assertEqual(len(ax.collections[0].get_offsets()), 1)
+        plt.close("all")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestGarbageCollection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "gc.sqlite")
+        self.db = SQLiteDB(self.filename)
+        self.db.add_branch("a", "")
+        self.kept = Document("demoA", **{"demoA.value": 0})
+        self.db.add_docs([self.kept], "a")
+        self.db.add_branch("b", "a")
+        self.orphans = [Document("demoA", **{"demoA.value": i}) for i in range(25)]
+        self.db.add_docs(self.orphans, "b")
+        self.db.do_run_sql_query(
+            "INSERT INTO files (doc_idx, filename, uid, orig_location, type) "
+            "SELECT doc_idx, 'f.bin', doc_id, '/tmp/f.bin', 'file' FROM docs"
+        )
+        self.db.dbid.commit()
+        self.db.delete_branch("b")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def _count(self, table):
+        return self.db.do_run_sql_query(f"SELECT COUNT(*) AS n FROM {table}")[0]["n"]
+
+    def test_gc_deletes_orphans(self):
+        self.assertEqual(self._count("docs"), 26)
+        result = self.db.gc(batch_size=10)
+        self.assertEqual(result, {"deleted": 25, "complete": True})
+        self.assertEqual(self._count("docs"), 1)
+        self.assertEqual(self._count("files"), 1)
+        self.assertEqual(self.db.get_doc_ids("a"), [self.kept.id()])
+        rows = self.db.do_run_sql_query(
+            "SELECT COUNT(DISTINCT doc_idx) AS n FROM doc_data"
+        )
+        self.assertEqual(rows[0]["n"], 1)
+
+    def test_gc_stop_and_resume(self):
+        calls = []
+
+        def progress(deleted, total):
+            calls.append((deleted, total))
+            return False
+
+        result = self.db.gc(batch_size=10, progress=progress, vacuum=None)
+        self.assertEqual(result, {"deleted": 10, "complete": False})
+        self.assertEqual(calls, [(10, 25)])
+
+        result = self.db.gc(batch_size=10)
+        self.assertEqual(result["deleted"], 15)
+        self.assertTrue(result["complete"])
+
+    def test_gc_vacuum_into(self):
+        target = os.path.join(self.tmp.name, "compact.sqlite")
+        self.db.gc(vacuum_into=target)
+        copy = SQLiteDB(target)
+        self.assertEqual(copy.get_doc_ids("a"), [self.kept.id()])
+        copy.close()
+
+    def test_remove_docs_clears_files(self):
+        self.db.remove_docs(self.kept.id(), "a")
+        rows = self.db.do_run_sql_query(
+            "SELECT COUNT(*) AS n FROM files WHERE uid = ?", (self.kept.id(),)
+        )
+        self.assertEqual(rows[0]["n"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
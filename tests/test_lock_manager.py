@@ -0,0 +1,105 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from did.file import LockManager, checkout_lock_file, release_lock_file
+
+
+class TestLockManager(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, "table.bin")
+        self.lock_filename = self.filename + ".lock"
+        self.manager = LockManager(poll_interval=0.01)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lock_file_follows_matlab_format(self):
+        lock = self.manager.acquire(self.filename)
+        with open(self.lock_filename) as f:
+            lines = f.read().splitlines()
+        self.assertGreater(datetime.fromisoformat(lines[0]), datetime.utcnow())
+        self.assertEqual(lines[1], lock.key)
+        self.assertEqual(lines[2], "exclusive")
+        lock.release()
+        self.assertFalse(lock.held)
+        self.assertFalse(os.path.exists(self.lock_filename))
+
+    def test_shared_locks_coexist_and_exclude_writers(self):
+        first = self.manager.acquire(self.filename, "shared")
+        second = self.manager.acquire(self.filename, "shared", timeout=0)
+        with self.assertRaises(TimeoutError):
+            self.manager.acquire(self.filename, "exclusive", timeout=0.05)
+        first.release()
+        self.assertTrue(os.path.exists(self.lock_filename))
+        second.release()
+        self.assertFalse(os.path.exists(self.lock_filename))
+        with self.manager.lock(self.filename, timeout=0):
+            with self.assertRaises(TimeoutError):
+                self.manager.acquire(self.filename, "shared", timeout=0)
+
+    def test_waiter_wakes_when_released(self):
+        lock = self.manager.acquire(self.filename)
+        acquired = threading.Event()
+
+        def wait_for_lock():
+            with self.manager.lock(self.filename):
+                acquired.set()
+
+        thread = threading.Thread(target=wait_for_lock)
+        thread.start()
+        time.sleep(0.1)
+        self.assertFalse(acquired.is_set())
+        lock.release()
+        thread.join(5)
+        self.assertTrue(acquired.is_set())
+
+        stats = self.manager.stats()
+        self.assertEqual(stats["acquired"], 2)
+        self.assertEqual(stats["contended"], 1)
+        self.assertGreater(stats["max_wait"], 0.05)
+        self.assertEqual(stats["held"], 0)
+
+    def test_timeout_is_counted(self):
+        with self.manager.lock(self.filename):
+            with self.assertRaises(TimeoutError):
+                self.manager.acquire(self.filename, timeout=0.02)
+        self.assertEqual(self.manager.stats()["timeouts"], 1)
+        self.manager.reset_stats()
+        self.assertEqual(self.manager.stats()["acquired"], 0)
+
+    def test_matlab_lock_file_waits_until_expired(self):
+        expiration = datetime.utcnow() + timedelta(seconds=0.3)
+        with open(self.lock_filename, "w") as f:
+            f.write(f"{expiration.isoformat()}\nmatlab_key")
+        with self.assertRaises(TimeoutError):
+            self.manager.acquire(self.filename, timeout=0.05)
+        lock = self.manager.acquire(self.filename, timeout=5)
+        with open(self.lock_filename) as f:
+            self.assertEqual(f.read().splitlines()[1], lock.key)
+        lock.release()
+
+    def test_lock_file_left_by_dead_holder_is_taken_over(self):
+        expiration = datetime.utcnow() + timedelta(hours=1)
+        with open(self.lock_filename, "w") as f:
+            f.write(f"{expiration.isoformat()}\nold_key\nexclusive\n")
+        lock = self.manager.acquire(self.filename, timeout=0)
+        lock.release()
+
+    def test_checkout_and_release_lock_file(self):
+        lock, key = checkout_lock_file(self.filename)
+        self.assertEqual(lock.key, key)
+        self.assertEqual(checkout_lock_file(self.filename, 0, False), (None, None))
+        with self.assertRaises(IOError):
+            checkout_lock_file(self.filename, 0)
+        self.assertFalse(release_lock_file(self.filename, "other_key"))
+        self.assertTrue(release_lock_file(self.filename, key))
+        self.assertFalse(os.path.exists(self.lock_filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import copy
+import json
+import unittest
+
+from did.implementations.sqlitedb import SQLiteDB
+
+
+def _deepcopy_matlab_props(props):
+    """Reference implementation: deep copy then unwrap single-element lists."""
+    props = copy.deepcopy(props)
+    dc = props.get("document_class", {})
+    sc = dc.get("superclasses")
+    if isinstance(sc, list) and len(sc) == 1:
+        dc["superclasses"] = sc[0]
+    dep = props.get("depends_on")
+    if isinstance(dep, list) and len(dep) == 1:
+        props["depends_on"] = dep[0]
+    files = props.get("files")
+    if isinstance(files, dict):
+        fi = files.get("file_info")
+        if isinstance(fi, list) and len(fi) == 1:
+            files["file_info"] = fi[0]
+    return props
+
+
+class TestMatlabSerialization(unittest.TestCase):
+    CASES = [
+        {"base": {"id": "x"}},
+        {
+            "document_class": {
+                "class_name": "a",
+                "superclasses": [{"definition": "b"}],
+            },
+            "base": {"id": "x"},
+            "depends_on": [{"name": "n", "value": "v"}],
+            "files": {"file_info": [{"name": "f", "locations": {"location": "p"}}]},
+        },
+        {
+            "document_class": {"class_name": "a", "superclasses": ["b", "c"]},
+            "depends_on": [{"name": "n", "value": "v"}, {"name": "m", "value": "w"}],
+            "files": {"file_info": []},
+            "data": {"values": [1, 2, 3], "nested": {"x": [1]}},
+        },
+        {
+            "document_class": {"class_name": "a", "superclasses": []},
+            "depends_on": {"name": "n", "value": "v"},
+            "files": {"file_info": {"name": "f"}},
+        },
+    ]
+
+    def test_byte_identical(self):
+        for props in self.CASES:
+            expected = json.dumps(_deepcopy_matlab_props(props))
+            self.assertEqual(SQLiteDB._matlab_json(props), expected)
+
+    def test_caller_props_unchanged(self):
+        for props in self.CASES:
+            before = copy.deepcopy(props)
+            SQLiteDB._matlab_json(props)
+            self.assertEqual(props, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import tempfile
+import time
+import unittest
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestMergeBranch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _setup(self, copy_on_write=False):
+        db = SQLiteDB(
+            os.path.join(self.tmp.name, f"merge_{copy_on_write}.sqlite"),
+            copy_on_write_branches=copy_on_write,
+        )
+        db.add_branch("a", "")
+        self.base_docs = [Document("demoA", **{"demoA.value": i}) for i in range(4)]
+        db.add_docs(self.base_docs, "a")
+        time.sleep(0.01)
+        db.add_branch("b", "a")
+        time.sleep(0.01)
+        return db
+
+    def _check_fold_back(self, copy_on_write):
+        db = self._setup(copy_on_write)
+        new_in_b = Document("demoA", **{"demoA.value": 10})
+        db.add_docs([new_in_b], "b")
+        db.remove_docs(self.base_docs[0].id(), "b")
+        new_in_a = Document("demoA", **{"demoA.value": 20})
+        db.add_docs([new_in_a], "a")
+
+        result = db.merge_branch("b", "a")
+        self.assertEqual(result["added"], [new_in_b.id()])
+        self.assertEqual(result["removed"], [self.base_docs[0].id()])
+        self.assertEqual(result["conflicts"], [])
+
+        expected = {d.id() for d in self.base_docs[1:]} | {new_in_b.id(), new_in_a.id()}
+        self.assertEqual(set(db.get_doc_ids("a")), expected)
+        db.close()
+
+    def test_fold_back(self):
+        self._check_fold_back(False)
+
+    def test_fold_back_copy_on_write(self):
+        self._check_fold_back(True)
+
+    def _check_target_removed_after_fork(self, copy_on_write):
+        db = self._setup(copy_on_write)
+        removed = self.base_docs[0]
+        db.remove_docs(removed.id(), "a")
+
+        result = db.merge_branch("b", "a")
+        self.assertEqual(result, {"added": [], "removed": [], "conflicts": []})
+        self.assertNotIn(removed.id(), db.get_doc_ids("a"))
+
+        # A document added in the source that needs it is now a conflict
+        dependent = Document("demoC", **{"demoC.value": 1})
+        dependent.set_dependency_value("item1", removed.id())
+        db.add_docs([dependent], "b")
+        with self.assertRaises(ValueError):
+            db.merge_branch("b", "a")
+        result = db.merge_branch("b", "a", strategy="target")
+        self.assertEqual(result["conflicts"], [removed.id()])
+        self.assertEqual(result["added"], [])
+        db.close()
+
+    def test_target_removed_after_fork(self):
+        self._check_target_removed_after_fork(False)
+
+    def test_target_removed_after_fork_copy_on_write(self):
+        self._check_target_removed_after_fork(True)
+
+    def _check_changes_already_in_target(self, copy_on_write):
+        db = self._setup(copy_on_write)
+        z = Document("demoA", **{"demoA.value": 30})
+        db.add_docs([z], "a")
+        db.remove_docs(self.base_docs[0].id(), "a")
+
+        result = db.merge_branch("a", "b")
+        self.assertEqual(result["added"], [z.id()])
+        self.assertEqual(result["removed"], [self.base_docs[0].id()])
+        expected = set(db.get_doc_ids("a"))
+        self.assertEqual(set(db.get_doc_ids("b")), expected)
+
+        empty = {"added": [], "removed": [], "conflicts": []}
+        self.assertEqual(db.merge_branch("b", "a"), empty)
+        self.assertEqual(db.merge_branch("a", "b"), empty)
+        self.assertEqual(set(db.get_doc_ids("a")), expected)
+        self.assertEqual(set(db.get_doc_ids("b")), expected)
+        db.close()
+
+    def test_changes_already_in_target(self):
+        self._check_changes_already_in_target(False)
+
+    def test_changes_already_in_target_copy_on_write(self):
+        self._check_changes_already_in_target(True)
+
+    def test_removal_conflict(self):
+        db = self._setup()
+        needed = self.base_docs[1]
+        db.remove_docs(needed.id(), "b")
+        dependent = Document("demoC", **{"demoC.value": 1})
+        dependent.set_dependency_value("item1", needed.id())
+        db.add_docs([dependent], "a")
+
+        before = set(db.get_doc_ids("a"))
+        with self.assertRaises(ValueError):
+            db.merge_branch("b", "a")
+        self.assertEqual(set(db.get_doc_ids("a")), before)
+
+        result = db.merge_branch("b", "a", strategy="target")
+        self.assertEqual(result["conflicts"], [needed.id()])
+        self.assertEqual(result["removed"], [])
+        self.assertIn(needed.id(), db.get_doc_ids("a"))
+
+        result = db.merge_branch("b", "a", strategy="source")
+        self.assertEqual(result["removed"], [needed.id()])
+        self.assertNotIn(needed.id(), db.get_doc_ids("a"))
+        db.close()
+
+    def test_target_removed_dependency(self):
+        db = self._setup()
+        needed = self.base_docs[2]
+        dependent = Document("demoC", **{"demoC.value": 1})
+        dependent.set_dependency_value("item1", needed.id())
+        db.add_docs([dependent], "b")
+        db.add_branch("c", "a")
+        db.remove_docs(needed.id(), "c")
+
+        result = db.merge_branch("b", "c", strategy="target")
+        self.assertEqual(result["conflicts"], [needed.id()])
+        self.assertEqual(result["added"], [])
+
+        result = db.merge_branch("b", "c", strategy="source")
+        self.assertEqual(sorted(result["added"]), sorted([needed.id(), dependent.id()]))
+        self.assertIn(needed.id(), db.get_doc_ids("c"))
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
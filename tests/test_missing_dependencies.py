@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from did.document import Document
+from did.fun import find_docs_missing_dependencies
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class _DocsOnly:
+    """Exposes only the generic Database reads, to exercise the fallback."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def get_doc_ids(self, branch_id=None):
+        return self.db.get_doc_ids(branch_id)
+
+    def get_docs(self, doc_ids, **kwargs):
+        return self.db.get_docs(doc_ids, **kwargs)
+
+
+class TestMissingDependencies(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "missing.sqlite"))
+        self.db.add_branch("a", "")
+        self.present = Document("demoA", **{"demoA.value": 0})
+        self.removed = Document("demoA", **{"demoA.value": 1})
+        self.doc = Document("demoC", **{"demoC.value": 2})
+        self.doc.set_dependency_value("item1", self.present.id())
+        self.doc.set_dependency_value("item2", self.removed.id())
+        self.doc.set_dependency_value("item3", "never_existed")
+        self.db.add_docs([self.present, self.removed, self.doc], "a")
+        self.db.add_branch("b", "a")
+        self.db.remove_docs([self.removed.id()], "b")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_anti_join(self):
+        self.assertEqual(
+            self.db.find_missing_dependencies(branch_id="a"),
+            [(self.doc.id(), "item3", "never_existed")],
+        )
+        self.assertEqual(
+            find_docs_missing_dependencies(self.db, branch_id="b"),
+            [
+                (self.doc.id(), "item2", self.removed.id()),
+                (self.doc.id(), "item3", "never_existed"),
+            ],
+        )
+
+    def test_dependency_names(self):
+        self.assertEqual(
+            find_docs_missing_dependencies(self.db, "item2", branch_id="b"),
+            [(self.doc.id(), "item2", self.removed.id())],
+        )
+        self.assertEqual(
+            find_docs_missing_dependencies(self.db, "item1", branch_id="b"), []
+        )
+
+    def test_generic_fallback_agrees(self):
+        for branch in ("a", "b"):
+            self.assertEqual(
+                find_docs_missing_dependencies(_DocsOnly(self.db), branch_id=branch),
+                find_docs_missing_dependencies(self.db, branch_id=branch),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+from did.query import Query
+
+
+class TestSearchPlanner(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "plan.sqlite"))
+        self.db.add_branch("a", "")
+        self.docs = [Document("demoA", **{"demoA.value": i}) for i in range(40)]
+        self.docs.append(Document("demoB", **{"demoB.value": 1}))
+        self.db.add_docs(self.docs, "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_most_selective_clause_runs_first(self):
+        q = Query("demoA.value", "greaterthan", 30) & Query("", "isa", "demoB")
+        plan = self.db.explain(q, "a")
+        self.assertEqual(plan["method"], "and")
+        first, second = plan["children"]
+        self.assertEqual(first["operation"], "isa")
+        self.assertLess(first["estimate"], second["estimate"])
+        self.assertEqual(self.db.search(q, "a"), [])
+
+    def test_empty_intersection_skips_remaining_clauses(self):
+        q = (
+            Query("", "isa", "demoB")
+            & Query("demoA.value", "exact_number", 3)
+            & Query("demoA.value", "contains_string", "1")
+        )
+        plan = self.db.explain(q, "a", analyze=True)
+        rows = [c.get("rows") for c in plan["children"]]
+        self.assertEqual(plan["rows"], 0)
+        self.assertTrue(plan["children"][-1].get("skipped"))
+        self.assertIn(0, rows)
+
+    def test_results_match_unordered_evaluation(self):
+        queries = [
+            Query("demoA.value", "lessthan", 10)
+            & Query("demoA.value", "greaterthan", 4),
+            Query("demoA.value", "hasfield", "")
+            & Query("demoA.value", "~exact_number", 7)
+            & Query("demoA.value", "lessthan", 9),
+            (Query("demoA.value", "exact_number", 2) | Query("", "isa", "demoB"))
+            & Query("base.id", "hasfield", ""),
+        ]
+        for q in queries:
+            expected = set(self.db.get_doc_ids("a"))
+            for item in q.to_search_structure():
+                expected &= set(self.db._brute_force_search(item, "a"))
+            self.assertEqual(set(self.db.search(q, "a")), expected)
+
+    def test_single_leaf_keeps_sql_order(self):
+        q = Query("demoA.value", "lessthan", 10)
+        members, params = self.db._branch_members_sql(self.db.dbid.cursor(), "a")
+        clause = self.db._query_struct_to_sql_str(q.to_search_structure()[0])
+        rows = self.db.do_run_sql_query(
+            "SELECT DISTINCT docs.doc_id FROM docs, doc_data, fields "
+            "WHERE docs.doc_idx = doc_data.doc_idx "
+            f"AND docs.doc_idx IN ({members}) "
+            f"AND fields.field_idx = doc_data.field_idx AND {clause}",
+            params,
+        )
+        self.assertEqual(self.db.search(q, "a"), [r["doc_id"] for r in rows])
+
+    def test_and_keeps_order_of_first_clause(self):
+        first = Query("demoA.value", "greaterthan", 30)
+        q = Query("base.id", "hasfield", "") & first
+        self.assertEqual(self.db.explain(q, "a")["children"][0]["field"], "demoA.value")
+        expected = self.db.search(first, "a")
+        self.assertEqual(self.db.search(q, "a"), expected)
+
+    def test_search_does_not_write(self):
+        self.db.dbid.execute("DELETE FROM branch_stats")
+        self.db.dbid.commit()
+        changes = self.db.dbid.total_changes
+        q = Query("demoA.value", "lessthan", 10) & Query("", "isa", "demoA")
+        self.assertEqual(len(self.db.search(q, "a")), 10)
+        self.assertEqual(len(self.db.search(Query("", "isa", "demoB"), "a")), 1)
+        self.assertEqual(self.db.dbid.total_changes, changes)
+        self.assertEqual(self.db.do_run_sql_query("SELECT * FROM branch_stats"), [])
+
+    def test_search_read_only_file(self):
+        path = self.db.connection
+        self.db.dbid.execute("DELETE FROM branch_stats")
+        self.db.dbid.commit()
+        self.db.close()
+        connect = sqlite3.connect
+
+        def read_only(name, *args, **kwargs):
+            return connect(f"file:{name}?mode=ro", *args, uri=True, **kwargs)
+
+        with mock.patch.object(sqlite3, "connect", side_effect=read_only):
+            self.db = SQLiteDB(path)
+        q = Query("demoA.value", "lessthan", 10) & Query("", "isa", "demoA")
+        self.assertEqual(len(self.db.search(q, "a")), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from did.document import Document
+from did.implementations.sqlitedb import SQLiteDB
+
+
+class TestUpdateDoc(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = SQLiteDB(os.path.join(self.tmp.name, "update.sqlite"))
+        self.db.add_branch("a")
+        self.doc = Document("demoA", **{"demoA.value": 1, "base.name": "first"})
+        self.db.add_docs([self.doc], "a")
+        self.db.add_branch("b", "a")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def _doc_data(self):
+        rows = self.db.do_run_sql_query(
+            "SELECT fields.field_name, doc_data.value FROM doc_data "
+            "JOIN fields ON fields.field_idx = doc_data.field_idx"
+        )
+        return sorted((row["field_name"], row["value"]) for row in rows)
+
+    def test_update_changes_only_modified_fields(self):
+        generation = self.db.write_generation()
+        self.doc.document_properties["demoA"]["value"] = 2
+        changed = self.db.update_doc(self.doc, "a")
+        self.assertEqual(changed, 1)
+        self.assertGreater(self.db.write_generation(), generation)
+
+        stored = self.db.get_docs(self.doc.id())
+        self.assertEqual(stored.document_properties["demoA"]["value"], 2)
+        self.assertIn(("demoA.value", "2"), self._doc_data())
+
+        # Branch membership is preserved on both branches
+        self.assertEqual(self.db.get_doc_ids("a"), [self.doc.id()])
+        self.assertEqual(self.db.get_doc_ids("b"), [self.doc.id()])
+
+        from did.query import Query
+
+        q = Query("demoA.value", "exact_number", 2)
+        self.assertEqual(self.db.search(q, "b"), [self.doc.id()])
+
+    def test_update_matches_fresh_insert(self):
+        self.doc.document_properties["base"]["name"] = "second"
+        self.doc.document_properties["base"]["extra"] = {"x": 1}
+        self.db.update_doc(self.doc, "a")
+        updated = self._doc_data()
+
+        other = SQLiteDB(os.path.join(self.tmp.name, "fresh.sqlite"))
+        other.add_branch("a")
+        other.add_docs([self.doc], "a")
+        rows = other.do_run_sql_query(
+            "SELECT fields.field_name, doc_data.value FROM doc_data "
+            "JOIN fields ON fields.field_idx = doc_data.field_idx"
+        )
+        self.assertEqual(
+            updated, sorted((row["field_name"], row["value"]) for row in rows)
+        )
+        other.close()
+
+        del self.doc.document_properties["base"]["extra"]
+        self.db.update_doc(self.doc, "a")
+        self.assertNotIn(("base.extra.x", "1"), self._doc_data())
+
+    def test_update_missing_document(self):
+        other = Document("demoA")
+        with self.assertRaises(ValueError):
+            self.db.update_doc(other, "a")
+
+
+class TestAuxTables(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "aux.sqlite")
+        db = SQLiteDB(self.path)
+        db.add_branch("a")
+        self.doc = Document("demoA", **{"demoA.value": 1})
+        db.add_docs([self.doc], "a")
+        db.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _drop_aux_tables(self):
+        # Leave only the tables DID-matlab creates
+        conn = sqlite3.connect(self.path)
+        rows = conn.execute(
+            "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'index')"
+        ).fetchall()
+        for name, kind in rows:
+            if name in SQLiteDB._AUX_SCHEMA_NAMES and kind == "table":
+                conn.execute(f"DROP TABLE {name}")
+        conn.execute("DROP INDEX IF EXISTS doc_data_doc_idx")
+        conn.commit()
+        conn.close()
+
+    def _open_read_only(self):
+        connect = sqlite3.connect
+
+        def read_only(path, *args, **kwargs):
+            return connect(f"file:{path}?mode=ro", *args, uri=True, **kwargs)
+
+        with mock.patch.object(sqlite3, "connect", side_effect=read_only):
+            return SQLiteDB(self.path)
+
+    def test_reopening_does_not_write(self):
+        names = {
+            row[0]
+            for row in sqlite3.connect(self.path).execute(
+                "SELECT name FROM sqlite_master"
+            )
+        }
+        self.assertTrue(names.issuperset(SQLiteDB._AUX_SCHEMA_NAMES))
+        db = SQLiteDB(self.path)
+        self.assertEqual(db.dbid.total_changes, 0)
+        self.assertFalse(db.dbid.in_transaction)
+        db.close()
+
+    def test_open_read_only(self):
+        db = self._open_read_only()
+        self.assertEqual(db.get_doc_ids("a"), [self.doc.id()])
+        db.close()
+
+    def test_open_read_only_matlab_database(self):
+        self._drop_aux_tables()
+        db = self._open_read_only()
+        self.assertEqual(db.get_doc_ids("a"), [self.doc.id()])
+        self.assertEqual(db.get_docs(self.doc.id()).id(), self.doc.id())
+        self.assertEqual(db.write_generation(), 0)
+        with self.assertRaises(sqlite3.OperationalError):
+            db.add_branch("b", "a")
+        db.close()
+
+        # A writable file gets the tables on open
+        db = SQLiteDB(self.path)
+        self.assertEqual(db.get_doc_ids("a"), [self.doc.id()])
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()